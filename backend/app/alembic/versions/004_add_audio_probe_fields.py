@@ -0,0 +1,25 @@
+"""Add probed audio stream properties to projects
+
+Revision ID: c7d2e4f6a8b1
+Revises: b5c8d3e2f1a6
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "c7d2e4f6a8b1"
+down_revision = "b5c8d3e2f1a6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("projects", sa.Column("sample_rate", sa.Integer))
+    op.add_column("projects", sa.Column("channels", sa.Integer))
+    op.add_column("projects", sa.Column("codec", sa.String(50)))
+
+
+def downgrade() -> None:
+    op.drop_column("projects", "codec")
+    op.drop_column("projects", "channels")
+    op.drop_column("projects", "sample_rate")
@@ -0,0 +1,25 @@
+"""Add the preview task type
+
+Revision ID: d4a9e1b7c3f2
+Revises: c7d2e4f6a8b1
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "d4a9e1b7c3f2"
+down_revision = "c7d2e4f6a8b1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TYPE tasktype ADD VALUE IF NOT EXISTS 'preview'")
+
+
+def downgrade() -> None:
+    # Postgres cannot drop an enum value; recreate the type without it
+    op.execute("DELETE FROM tasks WHERE task_type = 'preview'")
+    op.execute("ALTER TYPE tasktype RENAME TO tasktype_old")
+    op.execute("CREATE TYPE tasktype AS ENUM ('stem_separation', 'voice_training', 'vocal_generation', 'mixing')")
+    op.execute("ALTER TABLE tasks ALTER COLUMN task_type TYPE tasktype USING task_type::text::tasktype")
+    op.execute("DROP TYPE tasktype_old")
@@ -0,0 +1,28 @@
+"""Add content-addressed blobs
+
+Revision ID: e8b2f6c4d1a3
+Revises: d4a9e1b7c3f2
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "e8b2f6c4d1a3"
+down_revision = "d4a9e1b7c3f2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "blobs",
+        sa.Column("sha256", sa.String(64), primary_key=True),
+        sa.Column("ext", sa.String(16), nullable=False, server_default=""),
+        sa.Column("size", sa.BigInteger, nullable=False),
+        sa.Column("refcount", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("blobs")
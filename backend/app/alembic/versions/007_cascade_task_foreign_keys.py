@@ -0,0 +1,31 @@
+"""Delete tasks with their project or voice persona
+
+Revision ID: f3c8a5d2e9b4
+Revises: e8b2f6c4d1a3
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "f3c8a5d2e9b4"
+down_revision = "e8b2f6c4d1a3"
+branch_labels = None
+depends_on = None
+
+
+def _recreate_foreign_keys(ondelete):
+    op.drop_constraint("tasks_project_id_fkey", "tasks", type_="foreignkey")
+    op.drop_constraint("tasks_voice_persona_id_fkey", "tasks", type_="foreignkey")
+    op.create_foreign_key(
+        "tasks_project_id_fkey", "tasks", "projects", ["project_id"], ["id"], ondelete=ondelete
+    )
+    op.create_foreign_key(
+        "tasks_voice_persona_id_fkey", "tasks", "voice_personas", ["voice_persona_id"], ["id"], ondelete=ondelete
+    )
+
+
+def upgrade() -> None:
+    _recreate_foreign_keys("CASCADE")
+
+
+def downgrade() -> None:
+    _recreate_foreign_keys(None)
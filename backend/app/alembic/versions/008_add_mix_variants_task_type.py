@@ -0,0 +1,27 @@
+"""Add the mix variants task type
+
+Revision ID: a6d1c9e4b2f7
+Revises: f3c8a5d2e9b4
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "a6d1c9e4b2f7"
+down_revision = "f3c8a5d2e9b4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TYPE tasktype ADD VALUE IF NOT EXISTS 'mix_variants'")
+
+
+def downgrade() -> None:
+    # Postgres cannot drop an enum value; recreate the type without it
+    op.execute("DELETE FROM tasks WHERE task_type = 'mix_variants'")
+    op.execute("ALTER TYPE tasktype RENAME TO tasktype_old")
+    op.execute(
+        "CREATE TYPE tasktype AS ENUM ('stem_separation', 'voice_training', 'vocal_generation', 'mixing', 'preview')"
+    )
+    op.execute("ALTER TABLE tasks ALTER COLUMN task_type TYPE tasktype USING task_type::text::tasktype")
+    op.execute("DROP TYPE tasktype_old")
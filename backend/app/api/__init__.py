@@ -1,6 +1,6 @@
 """API router configuration."""
 from fastapi import APIRouter
-from app.api.routes import auth, users, voices, projects, audio, health
+from app.api.routes import auth, users, voices, projects, audio, health, uploads
 
 api_router = APIRouter()
 api_router.include_router(health.router, prefix="/health", tags=["health"])
@@ -9,3 +9,4 @@ api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(voices.router, prefix="/voices", tags=["voices"])
 api_router.include_router(projects.router, prefix="/projects", tags=["projects"])
 api_router.include_router(audio.router, prefix="/audio", tags=["audio"])
+api_router.include_router(uploads.router, prefix="/uploads", tags=["uploads"])
@@ -6,7 +6,7 @@ import jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.db import get_db
-from app.models.user import User
+from app.models.user import User, UserPlan
 from app.services.auth import AuthService
 from app.utils.token_blacklist import is_token_blacklisted, get_user_token_invalidation_time
 
@@ -63,6 +63,13 @@ async def get_current_user(
         raise HTTPException(status_code=401, detail="Invalid token") from None
 
 
+async def get_admin_user(user: User = Depends(get_current_user)) -> User:
+    """Get the current user, requiring the admin plan."""
+    if user.plan != UserPlan.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+
 async def get_optional_user(
     credentials: HTTPAuthorizationCredentials | None = Depends(HTTPBearer(auto_error=False)),
     db: AsyncSession = Depends(get_db),
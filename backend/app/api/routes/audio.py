@@ -1,45 +1,300 @@
 """Audio processing endpoints."""
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+from typing import List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Path as PathParam, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
 from app.db import get_db
 from app.api.deps import get_current_user
+from app.models.project import Project, VocalMode
+from app.models.task import TaskType
 from app.models.user import User
+from app.schemas.project import MixVariant, MixVariantsRequest
+from app.schemas.task import TaskResponse
+from app.services.blob import stems_root
+from app.services.job import JobService
 from app.services.project import ProjectService
+from app.services.scheduler import PREVIEW_LANE
+from app.services.task import TaskService
+from app.utils.downloads import stored_file_response
+from app.utils.progress_events import broadcaster
+from app.utils.storage import get_file_path, project_subdir
 
 router = APIRouter()
 
 
+def _vocal_track(project: Project) -> Optional[str]:
+    """The vocals a mix of the project uses: none when they are removed, else
+    the project's vocals, falling back to the separated vocal stem."""
+    if project.vocal_mode == VocalMode.REMOVE:
+        return None
+    return project.vocals_path or str(Path(project.stems_path) / "vocals.wav")
+
+
 @router.post("/{project_id}/process-stems")
 async def process_stems(
     project_id: UUID,
-    _background_tasks: BackgroundTasks,  # Reserved for future Celery integration
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     service = ProjectService(db)
-    await service.get_by_id(project_id, user.id)  # Verify access
-    # In production, this would trigger a Celery task
-    return {"message": "Stem separation started", "project_id": str(project_id)}
+    project = await service.get_by_id(project_id, user.id)
+    if not project.original_path:
+        raise HTTPException(status_code=400, detail="Upload audio before separating stems")
+
+    task = await JobService(db).submit(
+        user,
+        TaskType.STEM_SEPARATION,
+        {
+            "input_path": project.original_path,
+            "output_dir": stems_root(project.original_path),
+            "project_id": str(project_id),
+        },
+        project_id=project_id,
+    )
+    return {"message": "Stem separation started", "project_id": str(project_id), "task_id": str(task.id)}
+
+
+@router.post("/{project_id}/mix")
+async def mix_project(
+    project_id: UUID,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    service = ProjectService(db)
+    project = await service.get_by_id(project_id, user.id)
+    if not project.stems_path:
+        raise HTTPException(status_code=400, detail="Separate stems before mixing")
+
+    task = await JobService(db).submit(
+        user,
+        TaskType.MIXING,
+        {
+            "instrumental_path": str(Path(project.stems_path) / "instrumental.wav"),
+            "vocal_path": _vocal_track(project),
+            "output_path": str(get_file_path(project_subdir(user.id, project_id)) / "mix" / "output.wav"),
+            "settings": project.mix_settings or {},
+            "project_id": str(project_id),
+        },
+        project_id=project_id,
+    )
+    return {"message": "Mixing started", "project_id": str(project_id), "task_id": str(task.id)}
+
+
+def _variant_id(variant: MixVariant) -> str:
+    """Stable id of a mix variant: renders of the same settings share a file."""
+    return hashlib.sha256(json.dumps(variant.model_dump(), sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _variant_path(user: User, project_id: UUID, variant_id: str) -> Path:
+    return get_file_path(project_subdir(user.id, project_id)) / "mix" / "variants" / f"{variant_id}.wav"
+
+
+@router.post("/{project_id}/mix-variants")
+async def mix_project_variants(
+    project_id: UUID,
+    request: MixVariantsRequest,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Render several mix settings of the project in one job, e.g. to audition vocal levels."""
+    service = ProjectService(db)
+    project = await service.get_by_id(project_id, user.id)
+    if not project.stems_path:
+        raise HTTPException(status_code=400, detail="Separate stems before mixing")
+    vocal_path = _vocal_track(project)
+    if vocal_path is None:
+        raise HTTPException(status_code=400, detail="Mix variants need a vocal track")
+    if len(request.variants) > settings.mix_max_variants:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.mix_max_variants} variants can be rendered at once"
+        )
+
+    variant_ids = [_variant_id(variant) for variant in request.variants]
+    task = await JobService(db).submit(
+        user,
+        TaskType.MIX_VARIANTS,
+        {
+            "instrumental_path": str(Path(project.stems_path) / "instrumental.wav"),
+            "vocal_path": vocal_path,
+            "output_paths": [str(_variant_path(user, project_id, variant_id)) for variant_id in variant_ids],
+            "variants": [variant.model_dump() for variant in request.variants],
+            "project_id": str(project_id),
+        },
+        project_id=project_id,
+    )
+    return {
+        "message": "Mixing variants started",
+        "project_id": str(project_id),
+        "task_id": str(task.id),
+        "variants": [
+            {"id": variant_id, **variant.model_dump()}
+            for variant_id, variant in zip(variant_ids, request.variants)
+        ],
+    }
+
+
+@router.get("/{project_id}/mix-variants/{variant_id}")
+async def get_mix_variant(
+    project_id: UUID,
+    variant_id: str = PathParam(..., pattern="^[0-9a-f]{16}$"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream a rendered mix variant."""
+    service = ProjectService(db)
+    project = await service.get_by_id(project_id, user.id)
+    try:
+        path = str(_variant_path(user, project_id, variant_id))
+        return await asyncio.to_thread(stored_file_response, path, f"{project.name}-mix-{variant_id}.wav")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Mix variant not available") from None
 
 
-@router.post("/{project_id}/generate-vocals")
-async def generate_vocals(
+@router.post("/{project_id}/pipeline")
+async def run_pipeline(
+    project_id: UUID,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Run stem separation and mixing as one workflow."""
+    service = ProjectService(db)
+    project = await service.get_by_id(project_id, user.id)
+    if not project.original_path:
+        raise HTTPException(status_code=400, detail="Upload audio before starting the pipeline")
+
+    tasks = await JobService(db).submit_pipeline(
+        user, project, str(get_file_path(project_subdir(user.id, project_id)))
+    )
+    return {
+        "message": "Pipeline started",
+        "project_id": str(project_id),
+        "task_ids": [str(task.id) for task in tasks],
+    }
+
+
+def _preview_path(user: User, project_id: UUID, offset: float, duration: float) -> Path:
+    """Where the preview of a window is rendered; one directory per window."""
+    window = f"{round(offset * 1000)}-{round(duration * 1000)}"
+    return get_file_path(project_subdir(user.id, project_id)) / "preview" / window / "preview.wav"
+
+
+def _preview_window(project: Project, offset: float, duration: Optional[float]) -> tuple:
+    duration = duration or settings.preview_duration_seconds
+    if duration > settings.preview_max_duration_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Preview is limited to {settings.preview_max_duration_seconds:g} seconds",
+        )
+    if project.duration_seconds and offset >= project.duration_seconds:
+        raise HTTPException(status_code=400, detail="Preview starts past the end of the audio")
+    return offset, duration
+
+
+@router.post("/{project_id}/preview")
+async def preview_project(
+    project_id: UUID,
+    offset: float = Query(0.0, ge=0, description="Window start in seconds"),
+    duration: Optional[float] = Query(None, gt=0, description="Window length in seconds"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Render a short window of the mix to audition before a full render.
+
+    Uses the project's stems when they exist; otherwise only the window is
+    separated, with the preview model.
+    """
+    service = ProjectService(db)
+    project = await service.get_by_id(project_id, user.id)
+    if not project.original_path:
+        raise HTTPException(status_code=400, detail="Upload audio before previewing")
+    offset, duration = _preview_window(project, offset, duration)
+
+    kwargs = {
+        "output_path": str(_preview_path(user, project_id, offset, duration)),
+        "offset": offset,
+        "duration": duration,
+        "settings": project.mix_settings or {},
+        "project_id": str(project_id),
+    }
+    if project.stems_path:
+        kwargs["instrumental_path"] = str(Path(project.stems_path) / "instrumental.wav")
+        kwargs["vocal_path"] = _vocal_track(project)
+    else:
+        kwargs["input_path"] = project.original_path
+        kwargs["with_vocals"] = project.vocal_mode != VocalMode.REMOVE
+
+    task = await JobService(db).submit(user, TaskType.PREVIEW, kwargs, project_id=project_id, lane=PREVIEW_LANE)
+    return {
+        "message": "Preview started",
+        "project_id": str(project_id),
+        "task_id": str(task.id),
+        "offset": offset,
+        "duration": duration,
+    }
+
+
+@router.get("/{project_id}/preview")
+async def get_preview(
+    project_id: UUID,
+    offset: float = Query(0.0, ge=0, description="Window start in seconds"),
+    duration: Optional[float] = Query(None, gt=0, description="Window length in seconds"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Serve a rendered preview window."""
+    service = ProjectService(db)
+    project = await service.get_by_id(project_id, user.id)
+    offset, duration = _preview_window(project, offset, duration)
+    path = _preview_path(user, project_id, offset, duration)
+    filename = f"{project.name}-preview-{path.parent.name}.wav"
+    try:
+        return await asyncio.to_thread(stored_file_response, str(path), filename)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Preview not available") from None
+
+
+@router.get("/{project_id}/tasks", response_model=List[TaskResponse])
+async def list_tasks(
     project_id: UUID,
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     service = ProjectService(db)
     await service.get_by_id(project_id, user.id)  # Verify access
-    return {"message": "Vocal generation started", "project_id": str(project_id)}
+    return await TaskService(db).get_by_project(project_id)
 
 
-@router.post("/{project_id}/mix")
-async def mix_project(
+@router.get("/{project_id}/events")
+async def project_events(
     project_id: UUID,
+    request: Request,
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
+    """Stream job progress for a project as Server-Sent Events."""
     service = ProjectService(db)
     await service.get_by_id(project_id, user.id)  # Verify access
-    return {"message": "Mixing started", "project_id": str(project_id)}
+
+    async def event_stream():
+        async with broadcaster.subscribe(str(project_id)) as queue:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=settings.sse_heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: progress\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,9 +1,13 @@
 """Health check endpoints."""
-from fastapi import APIRouter, Depends
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from pydantic import BaseModel
+from app.api.deps import get_admin_user
 from app.db import get_db
+from app.models.user import User
+from app.services.scheduler import get_scheduler
 from app.utils.token_blacklist import get_redis
 
 router = APIRouter()
@@ -126,3 +130,12 @@ async def liveness_check():
     Does not check external dependencies.
     """
     return {"alive": True}
+
+
+@router.get("/queues")
+async def queue_metrics(_user: User = Depends(get_admin_user)):
+    """Job scheduler metrics per plan: caps, backlog and recent queue waits."""
+    try:
+        return await asyncio.to_thread(get_scheduler().metrics)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Scheduler metrics unavailable") from None
@@ -2,16 +2,24 @@
 import asyncio
 import math
 from uuid import UUID
-from typing import List
-from fastapi import APIRouter, Depends, UploadFile, File, Query
+from pathlib import Path
+from typing import List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Query, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_db
 from app.api.deps import get_current_user
 from app.models.user import User
-from app.models.project import ProjectStatus
 from app.schemas.project import ProjectCreate, ProjectResponse, ProjectUpdate, ProjectListResponse
+from app.schemas.upload import UploadSessionCreate, UploadSessionResponse
+from app.services.blob import BlobService
 from app.services.project import ProjectService
-from app.utils.storage import save_upload
+from app.services.upload import TARGET_PROJECT, UploadService
+from app.utils.downloads import stored_file_response
+from app.utils.storage import project_subdir, save_upload
+from app.utils.storage_backend import localize
+from app.utils.waveform import load_peaks, peaks_path, select_peaks
+
+WAVEFORM_STEMS = {"vocals", "drums", "bass", "other", "instrumental"}
 
 router = APIRouter()
 
@@ -71,13 +79,83 @@ async def upload_audio(
 ):
     service = ProjectService(db)
     await service.get_by_id(project_id, user.id)  # Verify access
-    path = await save_upload(file, f"projects/{user.id}/{project_id}")
-    # Lazy import to avoid loading heavy audio dependencies at startup
-    from app.utils.audio import get_audio_duration
-    # Run blocking audio duration calculation in thread pool
-    duration = await asyncio.to_thread(get_audio_duration, path)
-    await service.update_status(project_id, ProjectStatus.UPLOADING, original_path=path, duration_seconds=duration)
-    return {"message": "Uploaded", "path": path, "duration": duration}
+    async with BlobService(db).referenced(await save_upload(file, project_subdir(user.id, project_id))) as path:
+        info = await service.attach_original(project_id, path)
+    return {"message": "Uploaded", "path": path, "duration": info.duration_seconds}
+
+
+@router.post("/{project_id}/uploads", response_model=UploadSessionResponse)
+async def create_upload_session(
+    project_id: UUID,
+    data: UploadSessionCreate,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Start a resumable upload of the project's audio; chunks go to /uploads."""
+    service = ProjectService(db)
+    await service.get_by_id(project_id, user.id)  # Verify access
+    return await UploadService().create(
+        user.id, TARGET_PROJECT, project_id, project_subdir(user.id, project_id),
+        data.filename, data.content_type, data.size,
+    )
+
+
+def _source_path(project, source: str) -> Optional[str]:
+    """Path of a project's audio named by ``source``, or None if not produced yet."""
+    if source.startswith("stem:") and source[5:] in WAVEFORM_STEMS:
+        return str(Path(project.stems_path) / f"{source[5:]}.wav") if project.stems_path else None
+    if source in ("original", "vocals", "output"):
+        return getattr(project, f"{source}_path")
+    raise HTTPException(status_code=400, detail="Invalid audio source")
+
+
+@router.get("/{project_id}/waveform")
+async def get_waveform(
+    project_id: UUID,
+    source: str = Query("original", description="original, vocals, output or stem:<name>"),
+    samples_per_peak: int = Query(1024, ge=1, description="Requested zoom"),
+    start: float = Query(0.0, ge=0, description="Start time in seconds"),
+    end: Optional[float] = Query(None, gt=0, description="End time in seconds"),
+    bits: int = Query(8, description="Sample resolution: 8 or 16"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Serve min/max waveform peaks for a range of a project's audio."""
+    if bits not in (8, 16):
+        raise HTTPException(status_code=400, detail="bits must be 8 or 16")
+
+    service = ProjectService(db)
+    project = await service.get_by_id(project_id, user.id)
+
+    audio_path = _source_path(project, source)
+    if audio_path:
+        await asyncio.to_thread(localize, str(peaks_path(audio_path)))
+    peaks = await asyncio.to_thread(load_peaks, audio_path) if audio_path else None
+    if peaks is None:
+        raise HTTPException(status_code=404, detail="Waveform not available")
+    return select_peaks(peaks, samples_per_peak, start, end, bits)
+
+
+@router.get("/{project_id}/download")
+async def download_audio(
+    project_id: UUID,
+    source: str = Query("output", description="original, vocals, output or stem:<name>"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stream a project's audio, with byte ranges for seeking players."""
+    service = ProjectService(db)
+    project = await service.get_by_id(project_id, user.id)
+
+    audio_path = _source_path(project, source)
+    if not audio_path:
+        raise HTTPException(status_code=404, detail="Audio not available")
+    name = source.replace("stem:", "")
+    filename = f"{project.name}-{name}{Path(audio_path).suffix}"
+    try:
+        return await asyncio.to_thread(stored_file_response, audio_path, filename)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Audio not available") from None
 
 
 @router.delete("/{project_id}")
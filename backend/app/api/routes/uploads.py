@@ -0,0 +1,73 @@
+"""Resumable upload endpoints."""
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_db
+from app.api.deps import get_current_user
+from app.models.user import User
+from app.schemas.upload import UploadSessionResponse
+from app.services.blob import BlobService
+from app.services.project import ProjectService
+from app.services.upload import TARGET_PROJECT, UploadService
+from app.services.voice_persona import VoicePersonaService
+
+router = APIRouter()
+
+
+@router.get("/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload_session(
+    upload_id: str,
+    user: User = Depends(get_current_user),
+):
+    """Report which chunks have been received, to resume an interrupted upload."""
+    return await UploadService().get(upload_id, user.id)
+
+
+@router.put("/{upload_id}/chunks/{index}", response_model=UploadSessionResponse)
+async def upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    offset: Optional[int] = Query(None, ge=0, description="Byte offset of the chunk, checked against its index"),
+    user: User = Depends(get_current_user),
+):
+    """Write one chunk; the raw request body is the chunk's bytes."""
+    service = UploadService()
+    session = await service.get(upload_id, user.id)
+    return await service.write_chunk(session, index, request.stream(), offset=offset)
+
+
+@router.post("/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Assemble the upload and attach it to its project or voice persona."""
+    service = UploadService()
+    session = await service.get(upload_id, user.id)
+    target_id = UUID(session.target_id)
+
+    if session.target == TARGET_PROJECT:
+        projects = ProjectService(db)
+        await projects.get_by_id(target_id, user.id)  # Verify access
+        async with BlobService(db).referenced(await service.complete(session)) as path:
+            info = await projects.attach_original(target_id, path)
+        return {"message": "Uploaded", "path": path, "duration": info.duration_seconds}
+
+    personas = VoicePersonaService(db)
+    await personas.get_by_id(target_id, user.id)  # Verify access
+    async with BlobService(db).referenced(await service.complete(session)) as path:
+        await personas.add_sample(target_id, user.id, path)
+    return {"message": "Sample uploaded successfully", "path": path}
+
+
+@router.delete("/{upload_id}")
+async def abort_upload(
+    upload_id: str,
+    user: User = Depends(get_current_user),
+):
+    service = UploadService()
+    await service.abort(await service.get(upload_id, user.id))
+    return {"message": "Upload aborted"}
@@ -6,7 +6,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_db
 from app.api.deps import get_current_user
 from app.models.user import User
+from app.schemas.upload import UploadSessionCreate, UploadSessionResponse
 from app.schemas.voice_persona import VoicePersonaCreate, VoicePersonaResponse, VoicePersonaListResponse
+from app.services.blob import BlobService
+from app.services.upload import TARGET_VOICE_SAMPLE, UploadService
 from app.services.voice_persona import VoicePersonaService
 from app.utils.storage import save_upload, validate_audio_file
 
@@ -70,11 +73,27 @@ async def upload_sample(
     # Verify user owns this persona before saving file
     await service.get_by_id(persona_id, user.id)
 
-    path = await save_upload(file, f"samples/{user.id}/{persona_id}")
-    await service.add_sample(persona_id, user.id, path)
+    async with BlobService(db).referenced(await save_upload(file, f"samples/{user.id}/{persona_id}")) as path:
+        await service.add_sample(persona_id, user.id, path)
     return {"message": "Sample uploaded successfully", "path": path}
 
 
+@router.post("/{persona_id}/samples/uploads", response_model=UploadSessionResponse)
+async def create_sample_upload_session(
+    persona_id: UUID,
+    data: UploadSessionCreate,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Start a resumable upload of a voice sample; chunks go to /uploads."""
+    service = VoicePersonaService(db)
+    await service.get_by_id(persona_id, user.id)  # Verify access
+    return await UploadService().create(
+        user.id, TARGET_VOICE_SAMPLE, persona_id, f"samples/{user.id}/{persona_id}",
+        data.filename, data.content_type, data.size,
+    )
+
+
 @router.delete("/{persona_id}")
 async def delete_voice_persona(
     persona_id: UUID,
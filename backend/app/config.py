@@ -13,6 +13,55 @@ class Settings(BaseSettings):
     refresh_token_expire_days: int = 7
     storage_path: str = "/app/storage"
     max_upload_size_mb: int = 100
+    upload_chunk_size_mb: int = 8
+    upload_session_ttl_seconds: int = 86400
+    storage_backend: str = "local"  # local or s3
+    storage_cache_path: str = ""  # Defaults to {storage_path}/cache/objects
+    storage_cache_max_mb: int = 20480
+    s3_bucket: str = ""
+    s3_prefix: str = ""
+    s3_endpoint_url: str | None = None  # For S3-compatible services such as MinIO
+    s3_region: str | None = None
+    s3_access_key_id: str | None = None
+    s3_secret_access_key: str | None = None
+    s3_multipart_threshold_mb: int = 16
+    s3_multipart_chunk_mb: int = 16
+    s3_max_concurrency: int = 8
+    storage_url_ttl_seconds: int = 3600  # Lifetime of presigned download URLs
+    download_accel_redirect_prefix: str = ""  # e.g. /protected-storage behind nginx
+    canonical_audio_enabled: bool = True
+    mix_streaming: bool = True
+    mix_block_frames: int = 65536
+    mix_max_variants: int = 8
+    demucs_model: str = "htdemucs"
+    demucs_device: str | None = None
+    separation_segment_seconds: float = 30.0
+    separation_overlap_seconds: float = 1.0
+    separation_workers: int = 1  # Threads sharing one model; safe in prefork workers
+    separation_max_retries: int = 3
+    separation_max_redeliveries: int = 2  # After the worker was lost, e.g. OOM-killed
+    preview_demucs_model: str = "htdemucs"
+    # No pretrained Demucs is cheaper than htdemucs (the others are bags of
+    # four); previews skip its overlapping split passes instead
+    preview_split_overlap: float = 0.0
+    preview_duration_seconds: float = 30.0
+    preview_max_duration_seconds: float = 60.0
+    preview_max_windows: int = 5  # Rendered windows kept per project; the oldest are evicted
+    stem_cache_enabled: bool = True
+    stem_cache_max_mb: int = 10240
+    sse_heartbeat_seconds: int = 15
+    progress_interval_seconds: float = 0.5
+    progress_db_interval_seconds: float = 5.0
+    separation_time_limit: int = 3600
+    mixing_time_limit: int = 600
+    training_time_limit: int = 14400
+    preview_time_limit: int = 120
+    job_idempotency_ttl_seconds: int = 7200
+    worker_warmup: str = "audio"  # Comma-separated: audio, demucs, preview
+    free_max_concurrent_jobs: int = 1
+    pro_max_concurrent_jobs: int = 3
+    preview_max_concurrent_jobs: int = 2  # Per user, apart from the jobs above
+    scheduler_slot_ttl_seconds: int = 0  # 0 derives it from the task time limits
     debug: bool = False
     allowed_origins: str = "http://localhost:3000"
 
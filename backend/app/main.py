@@ -14,6 +14,7 @@ from app.db import init_db, close_db
 from app.api import api_router
 from app.extensions import limiter
 from app.utils.token_blacklist import close_redis
+from app.utils.progress_events import broadcaster
 
 # Context variable for request ID - async-safe per-request storage
 request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
@@ -45,6 +46,7 @@ async def lifespan(app: FastAPI):
     await init_db()
     yield
     logger.info("Shutting down...")
+    await broadcaster.close()
     await close_db()
     await close_redis()
 
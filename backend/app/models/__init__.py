@@ -3,10 +3,12 @@ from app.models.user import User, UserPlan
 from app.models.voice_persona import VoicePersona, PersonaStatus
 from app.models.project import Project, ProjectStatus, VocalMode
 from app.models.task import Task, TaskStatus, TaskType
+from app.models.blob import Blob
 
 __all__ = [
     "User", "UserPlan",
     "VoicePersona", "PersonaStatus",
     "Project", "ProjectStatus", "VocalMode",
     "Task", "TaskStatus", "TaskType",
+    "Blob",
 ]
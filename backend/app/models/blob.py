@@ -0,0 +1,20 @@
+"""Content-addressed blob model."""
+from datetime import datetime, timezone
+from sqlalchemy import String, DateTime, Integer, BigInteger
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db import Base
+
+
+class Blob(Base):
+    """A stored file, keyed by the SHA-256 of its content.
+
+    ``refcount`` counts the project originals and voice samples that point
+    at the file; it is removed from disk when the count drops to zero.
+    """
+    __tablename__ = "blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    ext: Mapped[str] = mapped_column(String(16), nullable=False, default="")
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    refcount: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
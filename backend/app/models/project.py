@@ -2,7 +2,7 @@
 import uuid
 import enum
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, Enum, ForeignKey, Text, Float
+from sqlalchemy import String, DateTime, Enum, ForeignKey, Text, Float, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.db import Base
@@ -41,6 +41,9 @@ class Project(Base):
     vocals_path: Mapped[str] = mapped_column(String(500), nullable=True)
     output_path: Mapped[str] = mapped_column(String(500), nullable=True)
     duration_seconds: Mapped[float] = mapped_column(Float, nullable=True)
+    sample_rate: Mapped[int] = mapped_column(Integer, nullable=True)
+    channels: Mapped[int] = mapped_column(Integer, nullable=True)
+    codec: Mapped[str] = mapped_column(String(50), nullable=True)
     mix_settings: Mapped[dict] = mapped_column(JSONB, default=dict)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
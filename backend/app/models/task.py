@@ -20,14 +20,16 @@ class TaskType(str, enum.Enum):
     VOICE_TRAINING = "voice_training"
     VOCAL_GENERATION = "vocal_generation"
     MIXING = "mixing"
+    PREVIEW = "preview"
+    MIX_VARIANTS = "mix_variants"
 
 
 class Task(Base):
     __tablename__ = "tasks"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=True)
-    voice_persona_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("voice_personas.id"), nullable=True)
+    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=True)
+    voice_persona_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("voice_personas.id", ondelete="CASCADE"), nullable=True)
     task_type: Mapped[TaskType] = mapped_column(Enum(TaskType), nullable=False)
     status: Mapped[TaskStatus] = mapped_column(Enum(TaskStatus), default=TaskStatus.PENDING)
     progress: Mapped[int] = mapped_column(Integer, default=0)
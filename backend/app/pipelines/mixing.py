@@ -1,9 +1,16 @@
 """Audio mixing pipeline."""
 import numpy as np
-import librosa
 import soundfile as sf
 from pathlib import Path
-from typing import Optional, Callable
+from typing import Optional, Callable, Dict, Iterator, List
+from app.pipelines.reverb import (
+    REVERB_BLOCK_FRAMES, PartitionedConvolver, Reverb, apply_reverb, synthetic_impulse_response,
+)
+from app.utils.audio import can_stream, iter_audio_blocks, load_audio, stream_frames
+from app.utils.waveform import PeakBuilder
+
+MIX_SAMPLE_RATE = 44100
+PEAK_CEILING = 0.95
 
 
 def mix_tracks(
@@ -13,21 +20,43 @@ def mix_tracks(
     vocal_level: float = 0.0,
     reverb_amount: float = 0.2,
     progress_callback: Optional[Callable[[int, str], None]] = None,
+    streaming: bool = False,
+    block_frames: int = 65536,
+    offset: float = 0.0,
+    duration: Optional[float] = None,
 ) -> str:
-    """Mix instrumental and vocal tracks."""
+    """Mix instrumental and vocal tracks.
+
+    With ``streaming=True`` the tracks are mixed in fixed-size blocks so peak
+    memory does not depend on track length. Streaming needs inputs soundfile
+    can read (or a canonical sidecar); other inputs fall back to the
+    in-memory path.
+
+    ``reverb_amount`` (0-1) is the wet/dry ratio of a convolution reverb on
+    the vocal. ``offset`` and ``duration`` (seconds) mix only that window of
+    both tracks, e.g. for a preview.
+    """
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
 
+    if streaming and can_stream(instrumental_path) and can_stream(vocal_path):
+        return _mix_tracks_streaming(
+            instrumental_path,
+            vocal_path,
+            output_path,
+            vocal_level=vocal_level,
+            reverb_amount=reverb_amount,
+            block_frames=block_frames,
+            progress_callback=progress_callback,
+            offset=offset,
+            duration=duration,
+        )
+
     if progress_callback:
         progress_callback(10, "Loading tracks...")
 
     # Load audio
-    instrumental, sr = librosa.load(instrumental_path, sr=44100, mono=False)
-    vocal, _ = librosa.load(vocal_path, sr=44100, mono=False)
-
-    if instrumental.ndim == 1:
-        instrumental = np.stack([instrumental, instrumental])
-    if vocal.ndim == 1:
-        vocal = np.stack([vocal, vocal])
+    instrumental, sr = load_audio(instrumental_path, sr=MIX_SAMPLE_RATE, offset=offset, duration=duration)
+    vocal, _ = load_audio(vocal_path, sr=MIX_SAMPLE_RATE, offset=offset, duration=duration)
 
     if progress_callback:
         progress_callback(30, "Adjusting levels...")
@@ -36,6 +65,11 @@ def mix_tracks(
     vocal_gain = 10 ** (vocal_level / 20)
     vocal = vocal * vocal_gain
 
+    if progress_callback:
+        progress_callback(40, "Applying reverb...")
+
+    vocal = apply_reverb(vocal, reverb_amount, sr)
+
     if progress_callback:
         progress_callback(50, "Mixing...")
 
@@ -49,16 +83,284 @@ def mix_tracks(
 
     # Normalize
     max_val = np.max(np.abs(mixed))
-    if max_val > 0.95:
-        mixed = mixed * (0.95 / max_val)
+    if max_val > PEAK_CEILING:
+        mixed = mixed * (PEAK_CEILING / max_val)
 
     if progress_callback:
         progress_callback(80, "Saving...")
 
     # Save
     sf.write(output_path, mixed.T, sr)
+    peaks = PeakBuilder(sr)
+    peaks.update(mixed)
+    peaks.save(output_path)
+
+    if progress_callback:
+        progress_callback(100, "Done")
+
+    return output_path
+
+
+def _iter_mixed_blocks(
+    instrumental_path: str,
+    vocal_path: str,
+    vocal_gain: float,
+    reverb_amount: float,
+    block_frames: int,
+    offset: float = 0.0,
+    duration: Optional[float] = None,
+) -> Iterator[np.ndarray]:
+    """Yield gained, reverberated and summed blocks, truncated to the shorter track."""
+    # Reverb partitions must line up with the blocks to match the in-memory path
+    block_frames = -(-block_frames // REVERB_BLOCK_FRAMES) * REVERB_BLOCK_FRAMES
+    reverb = None
+    blocks = zip(
+        iter_audio_blocks(instrumental_path, block_frames, MIX_SAMPLE_RATE, offset, duration),
+        iter_audio_blocks(vocal_path, block_frames, MIX_SAMPLE_RATE, offset, duration),
+    )
+    for instrumental, vocal in blocks:
+        vocal = vocal * vocal_gain
+        if reverb_amount > 0:
+            reverb = reverb or Reverb(reverb_amount, MIX_SAMPLE_RATE, vocal.shape[0])
+            vocal = reverb.process(vocal)
+        n = min(instrumental.shape[1], vocal.shape[1])
+        yield instrumental[:, :n] + vocal[:, :n]
+
+
+def _mix_tracks_streaming(
+    instrumental_path: str,
+    vocal_path: str,
+    output_path: str,
+    vocal_level: float,
+    reverb_amount: float,
+    block_frames: int,
+    progress_callback: Optional[Callable[[int, str], None]],
+    offset: float = 0.0,
+    duration: Optional[float] = None,
+) -> str:
+    """Two-pass block mix: find the peak, then scale and write.
+
+    Holds at most one block per input plus the reverb state in memory. The
+    arithmetic is the same sequence as the in-memory path, so output matches
+    it exactly. Reverb is recomputed in the second pass rather than buffered.
+    """
+    total_frames = min(
+        stream_frames(instrumental_path, MIX_SAMPLE_RATE, offset, duration),
+        stream_frames(vocal_path, MIX_SAMPLE_RATE, offset, duration),
+    )
+    vocal_gain = 10 ** (vocal_level / 20)
+
+    def mixed_blocks():
+        return _iter_mixed_blocks(
+            instrumental_path, vocal_path, vocal_gain, reverb_amount, block_frames, offset, duration
+        )
+
+    def report(base: int, span: int, done: int, message: str, last: list):
+        if not progress_callback or total_frames == 0:
+            return
+        progress = base + int(span * min(done, total_frames) / total_frames)
+        if progress - last[0] >= 5:
+            last[0] = progress
+            progress_callback(progress, message)
+
+    if progress_callback:
+        progress_callback(10, "Analyzing levels...")
+
+    # Pass 1: running peak of the unnormalized mix
+    peak = 0.0
+    channels = None
+    done, last = 0, [10]
+    for block in mixed_blocks():
+        channels = block.shape[0]
+        if block.size:
+            peak = max(peak, float(np.max(np.abs(block))))
+        done += block.shape[1]
+        report(10, 40, done, "Analyzing levels...", last)
+
+    scale = PEAK_CEILING / np.float32(peak) if peak > PEAK_CEILING else None
+
+    if progress_callback:
+        progress_callback(50, "Mixing...")
+
+    # Pass 2: scale and write
+    done, last = 0, [50]
+    peaks = PeakBuilder(MIX_SAMPLE_RATE)
+    with sf.SoundFile(output_path, "w", samplerate=MIX_SAMPLE_RATE, channels=channels or 2) as out:
+        for block in mixed_blocks():
+            if scale is not None:
+                block = block * scale
+            out.write(block.T)
+            peaks.update(block)
+            done += block.shape[1]
+            report(50, 45, done, "Mixing...", last)
+    peaks.save(output_path)
+
+    if progress_callback:
+        progress_callback(100, "Done")
+
+    return output_path
+
+
+def mix_variants(
+    instrumental_path: str,
+    vocal_path: str,
+    output_paths: List[str],
+    variants: List[Dict[str, float]],
+    progress_callback: Optional[Callable[[int, str], None]] = None,
+    block_frames: int = 65536,
+) -> List[str]:
+    """Render several mixes of one instrumental/vocal pair from a single decode.
+
+    Each variant is a mix settings dict (``vocal_level``, ``reverb_amount``).
+    Reverb is linear, so the wet vocal is convolved once and each variant
+    only scales it: ``gain * ((1 - amount) * dry + amount * wet)``; every
+    variant is computed from the same block with broadcast gains.
+
+    The first pass decodes the inputs, reverberates the vocal and finds each
+    variant's peak, spilling the decoded blocks to a raw float32 scratch
+    file beside the first output. The second pass normalizes and writes the
+    variants from that file, so neither decoding nor the convolution is
+    repeated.
+    """
+    if len(output_paths) != len(variants):
+        raise ValueError("Each variant needs exactly one output path")
+    for output_path in output_paths:
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+    gains = np.array([10 ** (v.get("vocal_level", 0.0) / 20) for v in variants], dtype=np.float32)
+    amounts = np.clip([v.get("reverb_amount", 0.2) for v in variants], 0.0, 1.0).astype(np.float32)
+    dry_coef = (gains * (1 - amounts))[:, None, None]
+    wet_coef = (gains * amounts)[:, None, None]
+    use_reverb = bool(np.any(amounts > 0))
+
+    total_frames = min(
+        stream_frames(instrumental_path, MIX_SAMPLE_RATE),
+        stream_frames(vocal_path, MIX_SAMPLE_RATE),
+    )
+    block_frames = -(-block_frames // REVERB_BLOCK_FRAMES) * REVERB_BLOCK_FRAMES
+
+    def render(tracks: np.ndarray) -> np.ndarray:
+        # tracks: (instrumental, dry vocal[, wet vocal]) -> (variants, channels, frames)
+        mixed = tracks[0][None] + dry_coef * tracks[1]
+        if use_reverb:
+            mixed += wet_coef * tracks[2]
+        return mixed
+
+    def report(base: int, done: int, message: str, last: list):
+        if progress_callback and total_frames:
+            progress = base + int(40 * min(done, total_frames) / total_frames)
+            if progress - last[0] >= 5:
+                last[0] = progress
+                progress_callback(progress, message)
+
+    if progress_callback:
+        progress_callback(10, "Analyzing levels...")
+
+    # Pass 1: decode once, spill the aligned tracks and track each variant's peak
+    peaks = np.zeros(len(variants), dtype=np.float32)
+    shapes = []
+    convolver = None
+    done, last = 0, [10]
+    scratch_path = f"{output_paths[0]}.variants.tmp"
+    try:
+        with open(scratch_path, "w+b") as scratch:
+            blocks = zip(
+                iter_audio_blocks(instrumental_path, block_frames, MIX_SAMPLE_RATE),
+                iter_audio_blocks(vocal_path, block_frames, MIX_SAMPLE_RATE),
+            )
+            for instrumental, vocal in blocks:
+                n = min(instrumental.shape[1], vocal.shape[1])
+                parts = [instrumental[:, :n], vocal[:, :n]]
+                if use_reverb:
+                    if convolver is None:
+                        ir = synthetic_impulse_response(MIX_SAMPLE_RATE, channels=vocal.shape[0])
+                        convolver = PartitionedConvolver(ir)
+                    parts.append(convolver.process(vocal)[:, :n])
+                tracks = np.stack(parts).astype(np.float32, copy=False)
+                tracks.tofile(scratch)
+                shapes.append(tracks.shape)
+                if n:
+                    peaks = np.maximum(peaks, np.max(np.abs(render(tracks)), axis=(1, 2)))
+                done += n
+                report(10, done, "Analyzing levels...", last)
+
+            scales = np.where(peaks > PEAK_CEILING, PEAK_CEILING / np.maximum(peaks, PEAK_CEILING), 1.0)
+            scales = scales.astype(np.float32)[:, None, None]
+            channels = shapes[0][1] if shapes else 2
+
+            if progress_callback:
+                progress_callback(50, f"Rendering {len(variants)} variants...")
+
+            # Pass 2: normalize and write every variant from the spilled tracks
+            scratch.seek(0)
+            files = [
+                sf.SoundFile(path, "w", samplerate=MIX_SAMPLE_RATE, channels=channels)
+                for path in output_paths
+            ]
+            builders = [PeakBuilder(MIX_SAMPLE_RATE) for _ in output_paths]
+            try:
+                done, last = 0, [50]
+                for shape in shapes:
+                    tracks = np.fromfile(scratch, dtype=np.float32, count=int(np.prod(shape))).reshape(shape)
+                    block = render(tracks) * scales
+                    for f, builder, variant in zip(files, builders, block):
+                        f.write(variant.T)
+                        builder.update(variant)
+                    done += shape[2]
+                    report(50, done, f"Rendering {len(variants)} variants...", last)
+            finally:
+                for f in files:
+                    f.close()
+    finally:
+        Path(scratch_path).unlink(missing_ok=True)
+    for builder, output_path in zip(builders, output_paths):
+        builder.save(output_path)
 
     if progress_callback:
         progress_callback(100, "Done")
 
+    return output_paths
+
+
+def sum_tracks(
+    input_paths: List[str],
+    output_path: str,
+    block_frames: int = 65536,
+    offset: float = 0.0,
+    duration: Optional[float] = None,
+    peak_ceiling: Optional[float] = None,
+) -> str:
+    """Sum tracks block by block, e.g. non-vocal stems into an instrumental.
+
+    Written as float WAV so the sum is not clipped. ``offset`` and
+    ``duration`` (seconds) sum only that window. With ``peak_ceiling`` a
+    sum peaking above it is scaled down in place afterwards, like a mix.
+    """
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    peaks = PeakBuilder(MIX_SAMPLE_RATE)
+    peak = 0.0
+    blocks = zip(*(
+        iter_audio_blocks(path, block_frames, MIX_SAMPLE_RATE, offset, duration) for path in input_paths
+    ))
+    with sf.SoundFile(output_path, "w", samplerate=MIX_SAMPLE_RATE, channels=2, subtype="FLOAT") as out:
+        for group in blocks:
+            n = min(block.shape[1] for block in group)
+            total = np.sum([block[:2, :n] for block in group], axis=0)
+            out.write(total.T)
+            peaks.update(total)
+            if total.size:
+                peak = max(peak, float(np.max(np.abs(total))))
+
+    if peak_ceiling is not None and peak > peak_ceiling:
+        # Rescale the written float samples rather than decoding the inputs again
+        scale = np.float32(peak_ceiling) / np.float32(peak)
+        peaks = PeakBuilder(MIX_SAMPLE_RATE)
+        with sf.SoundFile(output_path, "r+") as out:
+            for start in range(0, out.frames, block_frames):
+                out.seek(start)
+                block = out.read(block_frames, dtype="float32", always_2d=True).T * scale
+                out.seek(start)
+                out.write(block.T)
+                peaks.update(block)
+    peaks.save(output_path)
     return output_path
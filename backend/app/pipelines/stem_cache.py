@@ -0,0 +1,136 @@
+"""Content-addressed cache of separated stems."""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+from app.config import settings
+from app.utils.waveform import peaks_path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "stems.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _link_or_copy(src: str, dst: Path):
+    """Hard-link ``src`` to ``dst``, copying when linking is not possible."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class StemCache:
+    """Size-bounded LRU cache of stems keyed by input content and model.
+
+    Each entry is a directory holding the stem files and a manifest; the
+    manifest's mtime records the last access for eviction. Stems are handed
+    out as hard links, so evicting an entry never removes a project's files.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key_for(self, input_path: str, model_name: str) -> str:
+        """Hash the input file bytes together with the model name."""
+        digest = hashlib.sha256()
+        with open(input_path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        digest.update(f"\0{model_name}".encode())
+        return digest.hexdigest()
+
+    def get(self, key: str, stems_dir: Path) -> Optional[Dict[str, str]]:
+        """Materialize a cached entry into ``stems_dir`` and return the stem paths."""
+        entry = self.root / key
+        manifest = entry / MANIFEST_NAME
+        try:
+            names = json.loads(manifest.read_text())
+            # Stems plus their sidecars (waveform peaks)
+            for cached in entry.iterdir():
+                if cached.name != MANIFEST_NAME:
+                    _link_or_copy(str(cached), Path(stems_dir) / cached.name)
+            stems = {name: str(Path(stems_dir) / filename) for name, filename in names.items()}
+            os.utime(manifest)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return stems
+
+    def put(self, key: str, stems: Dict[str, str]):
+        """Store stems under ``key`` and evict old entries past the size limit."""
+        entry = self.root / key
+        if (entry / MANIFEST_NAME).exists():
+            return
+
+        staging = self.root / f".tmp-{uuid.uuid4().hex}"
+        try:
+            names = {}
+            for name, path in stems.items():
+                filename = Path(path).name
+                _link_or_copy(path, staging / filename)
+                if peaks_path(path).exists():
+                    _link_or_copy(str(peaks_path(path)), staging / peaks_path(path).name)
+                names[name] = filename
+            (staging / MANIFEST_NAME).write_text(json.dumps(names))
+            os.rename(staging, entry)
+        except OSError as e:
+            # Another worker stored the same key first, or the disk is full
+            logger.warning(f"Failed to cache stems {key}: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits ``max_bytes``."""
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            manifest = entry / MANIFEST_NAME
+            try:
+                accessed = manifest.stat().st_mtime
+                size = sum(f.stat().st_size for f in entry.iterdir())
+            except OSError:
+                continue
+            entries.append((accessed, size, entry))
+            total += size
+
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_stem_cache: StemCache | None = None
+
+
+def get_stem_cache() -> StemCache:
+    """Get or create the stem cache for this process."""
+    global _stem_cache
+    if _stem_cache is None:
+        root = Path(settings.storage_path) / "cache" / "stems"
+        root.mkdir(parents=True, exist_ok=True)
+        _stem_cache = StemCache(root, settings.stem_cache_max_mb * 1024 * 1024)
+    return _stem_cache
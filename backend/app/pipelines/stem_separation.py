@@ -1,8 +1,288 @@
 """Stem separation using Demucs."""
+import hashlib
+import json
+import logging
 import os
-import subprocess
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+import soundfile as sf
 from pathlib import Path
-from typing import Dict, Optional, Callable
+from typing import Dict, List, Optional, Callable, Tuple
+from app.config import settings
+from app.utils.audio import load_audio
+from app.utils.waveform import PeakBuilder
+
+logger = logging.getLogger(__name__)
+
+STEM_NAMES = ["vocals", "drums", "bass", "other"]
+# Overlap of the windows Demucs splits a segment into; each overlap costs
+# extra model passes in exchange for smoother window boundaries
+SPLIT_OVERLAP = 0.25
+
+
+def plan_segments(total_frames: int, segment_frames: int, overlap_frames: int) -> List[Tuple[int, int]]:
+    """Split ``total_frames`` into ``(start, end)`` segments that overlap by ``overlap_frames``."""
+    if overlap_frames >= segment_frames:
+        raise ValueError("Segment overlap must be shorter than the segment")
+    if total_frames <= segment_frames:
+        return [(0, total_frames)]
+
+    hop = segment_frames - overlap_frames
+    segments = []
+    start = 0
+    while start + segment_frames < total_frames:
+        segments.append((start, start + segment_frames))
+        start += hop
+    # The last segment keeps the full overlap with its predecessor
+    segments.append((start, total_frames))
+    return segments
+
+
+class StemStitcher:
+    """Write separated segments to per-stem files, cross-fading the overlaps.
+
+    Segments may be added in any order; each is stitched as soon as all
+    earlier segments have arrived. Only out-of-order segments and the overlap
+    tail of the last stitched segment are kept in memory.
+    """
+
+    def __init__(
+        self,
+        stems_dir: Path,
+        sources: List[str],
+        samplerate: int,
+        channels: int,
+        segments: List[Tuple[int, int]],
+    ):
+        self.stems_dir = Path(stems_dir)
+        self.sources = sources
+        self.samplerate = samplerate
+        self.channels = channels
+        self.segments = segments
+        self._files: Dict[str, sf.SoundFile] = {}
+        self._peaks: Dict[str, PeakBuilder] = {}
+        self._pending: Dict[int, np.ndarray] = {}
+        self._next = 0
+        self._tail: Optional[np.ndarray] = None
+
+    def __enter__(self) -> "StemStitcher":
+        self.stems_dir.mkdir(parents=True, exist_ok=True)
+        for name in self.sources:
+            self._files[name] = sf.SoundFile(
+                str(self.stems_dir / f"{name}.wav"), "w",
+                samplerate=self.samplerate, channels=self.channels,
+            )
+            self._peaks[name] = PeakBuilder(self.samplerate)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        self._pending.clear()
+        self._tail = None
+        if exc_type is None and self._next != len(self.segments):
+            raise RuntimeError(f"Only {self._next} of {len(self.segments)} segments were stitched")
+        if exc_type is None:
+            for name, path in self.paths.items():
+                self._peaks[name].save(path)
+
+    @property
+    def paths(self) -> Dict[str, str]:
+        return {name: str(self.stems_dir / f"{name}.wav") for name in self.sources}
+
+    def add(self, index: int, stems: np.ndarray):
+        """Add the separated ``(sources, channels, frames)`` array for segment ``index``."""
+        self._pending[index] = stems
+        while self._next in self._pending:
+            self._stitch(self._next, self._pending.pop(self._next))
+            self._next += 1
+
+    def _stitch(self, index: int, stems: np.ndarray):
+        start, end = self.segments[index]
+        overlap = self.segments[index - 1][1] - start if index > 0 else 0
+        if overlap:
+            fade_in = (np.arange(overlap, dtype=np.float32) + 0.5) / overlap
+            self._write(self._tail * (1 - fade_in) + stems[..., :overlap] * fade_in)
+
+        next_overlap = end - self.segments[index + 1][0] if index + 1 < len(self.segments) else 0
+        body_end = stems.shape[-1] - next_overlap
+        self._write(stems[..., overlap:body_end])
+        self._tail = stems[..., body_end:] if next_overlap else None
+
+    def _write(self, stems: np.ndarray):
+        if stems.shape[-1] == 0:
+            return
+        for name, stem in zip(self.sources, stems):
+            self._files[name].write(stem.T)
+            self._peaks[name].update(stem)
+
+
+class SegmentCheckpoints:
+    """Separated segments persisted so an interrupted separation can resume.
+
+    Each segment's raw ``(sources, channels, frames)`` output is stored as
+    ``segment_{index}.npy``, written atomically. A fingerprint of the input
+    and segment plan guards against reusing segments of a different run.
+    """
+
+    MANIFEST_NAME = "checkpoint.json"
+
+    def __init__(self, directory: Path, fingerprint: str):
+        self.directory = Path(directory)
+        self.fingerprint = fingerprint
+        manifest = self.directory / self.MANIFEST_NAME
+        try:
+            stale = json.loads(manifest.read_text()).get("fingerprint") != fingerprint
+        except (OSError, ValueError):
+            stale = True
+        if stale:
+            self.clear()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            manifest.write_text(json.dumps({"fingerprint": fingerprint}))
+
+    @staticmethod
+    def fingerprint_for(
+        input_path: str, model_name: str, segments: List[Tuple[int, int]], offset: float = 0.0
+    ) -> str:
+        stat = os.stat(input_path)
+        key = json.dumps([os.path.abspath(input_path), stat.st_size, stat.st_mtime_ns, model_name, segments, offset])
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _path(self, index: int) -> Path:
+        return self.directory / f"segment_{index:05d}.npy"
+
+    def completed(self) -> List[int]:
+        return sorted(int(p.stem.split("_")[1]) for p in self.directory.glob("segment_*.npy"))
+
+    def load(self, index: int) -> np.ndarray:
+        return np.load(self._path(index), mmap_mode="r")
+
+    def save(self, index: int, stems: np.ndarray):
+        path = self._path(index)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                np.save(f, stems)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class DemucsEngine:
+    """A Demucs model loaded once and kept resident in this process."""
+
+    def __init__(self, model_name: str = "htdemucs", device: Optional[str] = None):
+        try:
+            import torch
+            from demucs.pretrained import get_model
+        except ImportError as e:
+            raise RuntimeError(f"Demucs is not installed: {e}") from e
+
+        self.model_name = model_name
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        try:
+            self.model = get_model(model_name)
+        except Exception as e:
+            raise RuntimeError(f"Failed to load Demucs model {model_name}: {e}") from e
+        self.model.to(self.device)
+        self.model.eval()
+        self.samplerate: int = self.model.samplerate
+        self.channels: int = self.model.audio_channels
+        self.sources: List[str] = list(self.model.sources)
+
+    def separate_segment(
+        self, wav: np.ndarray, mean: float, std: float, overlap: float = SPLIT_OVERLAP
+    ) -> np.ndarray:
+        """Separate a ``(channels, frames)`` segment into ``(sources, channels, frames)``.
+
+        ``mean``/``std`` are the whole-track statistics Demucs normalizes with,
+        so every segment is scaled the same way. ``overlap`` is the overlap of
+        the model's split windows.
+        """
+        import torch
+        from demucs.apply import apply_model
+
+        mix = (torch.from_numpy(np.ascontiguousarray(wav)) - mean) / (std + 1e-8)
+        with torch.no_grad():
+            sources = apply_model(self.model, mix[None], device=self.device, split=True, overlap=overlap)[0]
+        sources = sources * (std + 1e-8) + mean
+        return sources.cpu().numpy().astype(np.float32, copy=False)
+
+
+_engines: Dict[Tuple[str, Optional[str]], DemucsEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(model_name: str = "htdemucs", device: Optional[str] = None) -> DemucsEngine:
+    """Get or load the resident engine for this process."""
+    key = (model_name, device)
+    with _engines_lock:
+        if key not in _engines:
+            logger.info(f"Loading Demucs model {model_name}")
+            _engines[key] = DemucsEngine(model_name, device)
+        return _engines[key]
+
+
+def stems_dir_for(input_path: str, output_dir: str, model_name: str) -> Path:
+    """Directory that ``separate_stems`` writes the stems of ``input_path`` to."""
+    return Path(output_dir) / model_name / Path(input_path).stem
+
+
+_pools: Dict[int, ThreadPoolExecutor] = {}
+
+
+def get_pool(workers: int) -> ThreadPoolExecutor:
+    """Get or start the separation thread pool for this process.
+
+    Segments run on threads sharing the resident engine: torch releases the
+    GIL during inference, so they separate concurrently without another copy
+    of the model. Threads, unlike child processes, also work inside Celery's
+    daemonic prefork workers.
+    """
+    with _engines_lock:
+        if workers not in _pools:
+            _pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="separation")
+        return _pools[workers]
+
+
+@contextmanager
+def _split_intra_op_threads(workers: int):
+    """Split torch's intra-op threads between ``workers`` concurrent segments for the block.
+
+    The thread count is process-wide, so it is restored afterwards for
+    everything else the worker runs.
+    """
+    try:
+        import torch
+    except ImportError:
+        yield
+        return
+    previous = torch.get_num_threads()
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+# A forked child inherits the pools but not their threads
+os.register_at_fork(after_in_child=_pools.clear)
+
+
+def shutdown_pools():
+    """Stop all separation pools."""
+    with _engines_lock:
+        for pool in _pools.values():
+            pool.shutdown(cancel_futures=True)
+        _pools.clear()
 
 
 def separate_stems(
@@ -11,34 +291,98 @@ def separate_stems(
     model_name: str = "htdemucs",
     device: Optional[str] = None,
     progress_callback: Optional[Callable[[int, str], None]] = None,
+    workers: int = 1,
+    checkpoint_dir: Optional[str] = None,
+    offset: float = 0.0,
+    duration: Optional[float] = None,
+    split_overlap: float = SPLIT_OVERLAP,
 ) -> Dict[str, str]:
-    """Separate audio into stems using Demucs."""
+    """Separate audio into stems using a resident Demucs model.
+
+    Stems are written to ``{output_dir}/{model_name}/{input_name}/{stem}.wav``.
+    With ``workers > 1`` the segments are separated concurrently on a thread
+    pool and stitched back in order as they complete.
+
+    With ``checkpoint_dir``, every separated segment is persisted there and a
+    rerun on the same input only separates the segments that are missing.
+    The checkpoints are removed once the stems are complete.
+
+    ``offset`` and ``duration`` (seconds) separate only that window of the
+    input, e.g. for a preview; the stems then cover just the window.
+    A lower ``split_overlap`` trades some quality for fewer model passes.
+    """
     Path(output_dir).mkdir(parents=True, exist_ok=True)
 
     if progress_callback:
-        progress_callback(10, "Starting stem separation...")
-
-    cmd = ["python", "-m", "demucs", "-n", model_name, "-o", output_dir, input_path]
-    if device:
-        cmd.extend(["-d", device])
+        progress_callback(5, "Loading model...")
 
-    try:
-        subprocess.run(cmd, check=True, capture_output=True)
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Demucs failed: {e.stderr.decode()}")
+    engine = get_engine(model_name, device)
 
     if progress_callback:
-        progress_callback(90, "Processing complete")
+        progress_callback(10, "Loading audio...")
+
+    wav, sr = load_audio(input_path, sr=engine.samplerate, offset=offset, duration=duration)
+    wav = wav[:engine.channels]
+    if wav.shape[1] == 0:
+        raise ValueError("No audio to separate in the requested window")
+    ref = wav.mean(axis=0)
+    mean, std = float(ref.mean()), float(ref.std())
+
+    segment_frames = int(settings.separation_segment_seconds * sr)
+    overlap_frames = min(int(settings.separation_overlap_seconds * sr), segment_frames - 1)
+    segments = plan_segments(wav.shape[1], segment_frames, overlap_frames)
+
+    checkpoints = None
+    if checkpoint_dir:
+        fingerprint = SegmentCheckpoints.fingerprint_for(input_path, model_name, segments, offset)
+        checkpoints = SegmentCheckpoints(Path(checkpoint_dir), fingerprint)
+
+    stems_dir = stems_dir_for(input_path, output_dir, model_name)
+    with StemStitcher(stems_dir, engine.sources, sr, wav.shape[0], segments) as stitcher:
+        done = 0
+
+        def add(index: int, stems: np.ndarray, resumed: bool = False):
+            nonlocal done
+            if checkpoints and not resumed:
+                checkpoints.save(index, stems)
+            stitcher.add(index, stems)
+            done += 1
+            if progress_callback:
+                progress = 10 + int(85 * done / len(segments))
+                progress_callback(progress, f"Separated segment {done}/{len(segments)}")
+
+        remaining = list(range(len(segments)))
+        if checkpoints:
+            resumed = set(checkpoints.completed()) & set(remaining)
+            if resumed:
+                logger.info(f"Resuming separation of {input_path}: {len(resumed)}/{len(segments)} segments done")
+            for i in sorted(resumed):
+                add(i, checkpoints.load(i), resumed=True)
+            remaining = [i for i in remaining if i not in resumed]
+
+        if workers > 1 and len(remaining) > 1:
+            pool = get_pool(workers)
+            with _split_intra_op_threads(workers):
+                futures = {
+                    pool.submit(engine.separate_segment, wav[:, start:end], mean, std, split_overlap): i
+                    for i, (start, end) in ((i, segments[i]) for i in remaining)
+                }
+                try:
+                    for future in as_completed(futures):
+                        add(futures[future], future.result())
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        else:
+            for i in remaining:
+                start, end = segments[i]
+                add(i, engine.separate_segment(wav[:, start:end], mean, std, split_overlap))
 
-    # Find output files
-    input_name = Path(input_path).stem
-    stems_dir = Path(output_dir) / model_name / input_name
+    if checkpoints:
+        checkpoints.clear()
 
-    stems = {}
-    for stem_name in ["vocals", "drums", "bass", "other"]:
-        stem_path = stems_dir / f"{stem_name}.wav"
-        if stem_path.exists():
-            stems[stem_name] = str(stem_path)
+    stems = {name: path for name, path in stitcher.paths.items() if name in STEM_NAMES}
 
     if progress_callback:
         progress_callback(100, "Done")
@@ -47,6 +47,9 @@ class ProjectResponse(BaseModel):
     status: ProjectStatus
     vocal_mode: VocalMode
     duration_seconds: Optional[float]
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    codec: Optional[str] = None
     mix_settings: Dict[str, Any]
     created_at: datetime
     updated_at: datetime
@@ -55,6 +58,15 @@ class ProjectResponse(BaseModel):
         from_attributes = True
 
 
+class MixVariant(BaseModel):
+    vocal_level: float = Field(0.0, ge=-60.0, le=24.0)
+    reverb_amount: float = Field(0.2, ge=0.0, le=1.0)
+
+
+class MixVariantsRequest(BaseModel):
+    variants: List[MixVariant] = Field(..., min_length=1)
+
+
 class PaginatedResponse(BaseModel, Generic[T]):
     """Generic paginated response."""
 
@@ -0,0 +1,21 @@
+"""Upload session schemas."""
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    content_type: str
+    size: int = Field(..., gt=0, description="Total file size in bytes")
+
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    size: int
+    chunk_size: int
+    total_chunks: int
+    offset: int
+    received_chunks: List[int]
+
+    class Config:
+        from_attributes = True
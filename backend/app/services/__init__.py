@@ -3,5 +3,7 @@ from app.services.auth import AuthService
 from app.services.user import UserService
 from app.services.voice_persona import VoicePersonaService
 from app.services.project import ProjectService
+from app.services.task import TaskService
+from app.services.job import JobService
 
-__all__ = ["AuthService", "UserService", "VoicePersonaService", "ProjectService"]
+__all__ = ["AuthService", "UserService", "VoicePersonaService", "ProjectService", "TaskService", "JobService"]
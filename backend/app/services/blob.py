@@ -0,0 +1,161 @@
+"""Content-addressed blob store."""
+import asyncio
+import glob
+import logging
+import os
+import shutil
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.blob import Blob
+from app.utils.storage import StoredUpload
+from app.utils.storage_backend import publish, remove
+
+logger = logging.getLogger(__name__)
+
+
+def blob_root() -> Path:
+    return Path(settings.storage_path) / "blobs"
+
+
+def blob_path(sha256: str, ext: str = "") -> Path:
+    """Where the blob with digest ``sha256`` lives, fanned out by digest prefix."""
+    return blob_root() / sha256[:2] / f"{sha256}{ext}"
+
+
+def blob_sha256(path: str) -> Optional[str]:
+    """The digest of the blob at ``path``, or None if ``path`` is not a blob."""
+    try:
+        relative = Path(os.path.realpath(path)).relative_to(os.path.realpath(blob_root()))
+    except ValueError:
+        return None
+    if len(relative.parts) != 2:
+        return None
+    sha256 = relative.parts[1].split(".", 1)[0]
+    return sha256 if len(sha256) == 64 and relative.parts[0] == sha256[:2] else None
+
+
+def in_blob_store(path: str) -> bool:
+    """Whether ``path`` is a blob or derived from one, i.e. shared rather than owned."""
+    return os.path.realpath(path).startswith(os.path.realpath(blob_root()) + os.sep)
+
+
+def stems_root(original_path: str) -> str:
+    """Output directory for the stems of ``original_path``, derived from it.
+
+    For a blob the stems are shared by every project with the same content
+    and live as long as the blob does.
+    """
+    return f"{original_path}.stems"
+
+
+class BlobService:
+    """Deduplicate stored files by content, with reference counts in the database.
+
+    Identical uploads share one file, and everything derived from it
+    (decoded sidecars, waveform peaks, stems), however many projects or
+    voice samples use it.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _lock(self, sha256: str):
+        """Serialize reference changes to one blob until the transaction ends.
+
+        Held across the file operations, so a blob's files never change
+        under a concurrent ingest or release of the same content.
+        """
+        await self.db.execute(select(func.pg_advisory_xact_lock(func.hashtextextended(sha256, 0))))
+
+    async def ingest(self, stored: StoredUpload) -> str:
+        """Take a reference to the blob for ``stored`` and return the blob's path.
+
+        The uploaded file becomes the blob if its content is new; otherwise
+        it is discarded in favor of the existing copy.
+        """
+        ext = Path(stored.path).suffix.lower()
+        try:
+            await self._lock(stored.sha256)
+            result = await self.db.execute(
+                insert(Blob)
+                .values(sha256=stored.sha256, ext=ext, size=stored.size, refcount=1)
+                .on_conflict_do_update(index_elements=[Blob.sha256], set_={"refcount": Blob.refcount + 1})
+                .returning(Blob.ext, Blob.refcount)
+            )
+            blob_ext, refcount = result.one()
+
+            target = blob_path(stored.sha256, blob_ext)
+            if refcount == 1 or not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(stored.path, target)
+                if refcount == 1:
+                    await asyncio.to_thread(publish, str(target))
+            else:
+                # Keep the existing file: its sidecars are only valid while its mtime stands
+                os.remove(stored.path)
+            await self.db.commit()
+        except BaseException:
+            await self.db.rollback()
+            raise
+        return str(target)
+
+    async def release(self, path: str) -> bool:
+        """Drop a reference to the blob at ``path``; False if it is not a blob.
+
+        The last reference removes the blob with everything derived from it.
+        """
+        sha256 = blob_sha256(path)
+        if sha256 is None:
+            return False
+        try:
+            await self._lock(sha256)
+            await self.db.execute(
+                update(Blob).where(Blob.sha256 == sha256, Blob.refcount > 0).values(refcount=Blob.refcount - 1)
+            )
+            result = await self.db.execute(delete(Blob).where(Blob.sha256 == sha256, Blob.refcount == 0))
+            if result.rowcount:
+                await asyncio.to_thread(_remove_blob_files, path)
+                try:
+                    await asyncio.to_thread(remove, path)
+                except Exception as e:
+                    logger.warning(f"Failed to delete stored blob {sha256}: {e}")
+            await self.db.commit()
+        except BaseException:
+            await self.db.rollback()
+            raise
+        return True
+
+    @asynccontextmanager
+    async def referenced(self, stored: StoredUpload) -> AsyncIterator[str]:
+        """Ingest ``stored`` for the block's body, which hands the reference on.
+
+        If the body fails, the reference is released again.
+        """
+        path = await self.ingest(stored)
+        try:
+            yield path
+        except Exception:
+            await self.db.rollback()
+            await self.release(path)
+            raise
+
+
+def _remove_blob_files(path: str):
+    """Remove a blob file, its ``{path}.*`` sidecars and derived directories, and checkpoints."""
+    sha256 = Path(path).name.split(".", 1)[0]
+    checkpoints = glob.glob(os.path.join(glob.escape(os.path.dirname(path)), ".checkpoints", f"{sha256}.*"))
+    for target in [path, *glob.glob(f"{glob.escape(path)}.*"), *checkpoints]:
+        try:
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            else:
+                os.remove(target)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning(f"Failed to delete blob file {target}: {e}")
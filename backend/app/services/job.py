@@ -0,0 +1,225 @@
+"""Background job dispatch."""
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+import redis
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.project import Project, VocalMode
+from app.models.task import Task, TaskStatus, TaskType
+from app.models.user import User
+from app.services.scheduler import PLAN_PRIORITIES, get_scheduler
+from app.services.task import TaskService
+from app.workers.celery_app import celery_app
+from app.utils.token_blacklist import get_redis
+from app.workers.pipeline import build_project_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Tasks are sent by name so the API never imports the audio pipelines
+TASK_NAMES = {
+    TaskType.STEM_SEPARATION: "app.workers.tasks.process_stems_task",
+    TaskType.MIXING: "app.workers.tasks.mix_project_task",
+    TaskType.PREVIEW: "app.workers.tasks.preview_task",
+    TaskType.MIX_VARIANTS: "app.workers.tasks.mix_variants_task",
+}
+
+IN_FLIGHT_STATUSES = {TaskStatus.PENDING, TaskStatus.RUNNING}
+# How long a duplicate waits for the first submission to commit its Task rows
+CLAIM_LOOKUP_ATTEMPTS = 10
+CLAIM_LOOKUP_DELAY_SECONDS = 0.05
+
+# Replace the claim only if it still names the job we found finished
+_REPLACE_CLAIM = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return false
+"""
+_RELEASE_CLAIM = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def idempotency_key(project_id: UUID, job: str, params: Dict[str, Any]) -> str:
+    """Key identifying a submission by project, job type and settings."""
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f"job_idempotency:{project_id}:{job}:{digest[:32]}"
+
+
+class JobService:
+    """Create ``Task`` rows and hand the matching Celery tasks to the scheduler.
+
+    The row is committed before the message is sent, so a worker picking the
+    job up straight away always finds it through ``celery_task_id``.
+
+    Submissions are idempotent per project, job type and settings: the first
+    one claims a key in Redis naming its celery ids, and duplicates arriving
+    while that job is pending or running get its ``Task`` rows back instead
+    of starting another job. A claim left by a finished job is taken over.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.tasks = TaskService(db)
+
+    async def submit(
+        self,
+        user: User,
+        task_type: TaskType,
+        kwargs: Dict[str, Any],
+        project_id: UUID = None,
+        lane: Optional[str] = None,
+    ) -> Task:
+        """Submit one job.
+
+        A ``lane`` (e.g. previews) is scheduled against its own per-user cap
+        instead of the plan's job cap.
+        """
+        celery_task_id = str(uuid.uuid4())
+        key = idempotency_key(project_id, task_type.value, kwargs) if project_id else None
+        existing = await self._claim(key, [celery_task_id])
+        if existing:
+            return existing[0]
+
+        try:
+            task = await self.tasks.create(
+                task_type,
+                project_id=project_id,
+                celery_task_id=celery_task_id,
+            )
+            signature = celery_app.signature(TASK_NAMES[task_type], kwargs=kwargs).set(
+                task_id=task.celery_task_id, priority=PLAN_PRIORITIES[user.plan]
+            )
+            await self._enqueue(
+                [task],
+                lambda: get_scheduler().submit(
+                    user.id, user.plan, task.celery_task_id, task.celery_task_id, signature, lane=lane
+                ),
+            )
+        except Exception:
+            await self._release(key, celery_task_id)
+            raise
+        return task
+
+    async def submit_pipeline(
+        self,
+        user: User,
+        project: Project,
+        project_dir: str,
+    ) -> List[Task]:
+        """Start the full stems -> mix workflow for a project.
+
+        Creates one ``Task`` row per tracked stage.
+        """
+        task_types = [TaskType.STEM_SEPARATION, TaskType.MIXING]
+        with_vocals = project.vocal_mode != VocalMode.REMOVE
+        celery_task_ids = [str(uuid.uuid4()) for _ in task_types]
+        key = idempotency_key(project.id, "pipeline", {
+            "original_path": project.original_path,
+            "mix_settings": project.mix_settings or {},
+            "with_vocals": with_vocals,
+        })
+        existing = await self._claim(key, celery_task_ids)
+        if existing:
+            return existing
+
+        try:
+            tasks = [
+                await self.tasks.create(
+                    task_type,
+                    project_id=project.id,
+                    celery_task_id=celery_task_id,
+                )
+                for task_type, celery_task_id in zip(task_types, celery_task_ids)
+            ]
+            workflow = build_project_pipeline(
+                str(project.id),
+                project.original_path,
+                project_dir,
+                str(Path(project_dir) / ".staging" / uuid.uuid4().hex),
+                {task.task_type: task.celery_task_id for task in tasks},
+                project.mix_settings or {},
+                with_vocals=with_vocals,
+                priority=PLAN_PRIORITIES[user.plan],
+            )
+            # The pipeline holds its scheduler slot until the mix stage ends
+            await self._enqueue(
+                tasks,
+                lambda: get_scheduler().submit(
+                    user.id, user.plan, tasks[-1].celery_task_id, tasks[0].celery_task_id, workflow
+                ),
+            )
+        except Exception:
+            await self._release(key, ",".join(celery_task_ids))
+            raise
+        return tasks
+
+    async def _claim(self, key: Optional[str], celery_task_ids: List[str]) -> Optional[List[Task]]:
+        """Claim ``key`` for a new job, or return the in-flight tasks already holding it.
+
+        Redis being unavailable disables deduplication rather than submission.
+        """
+        if key is None:
+            return None
+        value = ",".join(celery_task_ids)
+        ttl = settings.job_idempotency_ttl_seconds
+        try:
+            r = await get_redis()
+            for _ in range(3):
+                if await r.set(key, value, nx=True, ex=ttl):
+                    return None
+                holder = await r.get(key)
+                if holder is None:
+                    continue  # Expired in between
+                tasks = await self._wait_for_tasks(holder.split(","))
+                if not tasks:
+                    raise HTTPException(status_code=409, detail="Job is already being submitted")
+                if any(t.status in IN_FLIGHT_STATUSES for t in tasks) and not any(
+                    t.status == TaskStatus.FAILED for t in tasks
+                ):
+                    return sorted(tasks, key=lambda t: holder.index(t.celery_task_id))
+                if await r.eval(_REPLACE_CLAIM, 1, key, holder, value, ttl):
+                    return None
+        except redis.RedisError as e:
+            logger.warning(f"Job deduplication unavailable: {e}")
+            return None
+        raise HTTPException(status_code=409, detail="Job is already being submitted")
+
+    async def _wait_for_tasks(self, celery_task_ids: List[str]) -> List[Task]:
+        """Tasks of a claim, giving the claiming request a moment to commit them."""
+        for _ in range(CLAIM_LOOKUP_ATTEMPTS):
+            tasks = await self.tasks.get_by_celery_ids(celery_task_ids)
+            if tasks:
+                return tasks
+            await asyncio.sleep(CLAIM_LOOKUP_DELAY_SECONDS)
+        return []
+
+    async def _enqueue(self, tasks: List[Task], send: Callable[[], Any]):
+        try:
+            # Publishing talks to the broker; keep it off the event loop
+            await asyncio.to_thread(send)
+        except Exception as e:
+            logger.error(f"Failed to enqueue tasks {[str(task.id) for task in tasks]}: {e}")
+            for task in tasks:
+                await self.tasks.update_status(task.id, TaskStatus.FAILED, error="Failed to enqueue job")
+            raise HTTPException(status_code=503, detail="Job queue unavailable")
+
+    async def _release(self, key: Optional[str], value: str):
+        """Give up a claim after a failed submission, unless it was taken over."""
+        if key is None:
+            return
+        try:
+            r = await get_redis()
+            await r.eval(_RELEASE_CLAIM, 1, key, value)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to release job claim {key}: {e}")
@@ -1,15 +1,21 @@
 """Project service."""
+import asyncio
+import glob
 import os
 import shutil
 import logging
 from uuid import UUID
 from typing import List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
 from fastapi import HTTPException
 from app.models.project import Project, ProjectStatus
 from app.schemas.project import ProjectCreate, ProjectUpdate
+from app.services.blob import BlobService, in_blob_store
 from app.config import settings
+from app.utils.storage import get_file_path, project_subdir
+from app.utils.storage_backend import remove
+from app.workers.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
 
@@ -78,6 +84,59 @@ class ProjectService:
                     setattr(project, key, value)
             await self.db.commit()
 
+    async def update_fields(self, project_id: UUID, **fields):
+        """Update fields without touching the status, in a single UPDATE."""
+        await self.db.execute(update(Project).where(Project.id == project_id).values(**fields))
+        await self.db.commit()
+
+    async def attach_original(self, project_id: UUID, path: str):
+        """Make an uploaded file the project's original audio and return its stream info.
+
+        ``path`` is usually a blob the caller holds a reference to; the
+        reference to the previous original is dropped.
+        """
+        # Lazy import to avoid loading heavy audio dependencies at startup
+        from app.utils.audio import probe_audio
+        from app.utils.waveform import peaks_path
+
+        # Header probe is fast, but the decode fallback can block; keep it off the event loop
+        info = await asyncio.to_thread(probe_audio, path)
+        previous = (
+            await self.db.execute(select(Project.original_path).where(Project.id == project_id))
+        ).scalar_one_or_none()
+        await self.update_status(
+            project_id,
+            ProjectStatus.UPLOADING,
+            original_path=path,
+            duration_seconds=info.duration_seconds,
+            sample_rate=info.sample_rate,
+            channels=info.channels,
+            codec=info.codec,
+        )
+        if previous:
+            # The project already uses ``path``: a failure here must not undo that
+            try:
+                await BlobService(self.db).release(previous)
+            except Exception as e:
+                logger.warning(f"Failed to release previous original of project {project_id}: {e}")
+        # Peaks are shared with every project using the same blob. Computing
+        # them may need a full decode, so a worker does it; the waveform is
+        # unavailable until then.
+        if not await asyncio.to_thread(peaks_path(path).exists):
+            await self._queue_analysis(project_id, path)
+        return info
+
+    async def _queue_analysis(self, project_id: UUID, path: str):
+        signature = celery_app.signature(
+            "app.workers.tasks.analyze_audio_task", args=({"original": path},), kwargs={"project_id": str(project_id)}
+        )
+        try:
+            # Publishing talks to the broker; keep it off the event loop
+            await asyncio.to_thread(signature.apply_async)
+        except Exception as e:
+            # The project pipeline analyzes the original again
+            logger.warning(f"Failed to queue analysis of project {project_id}: {e}")
+
     def _is_safe_path(self, path: str) -> bool:
         """Check if path is within the allowed storage directory."""
         if not path:
@@ -92,7 +151,14 @@ class ProjectService:
     async def delete(self, project_id: UUID, user_id: UUID):
         project = await self.get_by_id(project_id, user_id)
 
-        # Clean up associated files with path traversal protection
+        # The project's tasks go with it (ON DELETE CASCADE). Files are only
+        # removed once the row is gone, so a failed delete loses nothing.
+        await self.db.delete(project)
+        await self.db.commit()
+
+        # Clean up associated files with path traversal protection. Blobs and
+        # what derives from them (stems, separation checkpoints) are shared:
+        # they only lose a reference, and go with the last one.
         file_paths = [
             project.original_path,
             project.stems_path,
@@ -100,14 +166,30 @@ class ProjectService:
             project.output_path,
         ]
         for path in file_paths:
-            if path and self._is_safe_path(path):
+            if path and self._is_safe_path(path) and not in_blob_store(path):
                 try:
                     if os.path.isfile(path):
                         os.remove(path)
+                        # Derived sidecars (decoded audio, stems, etc.) are named "{path}.*"
+                        for sidecar in glob.glob(f"{glob.escape(path)}.*"):
+                            if os.path.isdir(sidecar):
+                                shutil.rmtree(sidecar)
+                            else:
+                                os.remove(sidecar)
                     elif os.path.isdir(path):
                         shutil.rmtree(path)
                 except OSError as e:
                     logger.warning(f"Failed to delete file: {e}")
 
-        await self.db.delete(project)
-        await self.db.commit()
+        # Everything else in the project's storage: mixes and mix variants,
+        # previews, pipeline staging
+        project_dir = get_file_path(project_subdir(user_id, project_id))
+        if self._is_safe_path(str(project_dir)) and os.path.isdir(project_dir):
+            shutil.rmtree(project_dir, ignore_errors=True)
+        try:
+            await asyncio.to_thread(remove, str(project_dir))
+        except Exception as e:
+            logger.warning(f"Failed to delete stored files of project {project_id}: {e}")
+
+        if project.original_path:
+            await BlobService(self.db).release(project.original_path)
@@ -0,0 +1,254 @@
+"""Plan-aware fair-share admission of processing jobs.
+
+Jobs are handed to Celery only while their user is under the concurrent
+job cap of their plan; the rest wait in a per-user list in Redis. When a
+job finishes, on every submission and periodically (Celery beat, which also
+covers slots freed by expiry), held jobs are dispatched round-robin across
+users, so a user with a deep backlog cannot crowd out others. Dispatched
+jobs carry a Celery priority by plan (with the Redis transport, 0 is the
+highest priority). Previews are admitted the same way in a lane of their
+own, with a small per-user cap.
+
+Used synchronously from both the API (in a thread) and the workers.
+"""
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+import redis
+from celery.canvas import Signature
+from app.config import settings
+from app.models.user import UserPlan
+from app.workers.celery_app import (
+    HARD_LIMIT_GRACE_SECONDS,
+    QUEUE_PREVIEW,
+    QUEUE_TIME_LIMITS,
+    SCHEDULER_SLOT_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "scheduler:"
+# Previews get their own small per-user cap so they never wait behind full renders
+PREVIEW_LANE = "preview"
+LANE_SLOT_TTLS = {PREVIEW_LANE: QUEUE_TIME_LIMITS[QUEUE_PREVIEW] + HARD_LIMIT_GRACE_SECONDS}
+PLAN_PRIORITIES = {UserPlan.ADMIN: 0, UserPlan.PRO: 3, UserPlan.FREE: 6}
+WAIT_SAMPLES = 1000
+
+# KEYS: running, pending, ring, cap, metrics, job
+# ARGV: job_id, cap, entry, user_id, plan, slot_ttl
+_ADMIT = """
+local now = tonumber(redis.call('TIME')[1])
+local cap = tonumber(ARGV[2])
+redis.call('SET', KEYS[4], ARGV[2])
+redis.call('HINCRBY', KEYS[5], 'submitted', 1)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('LLEN', KEYS[2]) == 0 and (cap == 0 or redis.call('ZCARD', KEYS[1]) < cap) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[6]), ARGV[1])
+    redis.call('SET', KEYS[6], ARGV[4] .. '|' .. ARGV[5], 'EX', ARGV[6])
+    return 1
+end
+redis.call('RPUSH', KEYS[2], ARGV[3])
+if not redis.call('LPOS', KEYS[3], ARGV[4]) then
+    redis.call('RPUSH', KEYS[3], ARGV[4])
+end
+redis.call('HINCRBY', KEYS[5], 'held', 1)
+redis.call('HINCRBY', KEYS[5], 'pending', 1)
+return 0
+"""
+
+# KEYS: ring; ARGV: key prefix, slot_ttl
+_DISPATCH = """
+local now = tonumber(redis.call('TIME')[1])
+local prefix = ARGV[1]
+for _ = 1, redis.call('LLEN', KEYS[1]) do
+    local user = redis.call('LMOVE', KEYS[1], KEYS[1], 'LEFT', 'RIGHT')
+    if not user then
+        break
+    end
+    local pending = prefix .. 'pending:' .. user
+    local head = redis.call('LINDEX', pending, 0)
+    if not head then
+        redis.call('LREM', KEYS[1], 0, user)
+    else
+        local running = prefix .. 'running:' .. user
+        local cap = tonumber(redis.call('GET', prefix .. 'cap:' .. user) or '0')
+        redis.call('ZREMRANGEBYSCORE', running, '-inf', now)
+        if cap == 0 or redis.call('ZCARD', running) < cap then
+            local job = cjson.decode(head)
+            redis.call('LPOP', pending)
+            if redis.call('LLEN', pending) == 0 then
+                redis.call('LREM', KEYS[1], 0, user)
+            end
+            local ttl = tonumber(job.ttl or ARGV[2])
+            redis.call('ZADD', running, now + ttl, job.job_id)
+            redis.call('SET', prefix .. 'job:' .. job.job_id, user .. '|' .. job.plan, 'EX', ttl)
+            redis.call('HINCRBY', prefix .. 'metrics:' .. job.plan, 'pending', -1)
+            return head
+        end
+    end
+end
+return false
+"""
+
+# KEYS: job; ARGV: key prefix, job_id
+_RELEASE = """
+local owner = redis.call('GET', KEYS[1])
+if not owner then
+    return false
+end
+redis.call('DEL', KEYS[1])
+local user = string.match(owner, '^([^|]+)')
+redis.call('ZREM', ARGV[1] .. 'running:' .. user, ARGV[2])
+return owner
+"""
+
+
+def plan_cap(plan: UserPlan, lane: Optional[str] = None) -> int:
+    """Concurrent jobs allowed for a plan in a lane; 0 means unlimited."""
+    if plan == UserPlan.ADMIN:
+        return 0
+    if lane == PREVIEW_LANE:
+        return settings.preview_max_concurrent_jobs
+    return {
+        UserPlan.FREE: settings.free_max_concurrent_jobs,
+        UserPlan.PRO: settings.pro_max_concurrent_jobs,
+    }.get(plan, 0)
+
+
+def _percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class JobScheduler:
+    """Admit, hold and dispatch jobs (Celery signatures) per user and plan."""
+
+    def __init__(self, client: redis.Redis, app):
+        self.redis = client
+        self.app = app
+        self._admit = client.register_script(_ADMIT)
+        self._dispatch = client.register_script(_DISPATCH)
+        self._release = client.register_script(_RELEASE)
+
+    def submit(
+        self,
+        user_id: UUID,
+        plan: UserPlan,
+        job_id: str,
+        start_id: str,
+        signature: Signature,
+        lane: Optional[str] = None,
+    ) -> bool:
+        """Send ``signature`` now if the user has a free slot, otherwise hold it.
+
+        ``job_id`` is the task whose end frees the slot and ``start_id`` the
+        task whose start ends the queue wait (the same task for single jobs).
+        A ``lane`` has slots of its own, capped separately from the user's jobs.
+        Returns whether the job was dispatched immediately. Without Redis the
+        job is sent unscheduled. Jobs held earlier are dispatched first if
+        slots have since expired.
+        """
+        user = f"{user_id}:{lane}" if lane else str(user_id)
+        plan = UserPlan(plan).value
+        ttl = LANE_SLOT_TTLS.get(lane, SCHEDULER_SLOT_TTL_SECONDS)
+        entry = json.dumps({"job_id": job_id, "plan": plan, "ttl": ttl, "signature": signature})
+        try:
+            self.redis.set(f"{KEY_PREFIX}start:{start_id}", f"{plan}|{time.time()}", ex=ttl)
+            admitted = self._admit(
+                keys=[
+                    f"{KEY_PREFIX}running:{user}",
+                    f"{KEY_PREFIX}pending:{user}",
+                    f"{KEY_PREFIX}ring",
+                    f"{KEY_PREFIX}cap:{user}",
+                    f"{KEY_PREFIX}metrics:{plan}",
+                    f"{KEY_PREFIX}job:{job_id}",
+                ],
+                args=[job_id, plan_cap(UserPlan(plan), lane), entry, user, plan, ttl],
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Scheduler unavailable, sending job {job_id} directly: {e}")
+            admitted = True
+
+        if admitted:
+            try:
+                signature.apply_async()
+            except Exception:
+                self.release(job_id, dispatch=False)
+                raise
+        try:
+            self.dispatch_pending()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to dispatch held jobs: {e}")
+        return bool(admitted)
+
+    def release(self, job_id: str, dispatch: bool = True) -> bool:
+        """Free the slot held by ``job_id`` (a no-op for unscheduled tasks) and dispatch waiting jobs."""
+        owner = self._release(keys=[f"{KEY_PREFIX}job:{job_id}"], args=[KEY_PREFIX, job_id])
+        if owner and dispatch:
+            self.dispatch_pending()
+        return bool(owner)
+
+    def dispatch_pending(self) -> int:
+        """Dispatch held jobs round-robin across users until no user has a free slot."""
+        dispatched = 0
+        while True:
+            head = self._dispatch(keys=[f"{KEY_PREFIX}ring"], args=[KEY_PREFIX, SCHEDULER_SLOT_TTL_SECONDS])
+            if not head:
+                return dispatched
+            job = json.loads(head)
+            try:
+                self.app.signature(job["signature"]).apply_async()
+                dispatched += 1
+            except Exception as e:
+                logger.error(f"Failed to dispatch held job {job['job_id']}: {e}")
+                self.release(job["job_id"], dispatch=False)
+
+    def record_start(self, task_id: str):
+        """Record the queue wait of a job whose first task just started."""
+        marker = self.redis.getdel(f"{KEY_PREFIX}start:{task_id}")
+        if not marker:
+            return
+        plan, submitted_at = marker.split("|")
+        waits = f"{KEY_PREFIX}waits:{plan}"
+        pipe = self.redis.pipeline()
+        pipe.lpush(waits, round(time.time() - float(submitted_at), 3))
+        pipe.ltrim(waits, 0, WAIT_SAMPLES - 1)
+        pipe.hincrby(f"{KEY_PREFIX}metrics:{plan}", "started", 1)
+        pipe.execute()
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-plan counters and queue wait percentiles over recent jobs."""
+        result = {}
+        for plan in UserPlan:
+            counters = self.redis.hgetall(f"{KEY_PREFIX}metrics:{plan.value}")
+            waits = [float(w) for w in self.redis.lrange(f"{KEY_PREFIX}waits:{plan.value}", 0, -1)]
+            result[plan.value] = {
+                "max_concurrent_jobs": plan_cap(plan),
+                "priority": PLAN_PRIORITIES[plan],
+                "submitted": int(counters.get("submitted", 0)),
+                "held": int(counters.get("held", 0)),
+                "pending": int(counters.get("pending", 0)),
+                "started": int(counters.get("started", 0)),
+                "wait_seconds_p50": _percentile(waits, 0.5),
+                "wait_seconds_p95": _percentile(waits, 0.95),
+                "wait_seconds_max": max(waits) if waits else None,
+            }
+        return result
+
+
+_scheduler: JobScheduler | None = None
+
+
+def get_scheduler() -> JobScheduler:
+    """Get or create the scheduler for this process."""
+    global _scheduler
+    if _scheduler is None:
+        from app.workers.celery_app import celery_app
+
+        client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+        _scheduler = JobScheduler(client, celery_app)
+    return _scheduler
@@ -1,7 +1,7 @@
 """Task service."""
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from app.models.task import Task, TaskStatus, TaskType
 
 
@@ -9,8 +9,19 @@ class TaskService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def create(self, task_type: TaskType, project_id: UUID = None, voice_persona_id: UUID = None) -> Task:
-        task = Task(task_type=task_type, project_id=project_id, voice_persona_id=voice_persona_id)
+    async def create(
+        self,
+        task_type: TaskType,
+        project_id: UUID = None,
+        voice_persona_id: UUID = None,
+        celery_task_id: str = None,
+    ) -> Task:
+        task = Task(
+            task_type=task_type,
+            project_id=project_id,
+            voice_persona_id=voice_persona_id,
+            celery_task_id=celery_task_id,
+        )
         self.db.add(task)
         await self.db.commit()
         await self.db.refresh(task)
@@ -27,6 +38,33 @@ class TaskService:
                 task.error_message = error
             await self.db.commit()
 
+    async def update_by_celery_id(
+        self, celery_task_id: str, status: TaskStatus, progress: int = None, error: str = None
+    ):
+        """Update a task from its worker, in a single UPDATE statement."""
+        values = {"status": status}
+        if progress is not None:
+            values["progress"] = progress
+        if error:
+            values["error_message"] = error
+        await self.db.execute(update(Task).where(Task.celery_task_id == celery_task_id).values(**values))
+        await self.db.commit()
+
+    async def cancel_pending(self, celery_task_ids: list[str], error: str):
+        """Fail tasks that never started, e.g. later stages of a failed pipeline."""
+        await self.db.execute(
+            update(Task)
+            .where(Task.celery_task_id.in_(celery_task_ids), Task.status == TaskStatus.PENDING)
+            .values(status=TaskStatus.FAILED, error_message=error)
+        )
+        await self.db.commit()
+
+    async def get_by_celery_ids(self, celery_task_ids: list[str]) -> list[Task]:
+        result = await self.db.execute(select(Task).where(Task.celery_task_id.in_(celery_task_ids)))
+        return list(result.scalars().all())
+
     async def get_by_project(self, project_id: UUID) -> list[Task]:
-        result = await self.db.execute(select(Task).where(Task.project_id == project_id))
+        result = await self.db.execute(
+            select(Task).where(Task.project_id == project_id).order_by(Task.created_at.desc())
+        )
         return list(result.scalars().all())
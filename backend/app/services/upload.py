@@ -0,0 +1,307 @@
+"""Resumable chunked uploads."""
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+from uuid import UUID
+import aiofiles
+import redis
+from fastapi import HTTPException
+from app.config import settings
+from app.utils.storage import StoredUpload, validate_audio_metadata
+from app.utils.storage_backend import get_storage_backend, remove
+from app.utils.token_blacklist import get_redis
+
+KEY_PREFIX = "upload_session:"
+HASH_CHUNK_SIZE = 1024 * 1024
+PARTS_SUBDIR = "uploads"
+
+# What a finished upload is handed to
+TARGET_PROJECT = "project"
+TARGET_VOICE_SAMPLE = "voice_sample"
+
+
+def parts_dir() -> Path:
+    """Directory holding the files of uploads in progress."""
+    return Path(settings.storage_path) / PARTS_SUBDIR
+
+
+@dataclass(frozen=True)
+class UploadSession:
+    """An upload in progress, split into fixed-size numbered chunks."""
+    id: str
+    user_id: str
+    target: str
+    target_id: str
+    subdir: str
+    filename: str
+    content_type: str
+    size: int
+    chunk_size: int
+    received_chunks: List[int]
+
+    @property
+    def total_chunks(self) -> int:
+        return -(-self.size // self.chunk_size)
+
+    @property
+    def offset(self) -> int:
+        """Bytes received contiguously from the start of the file."""
+        received = set(self.received_chunks)
+        index = 0
+        while index in received:
+            index += 1
+        return min(index * self.chunk_size, self.size)
+
+    @property
+    def part_path(self) -> Path:
+        return parts_dir() / f"{self.id}.part"
+
+    @property
+    def chunks_path(self) -> Path:
+        """Where the chunks live as separate files in a remote storage backend."""
+        return parts_dir() / self.id
+
+    def chunk_key(self, index: int) -> str:
+        return f"{PARTS_SUBDIR}/{self.id}/{index:06d}"
+
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+
+@contextmanager
+def _redis_available():
+    try:
+        yield
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Upload sessions unavailable") from None
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _create_part(session: UploadSession, preallocate: bool):
+    """Create the part file's directory and, if ``preallocate``, the file at its full size."""
+    session.part_path.parent.mkdir(parents=True, exist_ok=True)
+    if preallocate:
+        with open(session.part_path, "wb") as f:
+            f.truncate(session.size)
+
+
+def _assemble(session: UploadSession, filepath: Path) -> str:
+    """Concatenate the session's stored chunks into ``filepath``; returns its sha256."""
+    backend = get_storage_backend()
+    digest = hashlib.sha256()
+    tmp = filepath.with_name(f".{filepath.name}.part")
+    try:
+        with open(tmp, "wb") as out:
+            for index in range(session.total_chunks):
+                with backend.open(session.chunk_key(index)) as chunk:
+                    while data := chunk.read(HASH_CHUNK_SIZE):
+                        digest.update(data)
+                        out.write(data)
+        os.replace(tmp, filepath)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return digest.hexdigest()
+
+
+async def _receive(body: AsyncIterator[bytes], f, expected: int):
+    """Write a chunk's body to ``f``, rejecting bodies that are not ``expected`` bytes long."""
+    written = 0
+    async for data in body:
+        written += len(data)
+        if written > expected:
+            raise HTTPException(status_code=400, detail="Chunk is larger than expected")
+        await f.write(data)
+    if written < expected:
+        raise HTTPException(status_code=400, detail="Chunk is incomplete")
+
+
+class UploadService:
+    """Upload sessions persisted in Redis, with chunks written in place.
+
+    The file is preallocated when the session is created and every chunk is
+    written straight to its offset, so chunks may arrive in any order and be
+    resent after a failure. The session's Redis keys expire after
+    ``upload_session_ttl_seconds`` without activity; their partial files are
+    swept when later sessions are created.
+
+    With a remote storage backend the chunks of one upload may reach
+    different API nodes, so each chunk is stored in the backend as its own
+    file under ``uploads/{id}/`` and the node completing the upload
+    assembles them. Chunks of sessions that expire there are left for the
+    store to expire (e.g. an S3 lifecycle rule on the ``uploads/`` prefix).
+    """
+
+    async def create(
+        self,
+        user_id: UUID,
+        target: str,
+        target_id: UUID,
+        subdir: str,
+        filename: str,
+        content_type: str,
+        size: int,
+    ) -> UploadSession:
+        validate_audio_metadata(filename, content_type)
+        if size > settings.max_upload_size_mb * 1024 * 1024:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File too large. Maximum size: {settings.max_upload_size_mb}MB",
+            )
+
+        session = UploadSession(
+            id=uuid.uuid4().hex,
+            user_id=str(user_id),
+            target=target,
+            target_id=str(target_id),
+            subdir=subdir,
+            filename=filename,
+            content_type=content_type,
+            size=size,
+            chunk_size=settings.upload_chunk_size_mb * 1024 * 1024,
+            received_chunks=[],
+        )
+        await asyncio.to_thread(self._sweep_stale_parts)
+        await asyncio.to_thread(_create_part, session, not get_storage_backend().remote)
+
+        fields = {
+            "user_id": session.user_id,
+            "target": target,
+            "target_id": session.target_id,
+            "subdir": subdir,
+            "filename": filename,
+            "content_type": content_type,
+            "size": size,
+            "chunk_size": session.chunk_size,
+        }
+        try:
+            with _redis_available():
+                r = await get_redis()
+                async with r.pipeline(transaction=True) as pipe:
+                    pipe.hset(KEY_PREFIX + session.id, mapping=fields)
+                    pipe.expire(KEY_PREFIX + session.id, settings.upload_session_ttl_seconds)
+                    await pipe.execute()
+        except HTTPException:
+            session.part_path.unlink(missing_ok=True)
+            raise
+        return session
+
+    async def get(self, upload_id: str, user_id: UUID) -> UploadSession:
+        with _redis_available():
+            r = await get_redis()
+            fields = await r.hgetall(KEY_PREFIX + upload_id)
+            chunks = await r.smembers(f"{KEY_PREFIX}{upload_id}:chunks")
+        if not fields or fields["user_id"] != str(user_id):
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        return UploadSession(
+            id=upload_id,
+            user_id=fields["user_id"],
+            target=fields["target"],
+            target_id=fields["target_id"],
+            subdir=fields["subdir"],
+            filename=fields["filename"],
+            content_type=fields["content_type"],
+            size=int(fields["size"]),
+            chunk_size=int(fields["chunk_size"]),
+            received_chunks=sorted(int(i) for i in chunks),
+        )
+
+    async def write_chunk(
+        self, session: UploadSession, index: int, body: AsyncIterator[bytes], offset: Optional[int] = None
+    ) -> UploadSession:
+        """Write chunk ``index`` at its offset and record it as received.
+
+        The body must be exactly the chunk's length; a short or long body is
+        rejected and the chunk stays missing, to be sent again.
+        """
+        if not 0 <= index < session.total_chunks:
+            raise HTTPException(status_code=400, detail="Chunk index out of range")
+        if offset is not None and offset != index * session.chunk_size:
+            raise HTTPException(status_code=400, detail="Chunk offset does not match its index")
+
+        expected = session.chunk_length(index)
+        if get_storage_backend().remote:
+            await self._store_chunk(session, index, body, expected)
+        else:
+            try:
+                async with aiofiles.open(session.part_path, "r+b") as f:
+                    await f.seek(index * session.chunk_size)
+                    await _receive(body, f, expected)
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail="Upload session not found") from None
+
+        ttl = settings.upload_session_ttl_seconds
+        with _redis_available():
+            r = await get_redis()
+            async with r.pipeline(transaction=True) as pipe:
+                pipe.sadd(f"{KEY_PREFIX}{session.id}:chunks", index)
+                pipe.expire(f"{KEY_PREFIX}{session.id}:chunks", ttl)
+                pipe.expire(KEY_PREFIX + session.id, ttl)
+                await pipe.execute()
+        return await self.get(session.id, UUID(session.user_id))
+
+    async def complete(self, session: UploadSession) -> StoredUpload:
+        """Close the session and move the assembled file into ``session.subdir``."""
+        missing = session.total_chunks - len(session.received_chunks)
+        if missing:
+            raise HTTPException(status_code=409, detail=f"Upload is missing {missing} chunks")
+
+        with _redis_available():
+            r = await get_redis()
+            # Deleting the session claims it, so concurrent completions finish it once
+            if not await r.delete(KEY_PREFIX + session.id, f"{KEY_PREFIX}{session.id}:chunks"):
+                raise HTTPException(status_code=404, detail="Upload session not found")
+
+        storage_path = Path(settings.storage_path) / session.subdir
+        storage_path.mkdir(parents=True, exist_ok=True)
+        filepath = storage_path / f"{uuid.uuid4()}{Path(session.filename).suffix.lower()}"
+        try:
+            if get_storage_backend().remote:
+                sha256 = await asyncio.to_thread(_assemble, session, filepath)
+                await asyncio.to_thread(remove, str(session.chunks_path))
+            else:
+                sha256 = await asyncio.to_thread(_hash_file, session.part_path)
+                os.replace(session.part_path, filepath)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Upload session not found") from None
+        return StoredUpload(path=str(filepath), size=session.size, sha256=sha256)
+
+    async def abort(self, session: UploadSession):
+        with _redis_available():
+            r = await get_redis()
+            await r.delete(KEY_PREFIX + session.id, f"{KEY_PREFIX}{session.id}:chunks")
+        session.part_path.unlink(missing_ok=True)
+        await asyncio.to_thread(remove, str(session.chunks_path))
+
+    async def _store_chunk(self, session: UploadSession, index: int, body: AsyncIterator[bytes], expected: int):
+        """Receive chunk ``index`` into a temporary file and store it in the backend."""
+        tmp = parts_dir() / f"{session.id}.{index}.{uuid.uuid4().hex}.chunk"
+        tmp.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            async with aiofiles.open(tmp, "wb") as f:
+                await _receive(body, f, expected)
+            await asyncio.to_thread(get_storage_backend().upload, str(tmp), session.chunk_key(index))
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def _sweep_stale_parts(self):
+        """Remove files of sessions that expired without completing."""
+        cutoff = time.time() - settings.upload_session_ttl_seconds
+        for part in [*parts_dir().glob("*.part"), *parts_dir().glob("*.chunk")]:
+            try:
+                if part.stat().st_mtime < cutoff:
+                    part.unlink()
+            except OSError:
+                continue
@@ -6,6 +6,7 @@ from sqlalchemy import select, func
 from fastapi import HTTPException
 from app.models.voice_persona import VoicePersona, PersonaStatus
 from app.schemas.voice_persona import VoicePersonaCreate
+from app.services.blob import BlobService
 
 
 class VoicePersonaService:
@@ -67,3 +68,7 @@ class VoicePersonaService:
         persona = await self.get_by_id(persona_id, user_id)
         await self.db.delete(persona)
         await self.db.commit()
+        # Samples are blobs shared by content; drop this persona's references
+        blobs = BlobService(self.db)
+        for sample_path in persona.sample_paths or []:
+            await blobs.release(sample_path)
@@ -1,22 +1,257 @@
 """Audio processing utilities."""
+import os
+import uuid
 import librosa
 import soundfile as sf
+import soxr
 import numpy as np
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterator, Optional
+
+
+RESAMPLE_QUALITY = "HQ"
+
+
+@dataclass(frozen=True)
+class AudioInfo:
+    """Stream properties of an audio file."""
+    duration_seconds: float
+    sample_rate: int
+    channels: int
+    codec: str
+
+
+def probe_audio(file_path: str) -> AudioInfo:
+    """Read stream properties from the container header without decoding.
+
+    Formats libsndfile cannot parse (m4a, aac, wma) fall back to counting
+    decoded frames block by block, which is slower but constant-memory.
+    """
+    try:
+        info = sf.info(file_path)
+        if info.frames > 0 and info.samplerate > 0:
+            return AudioInfo(
+                duration_seconds=info.frames / info.samplerate,
+                sample_rate=info.samplerate,
+                channels=info.channels,
+                codec=f"{info.format}/{info.subtype}".lower(),
+            )
+    except RuntimeError:
+        pass
+    return _probe_by_decoding(file_path)
+
+
+def _probe_by_decoding(file_path: str) -> AudioInfo:
+    import audioread
+
+    with audioread.audio_open(file_path) as f:
+        frames = 0
+        # audioread yields 16-bit interleaved PCM buffers
+        bytes_per_frame = 2 * f.channels
+        for buf in f:
+            frames += len(buf) // bytes_per_frame
+        return AudioInfo(
+            duration_seconds=frames / f.samplerate,
+            sample_rate=f.samplerate,
+            channels=f.channels,
+            codec=Path(file_path).suffix.lstrip(".").lower(),
+        )
 
 
 def get_audio_duration(file_path: str) -> float:
-    y, sr = librosa.load(file_path, sr=None, duration=60)
-    return librosa.get_duration(y=y, sr=sr)
+    return probe_audio(file_path).duration_seconds
+
+
+def canonical_path(file_path: str, sr: int = 44100) -> Path:
+    """Path of the decoded float32 sidecar of ``file_path`` at ``sr``."""
+    return Path(f"{file_path}.{sr}.f32.npy")
+
+
+def load_canonical(file_path: str, sr: int = 44100) -> Optional[np.ndarray]:
+    """Memory-map the decoded ``(frames, channels)`` sidecar, if it is up to date."""
+    path = canonical_path(file_path, sr)
+    try:
+        if path.stat().st_mtime < Path(file_path).stat().st_mtime:
+            return None
+        return np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_canonical(file_path: str, sr: int = 44100) -> str:
+    """Decode ``file_path`` once into a float32 NPY sidecar at ``sr``.
+
+    Later loads memory-map the sidecar instead of decoding and resampling
+    again. The sidecar is written under a temporary name and renamed into
+    place, so concurrent workers never see a partial file.
+    """
+    path = canonical_path(file_path, sr)
+    if load_canonical(file_path, sr) is not None:
+        return str(path)
+
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        info = _sf_info(file_path)
+        if info is not None and info.samplerate == sr and info.frames > 0:
+            # Already at the target rate: copy blocks straight into the sidecar
+            out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(info.frames, info.channels))
+            offset = 0
+            for block in sf.blocks(file_path, blocksize=65536, dtype="float32", always_2d=True):
+                out[offset:offset + len(block)] = block
+                offset += len(block)
+            if offset != info.frames:
+                raise RuntimeError(f"Decoded {offset} frames, header declared {info.frames}")
+        else:
+            y = _decode(file_path, sr)
+            out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=y.shape)
+            out[:] = y
+        out.flush()
+        del out
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return str(path)
+
+
+def _sf_info(file_path: str):
+    try:
+        return sf.info(file_path)
+    except RuntimeError:
+        return None
 
 
-def load_audio(file_path: str, sr: int = 44100) -> tuple:
-    y, orig_sr = librosa.load(file_path, sr=sr, mono=False)
-    if y.ndim == 1:
-        y = np.stack([y, y])
+def window_frames(offset: float, duration: Optional[float], sr: int) -> tuple:
+    """``(start, frames)`` of a window in seconds at ``sr``; ``frames`` is -1 for "to the end"."""
+    start = max(0, round(offset * sr))
+    frames = -1 if duration is None else max(0, round(duration * sr))
+    return start, frames
+
+
+def _slice(data: np.ndarray, start: int, frames: int) -> np.ndarray:
+    return data[start:] if frames < 0 else data[start:start + frames]
+
+
+def _decode(file_path: str, sr: int, offset: float = 0.0, duration: Optional[float] = None) -> np.ndarray:
+    """Decode to ``(frames, channels)`` float32 at ``sr``.
+
+    Resampling is skipped when the native rate already matches. Formats
+    libsndfile cannot read go through librosa/audioread. With a window only
+    that span is read (or decoded, for librosa).
+    """
+    info = _sf_info(file_path)
+    if info is None:
+        y, _ = librosa.load(file_path, sr=sr, mono=False, offset=offset, duration=duration)
+        return np.atleast_2d(y).T
+    start, frames = window_frames(offset, duration, info.samplerate)
+    data, native_sr = sf.read(file_path, frames=frames, start=start, dtype="float32", always_2d=True)
+    if native_sr != sr:
+        data = soxr.resample(data, native_sr, sr, quality=RESAMPLE_QUALITY)
+    return data
+
+
+def load_audio(file_path: str, sr: int = 44100, offset: float = 0.0, duration: Optional[float] = None) -> tuple:
+    """Load ``(channels, frames)`` float32 audio, mono duplicated to stereo.
+
+    Uses the memory-mapped canonical sidecar when one exists. ``offset`` and
+    ``duration`` (seconds) restrict the load to a window of the file.
+    """
+    canonical = load_canonical(file_path, sr)
+    if canonical is not None:
+        y = _slice(canonical, *window_frames(offset, duration, sr)).T
+    else:
+        y = _decode(file_path, sr, offset, duration).T
+    if y.shape[0] == 1:
+        y = np.repeat(y, 2, axis=0)
     return y, sr
 
 
+def can_stream(file_path: str, sr: int = 44100) -> bool:
+    """Whether ``iter_audio_blocks`` can read ``file_path`` without a full decode."""
+    return load_canonical(file_path, sr) is not None or _sf_info(file_path) is not None
+
+
+def stream_frames(file_path: str, sr: int = 44100, offset: float = 0.0, duration: Optional[float] = None) -> int:
+    """Number of frames ``iter_audio_blocks`` yields for ``file_path`` at ``sr``."""
+    canonical = load_canonical(file_path, sr)
+    if canonical is not None:
+        total = len(canonical)
+    else:
+        info = sf.info(file_path)
+        total = round(info.frames * sr / info.samplerate)
+    start, frames = window_frames(offset, duration, sr)
+    available = max(0, total - start)
+    return available if frames < 0 else min(available, frames)
+
+
+def iter_audio_blocks(
+    file_path: str,
+    block_frames: int = 65536,
+    sr: int = 44100,
+    offset: float = 0.0,
+    duration: Optional[float] = None,
+) -> Iterator[np.ndarray]:
+    """Yield fixed-size (channels, frames) float32 blocks without decoding the whole file.
+
+    Blocks are zero-copy views of the canonical sidecar when one exists.
+    Otherwise blocks are read with soundfile and, only when the native rate
+    differs from ``sr``, passed through a streaming soxr resampler.
+    Mono input is duplicated to stereo to match ``load_audio``. ``offset``
+    and ``duration`` (seconds) restrict the blocks to a window of the file.
+    """
+    canonical = load_canonical(file_path, sr)
+    if canonical is not None:
+        canonical = _slice(canonical, *window_frames(offset, duration, sr))
+        blocks = (canonical[start:start + block_frames] for start in range(0, len(canonical), block_frames))
+    else:
+        info = _sf_info(file_path)
+        if info is None:
+            raise ValueError(f"Cannot stream {file_path}")
+        start, frames = window_frames(offset, duration, info.samplerate)
+        blocks = sf.blocks(
+            file_path, blocksize=block_frames, start=start, frames=frames, dtype="float32", always_2d=True
+        )
+        if info.samplerate != sr:
+            blocks = _rebuffer(_resample_blocks(blocks, info.samplerate, sr, info.channels), block_frames)
+
+    for block in blocks:
+        block = block.T
+        if block.shape[0] == 1:
+            block = np.repeat(block, 2, axis=0)
+        yield block
+
+
+def _resample_blocks(
+    blocks: Iterator[np.ndarray], in_rate: int, out_rate: int, channels: int
+) -> Iterator[np.ndarray]:
+    stream = soxr.ResampleStream(in_rate, out_rate, channels, dtype="float32", quality=RESAMPLE_QUALITY)
+    for block in blocks:
+        out = stream.resample_chunk(block)
+        if len(out):
+            yield out
+    out = stream.resample_chunk(np.zeros((0, channels), dtype=np.float32), last=True)
+    if len(out):
+        yield out
+
+
+def _rebuffer(chunks: Iterator[np.ndarray], block_frames: int) -> Iterator[np.ndarray]:
+    """Regroup variable-size ``(frames, channels)`` chunks into ``block_frames`` blocks."""
+    pending = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= block_frames:
+            buf = np.concatenate(pending)
+            full = len(buf) - len(buf) % block_frames
+            for start in range(0, full, block_frames):
+                yield buf[start:start + block_frames]
+            pending = [buf[full:]]
+            size = len(buf) - full
+    if size:
+        yield np.concatenate(pending)
+
+
 def save_audio(audio: np.ndarray, file_path: str, sr: int = 44100):
     Path(file_path).parent.mkdir(parents=True, exist_ok=True)
     if audio.ndim == 2:
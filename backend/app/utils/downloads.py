@@ -0,0 +1,126 @@
+"""File downloads with HTTP range support."""
+import os
+import stat
+from mimetypes import guess_type
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, RedirectResponse, Response
+from starlette.types import Receive, Scope, Send
+from app.config import settings
+from app.utils.storage_backend import direct_url, fetch
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+class AudioFileResponse(FileResponse):
+    """A ``FileResponse`` suited to audio players seeking through large files.
+
+    Range, If-Range and ETag handling come from Starlette. On top of that,
+    ``If-None-Match`` revalidation answers 304, and when the ASGI server
+    offers the zero-copy send extension, whole files and single ranges are
+    handed to it as a file descriptor so the kernel copies them to the socket.
+    Otherwise the file is read in larger chunks than Starlette's default.
+    """
+
+    chunk_size = 1024 * 1024
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self._zerocopy = ZEROCOPY_EXTENSION in scope.get("extensions", {})
+        headers = Headers(scope=scope)
+        if_none_match = headers.get("if-none-match")
+        if self.stat_result is not None and if_none_match is not None and "range" not in headers:
+            etag = self.headers["etag"]
+            if if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(",")):
+                not_modified = Response(
+                    status_code=304,
+                    headers={k: v for k, v in self.headers.items() if k in ("etag", "last-modified", "cache-control")},
+                )
+                return await not_modified(scope, receive, send)
+        await super().__call__(scope, receive, send)
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        if not self._zerocopy or send_header_only:
+            return await super()._handle_simple(send, send_header_only)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await self._zerocopy_send(send, 0, None)
+
+    async def _handle_single_range(
+        self, send: Send, start: int, end: int, file_size: int, send_header_only: bool
+    ) -> None:
+        if not self._zerocopy or send_header_only:
+            return await super()._handle_single_range(send, start, end, file_size, send_header_only)
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        await self._zerocopy_send(send, start, end - start)
+
+    async def _zerocopy_send(self, send: Send, offset: int, count: Optional[int]) -> None:
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            message = {"type": ZEROCOPY_EXTENSION, "file": file, "offset": offset, "more_body": False}
+            if count is not None:
+                message["count"] = count
+            await send(message)
+        finally:
+            file.close()
+
+
+def download_response(path: str, filename: str, media_type: Optional[str] = None) -> Response:
+    """Serve the file at ``path`` inline under ``filename``.
+
+    With ``download_accel_redirect_prefix`` set, the response only names the
+    file for a fronting nginx to send with ``sendfile`` (``X-Accel-Redirect``),
+    which handles ranges and validators itself; the prefix must map an
+    ``internal`` location onto ``storage_path``. Otherwise the file is served
+    from here with :class:`AudioFileResponse`. Raises FileNotFoundError if
+    ``path`` is not a file.
+    """
+    stat_result = os.stat(path)
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise FileNotFoundError(path)
+
+    relative = _storage_relative(path)
+    if settings.download_accel_redirect_prefix and relative is not None:
+        return Response(
+            media_type=media_type or guess_type(filename)[0] or "application/octet-stream",
+            headers={
+                "X-Accel-Redirect": settings.download_accel_redirect_prefix.rstrip("/") + "/" + quote(relative),
+                "Content-Disposition": f"inline; filename*=utf-8''{quote(filename)}",
+                "Cache-Control": "private, no-cache",
+            },
+        )
+
+    return AudioFileResponse(
+        path,
+        filename=filename,
+        media_type=media_type,
+        stat_result=stat_result,
+        content_disposition_type="inline",
+        headers={"Cache-Control": "private, no-cache"},
+    )
+
+
+def stored_file_response(path: str, filename: str, media_type: Optional[str] = None) -> Response:
+    """Serve the stored file ``path`` from wherever it is stored.
+
+    Files on this node go through :func:`download_response`. Files only in a
+    remote backend redirect to a presigned URL, so players seek with ranged
+    reads against the store itself; backends without URLs are read through
+    the local cache. Raises FileNotFoundError if the file is stored nowhere.
+    """
+    url = direct_url(path, filename, media_type or guess_type(filename)[0] or "application/octet-stream")
+    if url:
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": "private, no-cache"})
+    return download_response(fetch(path), filename, media_type)
+
+
+def _storage_relative(path: str) -> Optional[str]:
+    """``path`` relative to ``storage_path``, or None if it lies outside."""
+    try:
+        relative = Path(os.path.realpath(path)).relative_to(os.path.realpath(settings.storage_path))
+    except ValueError:
+        return None
+    return relative.as_posix()
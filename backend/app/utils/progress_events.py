@@ -0,0 +1,110 @@
+"""Job progress events over Redis pub/sub."""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Set
+import redis
+import redis.asyncio as aioredis
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "project_progress:"
+QUEUE_SIZE = 100
+
+# Synchronous client for Celery workers
+_sync_redis: redis.Redis | None = None
+
+
+def progress_channel(project_id: str) -> str:
+    return f"{CHANNEL_PREFIX}{project_id}"
+
+
+def publish_progress(project_id: str, event: Dict[str, Any]) -> None:
+    """Publish a progress event for a project (worker side).
+
+    Progress is best effort: a Redis hiccup must not fail the job.
+    """
+    global _sync_redis
+    if _sync_redis is None:
+        _sync_redis = redis.Redis.from_url(settings.redis_url)
+    try:
+        _sync_redis.publish(progress_channel(project_id), json.dumps(event))
+    except redis.RedisError as e:
+        logger.warning(f"Failed to publish progress for project {project_id}: {e}")
+
+
+class ProgressBroadcaster:
+    """Fan progress events out to local subscribers (API side).
+
+    One pattern subscription per API process is shared by every connected
+    client, so Redis load does not grow with the number of connections.
+    Slow consumers lose their oldest events rather than blocking others.
+    """
+
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._listener: asyncio.Task | None = None
+        self._client: aioredis.Redis | None = None
+
+    @property
+    def connections(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    @asynccontextmanager
+    async def subscribe(self, project_id: str) -> AsyncIterator[asyncio.Queue]:
+        """Yield a queue receiving the project's events until the context exits."""
+        self._ensure_listener()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers.setdefault(project_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(project_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[project_id]
+
+    def _ensure_listener(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                self._client = aioredis.from_url(self.redis_url, decode_responses=True)
+                pubsub = self._client.pubsub()
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self._dispatch(message["channel"][len(CHANNEL_PREFIX):], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Progress listener disconnected, retrying: {e}")
+                await asyncio.sleep(1)
+            finally:
+                if self._client is not None:
+                    await self._client.close()
+                    self._client = None
+
+    def _dispatch(self, project_id: str, data: str):
+        for queue in self._subscribers.get(project_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+broadcaster = ProgressBroadcaster(settings.redis_url)
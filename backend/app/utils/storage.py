@@ -1,6 +1,9 @@
 """File storage utilities."""
+import hashlib
+import os
 import uuid
 import aiofiles
+from dataclasses import dataclass
 from pathlib import Path
 from fastapi import UploadFile, HTTPException
 from app.config import settings
@@ -19,13 +22,21 @@ ALLOWED_AUDIO_MIMETYPES = {
     "audio/x-ms-wma",
 }
 
+# Uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 
 def validate_audio_file(file: UploadFile) -> None:
     """Validate that the uploaded file is an allowed audio format."""
-    if not file.filename:
+    validate_audio_metadata(file.filename, file.content_type)
+
+
+def validate_audio_metadata(filename: str | None, content_type: str | None) -> None:
+    """Validate an upload's filename and declared Content-Type."""
+    if not filename:
         raise HTTPException(status_code=400, detail="Filename is required")
 
-    ext = Path(file.filename).suffix.lower()
+    ext = Path(filename).suffix.lower()
     if ext not in ALLOWED_AUDIO_EXTENSIONS:
         raise HTTPException(
             status_code=400,
@@ -33,27 +44,40 @@ def validate_audio_file(file: UploadFile) -> None:
         )
 
     # Require Content-Type header to prevent bypass
-    if not file.content_type:
+    if not content_type:
         raise HTTPException(
             status_code=400,
             detail="Content-Type header is required",
         )
 
-    if file.content_type not in ALLOWED_AUDIO_MIMETYPES:
+    if content_type not in ALLOWED_AUDIO_MIMETYPES:
         raise HTTPException(
             status_code=400,
             detail="Invalid audio file type",
         )
 
 
+@dataclass(frozen=True)
+class StoredUpload:
+    """A file written to storage by ``save_upload``."""
+    path: str
+    size: int
+    sha256: str
+
+
 async def save_upload(
     file: UploadFile,
     subdir: str,
     validate_audio: bool = True,
     max_size_mb: int | None = None,
-) -> str:
+) -> StoredUpload:
     """Save an uploaded file to storage.
 
+    The upload is streamed to a temporary file in fixed-size chunks, so
+    memory per upload stays constant. The size limit is enforced while
+    reading and the SHA-256 digest is computed on the fly; the file is
+    renamed into place only once it is complete.
+
     Args:
         file: The uploaded file
         subdir: Subdirectory within storage path
@@ -65,13 +89,14 @@ async def save_upload(
 
     effective_max_size_mb = max_size_mb or settings.max_upload_size_mb
     max_size = effective_max_size_mb * 1024 * 1024
+    too_large = HTTPException(
+        status_code=400,
+        detail=f"File too large. Maximum size: {effective_max_size_mb}MB",
+    )
 
-    # Check Content-Length header first to prevent memory exhaustion
+    # Check Content-Length header first to reject before reading anything
     if file.size and file.size > max_size:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: {effective_max_size_mb}MB",
-        )
+        raise too_large
 
     storage_path = Path(settings.storage_path) / subdir
     storage_path.mkdir(parents=True, exist_ok=True)
@@ -79,19 +104,30 @@ async def save_upload(
     ext = Path(file.filename).suffix.lower() if file.filename else ".bin"
     filename = f"{uuid.uuid4()}{ext}"
     filepath = storage_path / filename
-
-    # Read and validate actual size (Content-Length can be spoofed)
-    content = await file.read()
-    if len(content) > max_size:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: {effective_max_size_mb}MB",
-        )
-
-    async with aiofiles.open(filepath, "wb") as f:
-        await f.write(content)
-
-    return str(filepath)
+    tmp_path = storage_path / f".{filename}.part"
+
+    # Count the bytes actually received (Content-Length can be spoofed)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as f:
+            # Never read more than one byte past the limit
+            while chunk := await file.read(min(UPLOAD_CHUNK_SIZE, max_size - size + 1)):
+                size += len(chunk)
+                if size > max_size:
+                    raise too_large
+                digest.update(chunk)
+                await f.write(chunk)
+        os.replace(tmp_path, filepath)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    return StoredUpload(path=str(filepath), size=size, sha256=digest.hexdigest())
+
+
+def project_subdir(user_id, project_id) -> str:
+    """Storage subdirectory holding a project's files."""
+    return f"projects/{user_id}/{project_id}"
 
 
 def get_file_path(relative_path: str) -> Path:
@@ -0,0 +1,459 @@
+"""Storage backends holding stored files beyond one node's disk.
+
+Files keep their paths under ``storage_path`` everywhere in the app; a
+file's storage key is that path relative to ``storage_path``. With the
+local backend ``storage_path`` is the store itself (a shared volume when
+API and workers run on separate nodes) and the helpers at the bottom of
+this module do nothing. With S3 each node's ``storage_path`` holds only the
+files written there: they are published to the bucket once complete, and
+files written elsewhere are read through a local cache.
+"""
+import glob
+import hashlib
+import io
+import logging
+import os
+import shutil
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, List, Optional
+from urllib.parse import quote
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class StorageBackend(ABC):
+    """Files addressed by storage key."""
+
+    #: Whether files live somewhere other than this node's ``storage_path``
+    remote: bool = True
+
+    @abstractmethod
+    def upload(self, local_path: str, key: str):
+        """Store the file at ``local_path`` under ``key``, replacing any previous one."""
+
+    @abstractmethod
+    def download(self, key: str, local_path: str):
+        """Write the file stored under ``key`` to ``local_path``."""
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Open the file under ``key`` for seekable, streaming reads."""
+
+    @abstractmethod
+    def version(self, key: str) -> str:
+        """A string that changes whenever the file under ``key`` does."""
+
+    @abstractmethod
+    def list(self, prefix: str) -> List[str]:
+        """Keys starting with ``prefix``."""
+
+    @abstractmethod
+    def delete(self, keys: List[str]):
+        """Delete files by key; missing keys are ignored."""
+
+    def url(self, key: str, filename: str, media_type: str, expires: int) -> Optional[str]:
+        """A URL clients may read the file under ``key`` from directly, if the backend has one."""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """Files in a directory tree, by default ``storage_path`` itself."""
+
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+
+    @property
+    def root(self) -> Path:
+        return Path(self._root or settings.storage_path)
+
+    @property
+    def remote(self) -> bool:
+        return os.path.realpath(self.root) != os.path.realpath(settings.storage_path)
+
+    def _path(self, key: str) -> Path:
+        path = self.root / key
+        if not os.path.realpath(path).startswith(os.path.realpath(self.root) + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def upload(self, local_path: str, key: str):
+        path = self._path(key)
+        if os.path.realpath(local_path) == os.path.realpath(path):
+            return
+        _copy_into_place(local_path, path)
+
+    def download(self, key: str, local_path: str):
+        _copy_into_place(str(self._path(key)), Path(local_path))
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def version(self, key: str) -> str:
+        stat_result = self._path(key).stat()
+        return f"{stat_result.st_mtime_ns}-{stat_result.st_size}"
+
+    def list(self, prefix: str) -> List[str]:
+        parent = self._path(prefix).parent if "/" in prefix else self.root
+        if not parent.is_dir():
+            return []
+        keys = []
+        for dirpath, _, filenames in os.walk(parent):
+            for filename in filenames:
+                key = Path(dirpath, filename).relative_to(self.root).as_posix()
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def delete(self, keys: List[str]):
+        for key in keys:
+            self._path(key).unlink(missing_ok=True)
+
+
+class S3Storage(StorageBackend):
+    """Files in an S3-compatible bucket (AWS S3, MinIO, ...).
+
+    Uploads and downloads above ``multipart_threshold`` bytes are split
+    into ``multipart_chunksize`` parts transferred by ``max_concurrency``
+    threads.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        multipart_threshold: int = 16 * 1024 * 1024,
+        multipart_chunksize: int = 16 * 1024 * 1024,
+        max_concurrency: int = 8,
+        client=None,
+    ):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise RuntimeError(f"boto3 is not installed: {e}") from e
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = client or boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            config=Config(max_pool_connections=max_concurrency + 2),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+            use_threads=True,
+        )
+        self.read_buffer_size = multipart_chunksize
+        self._client_error = ClientError
+
+    def _not_found(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def upload(self, local_path: str, key: str):
+        self.client.upload_file(local_path, self.bucket, self.prefix + key, Config=self.transfer_config)
+
+    def download(self, key: str, local_path: str):
+        try:
+            self.client.download_file(self.bucket, self.prefix + key, local_path, Config=self.transfer_config)
+        except self._client_error as e:
+            if self._not_found(e):
+                raise FileNotFoundError(key) from None
+            raise
+
+    def open(self, key: str) -> BinaryIO:
+        size = self._head(key)["ContentLength"]
+        raw = _S3RangeReader(self.client, self.bucket, self.prefix + key, size)
+        return io.BufferedReader(raw, buffer_size=self.read_buffer_size)
+
+    def version(self, key: str) -> str:
+        return self._head(key)["ETag"].strip('"')
+
+    def _head(self, key: str) -> dict:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except self._client_error as e:
+            if self._not_found(e):
+                raise FileNotFoundError(key) from None
+            raise
+
+    def list(self, prefix: str) -> List[str]:
+        keys = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            keys.extend(obj["Key"][len(self.prefix):] for obj in page.get("Contents", []))
+        return keys
+
+    def url(self, key: str, filename: str, media_type: str, expires: int) -> Optional[str]:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.prefix + key,
+                "ResponseContentDisposition": f"inline; filename*=utf-8''{quote(filename)}",
+                "ResponseContentType": media_type,
+            },
+            ExpiresIn=expires,
+        )
+
+    def delete(self, keys: List[str]):
+        for start in range(0, len(keys), 1000):
+            batch = keys[start:start + 1000]
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": self.prefix + key} for key in batch], "Quiet": True},
+            )
+
+
+class _S3RangeReader(io.RawIOBase):
+    """Seekable reads of an S3 object, one ranged GET per read."""
+
+    def __init__(self, client, bucket: str, key: str, size: int):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = max(base + offset, 0)
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        end = min(self.position + len(buffer), self.size)
+        if end <= self.position:
+            return 0
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self.key, Range=f"bytes={self.position}-{end - 1}"
+        )
+        data = response["Body"].read()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def _copy_into_place(src: str, dst: Path):
+    """Copy ``src`` to ``dst`` through a temporary file, so readers never see a partial copy."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.{uuid.uuid4().hex}.part")
+    try:
+        with open(src, "rb") as f_in, open(tmp, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out, COPY_BUFFER_SIZE)
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+class ReadThroughCache:
+    """Size-bounded LRU cache of files read from a remote backend.
+
+    Each entry is a directory named after the key and the file's version, so
+    a replaced file is fetched again and the stale copy ages out. The entry
+    also collects sidecars derived from the copy (decoded audio,
+    checkpoints); its directory's mtime records the last access.
+    """
+
+    def __init__(self, backend: StorageBackend, root: Path, max_bytes: int):
+        self.backend = backend
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, key: str) -> str:
+        """A local copy of the file under ``key``, downloaded on a miss."""
+        version = self.backend.version(key)
+        entry = self.root / hashlib.sha256(f"{key}\0{version}".encode()).hexdigest()
+        path = entry / Path(key).name
+        if path.exists():
+            os.utime(entry)
+            with self._lock:
+                self.hits += 1
+            return str(path)
+
+        with self._lock:
+            self.misses += 1
+        entry.mkdir(parents=True, exist_ok=True)
+        tmp = entry / f".{uuid.uuid4().hex}.part"
+        try:
+            self.backend.download(key, str(tmp))
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.evict()
+        return str(path)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits ``max_bytes``."""
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            try:
+                accessed = entry.stat().st_mtime
+                size = sum(f.stat().st_size for f in entry.rglob("*") if f.is_file())
+            except OSError:
+                continue
+            entries.append((accessed, size, entry))
+            total += size
+
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_backend: StorageBackend | None = None
+_read_cache: ReadThroughCache | None = None
+
+
+def get_storage_backend() -> StorageBackend:
+    """Get or create the configured storage backend for this process."""
+    global _backend
+    if _backend is None:
+        if settings.storage_backend == "s3":
+            _backend = S3Storage(
+                settings.s3_bucket,
+                prefix=settings.s3_prefix,
+                endpoint_url=settings.s3_endpoint_url,
+                region=settings.s3_region,
+                access_key_id=settings.s3_access_key_id,
+                secret_access_key=settings.s3_secret_access_key,
+                multipart_threshold=settings.s3_multipart_threshold_mb * 1024 * 1024,
+                multipart_chunksize=settings.s3_multipart_chunk_mb * 1024 * 1024,
+                max_concurrency=settings.s3_max_concurrency,
+            )
+        elif settings.storage_backend == "local":
+            _backend = LocalStorage()
+        else:
+            raise RuntimeError(f"Unknown storage backend: {settings.storage_backend}")
+    return _backend
+
+
+def get_read_cache() -> ReadThroughCache:
+    """Get or create this node's cache of files read from the storage backend."""
+    global _read_cache
+    if _read_cache is None:
+        root = Path(settings.storage_cache_path or Path(settings.storage_path) / "cache" / "objects")
+        root.mkdir(parents=True, exist_ok=True)
+        _read_cache = ReadThroughCache(get_storage_backend(), root, settings.storage_cache_max_mb * 1024 * 1024)
+    return _read_cache
+
+
+def storage_key(path: str) -> Optional[str]:
+    """The storage key of ``path``, or None if it lies outside ``storage_path``."""
+    try:
+        relative = Path(os.path.realpath(path)).relative_to(os.path.realpath(settings.storage_path))
+    except ValueError:
+        return None
+    return relative.as_posix()
+
+
+def _remote_key(path: str) -> Optional[str]:
+    return storage_key(path) if get_storage_backend().remote else None
+
+
+def fetch(path: str) -> str:
+    """A local path to read the stored file ``path`` from.
+
+    ``path`` itself when the file is on this node, otherwise a copy in the
+    read-through cache. Raises FileNotFoundError if it is stored nowhere.
+    """
+    key = _remote_key(path)
+    if key is None or os.path.exists(path):
+        return path
+    return get_read_cache().fetch(key)
+
+
+def direct_url(path: str, filename: str, media_type: str) -> Optional[str]:
+    """A short-lived URL to read the stored file ``path`` from the backend itself.
+
+    None when the file is on this node or the backend cannot hand out URLs.
+    Raises FileNotFoundError if it is stored nowhere.
+    """
+    key = _remote_key(path)
+    if key is None or os.path.exists(path):
+        return None
+    backend = get_storage_backend()
+    backend.version(key)  # Fail here rather than at the client
+    return backend.url(key, filename, media_type, settings.storage_url_ttl_seconds)
+
+
+def localize(path: str) -> str:
+    """Make the stored file or directory ``path`` present at ``path`` itself.
+
+    A file comes with its ``{path}.*`` sidecars. Files stored nowhere are
+    left missing.
+    """
+    key = _remote_key(path)
+    if key is None or os.path.exists(path):
+        return path
+    backend = get_storage_backend()
+    for stored in backend.list(key):
+        if stored == key or stored.startswith(f"{key}.") or stored.startswith(f"{key}/"):
+            local = Path(settings.storage_path) / stored
+            if not local.exists():
+                local.parent.mkdir(parents=True, exist_ok=True)
+                backend.download(stored, str(local))
+    return path
+
+
+def publish(path: str, stored_as: Optional[str] = None):
+    """Store the file (with its ``{path}.*`` sidecars) or directory tree ``path``.
+
+    ``stored_as`` stores a local copy, such as one from :func:`fetch`, as
+    the file at that path instead.
+    """
+    key = _remote_key(stored_as or path)
+    if key is None:
+        return
+    backend = get_storage_backend()
+    if os.path.isdir(path):
+        files = [f for f in glob.glob(os.path.join(glob.escape(path), "**"), recursive=True) if os.path.isfile(f)]
+    else:
+        files = [path, *(f for f in glob.glob(f"{glob.escape(path)}.*") if os.path.isfile(f))]
+    for file in files:
+        backend.upload(file, key + Path(file).as_posix()[len(Path(path).as_posix()):])
+
+
+def remove(path: str):
+    """Delete the stored file or directory ``path`` and everything derived from it."""
+    key = _remote_key(path)
+    if key is None:
+        return
+    backend = get_storage_backend()
+    keys = [k for k in backend.list(key) if k == key or k.startswith(f"{key}.") or k.startswith(f"{key}/")]
+    if keys:
+        backend.delete(keys)
+        logger.info(f"Removed {len(keys)} stored files under {key}")
@@ -0,0 +1,140 @@
+"""Multi-resolution waveform peaks for drawing audio without shipping it."""
+import os
+import uuid
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BASE_SAMPLES_PER_PEAK = 256
+LEVEL_FACTOR = 4
+NUM_LEVELS = 5  # 256, 1024, 4096, 16384, 65536 samples per peak
+MAX_PEAKS_PER_REQUEST = 20000
+
+
+def peaks_path(audio_path: str) -> Path:
+    """Path of the peaks sidecar of ``audio_path``."""
+    return Path(f"{audio_path}.peaks.npz")
+
+
+def _quantize(x: np.ndarray) -> np.ndarray:
+    return np.round(np.clip(x, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+class PeakBuilder:
+    """Accumulate min/max peaks from ``(channels, frames)`` blocks.
+
+    Channels are folded together (min of mins, max of maxes). Only the
+    finest level is accumulated; coarser levels are derived on save.
+    """
+
+    def __init__(self, sample_rate: int, samples_per_peak: int = BASE_SAMPLES_PER_PEAK):
+        self.sample_rate = sample_rate
+        self.samples_per_peak = samples_per_peak
+        self.frames = 0
+        self._chunks: List[np.ndarray] = []
+        self._remainder = np.zeros((2, 0), dtype=np.float32)
+
+    def update(self, block: np.ndarray):
+        if block.ndim == 1:
+            block = block[None]
+        if block.shape[1] == 0:
+            return
+        self.frames += block.shape[1]
+        folded = np.concatenate([self._remainder, np.stack([block.min(axis=0), block.max(axis=0)])], axis=1)
+        full = folded.shape[1] - folded.shape[1] % self.samples_per_peak
+        if full:
+            buckets = folded[:, :full].reshape(2, -1, self.samples_per_peak)
+            self._chunks.append(_quantize(np.stack([buckets[0].min(axis=1), buckets[1].max(axis=1)], axis=1)))
+        self._remainder = folded[:, full:]
+
+    def levels(self) -> Dict[int, np.ndarray]:
+        """Return ``{samples_per_peak: (n, 2) int16 [min, max]}`` for every zoom level."""
+        chunks = list(self._chunks)
+        if self._remainder.shape[1]:
+            chunks.append(_quantize(np.array([[self._remainder[0].min(), self._remainder[1].max()]])))
+        level = np.concatenate(chunks) if chunks else np.zeros((0, 2), dtype=np.int16)
+
+        levels = {self.samples_per_peak: level}
+        samples_per_peak = self.samples_per_peak
+        for _ in range(NUM_LEVELS - 1):
+            samples_per_peak *= LEVEL_FACTOR
+            n = -(-len(level) // LEVEL_FACTOR)
+            padded = np.pad(level, ((0, n * LEVEL_FACTOR - len(level)), (0, 0)), mode="edge") if len(level) else level
+            groups = padded.reshape(n, LEVEL_FACTOR, 2)
+            level = np.stack([groups[:, :, 0].min(axis=1), groups[:, :, 1].max(axis=1)], axis=1)
+            levels[samples_per_peak] = level
+        return levels
+
+    def save(self, audio_path: str) -> str:
+        """Write the pyramid next to ``audio_path``, replacing any previous one."""
+        path = peaks_path(audio_path)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        arrays = {f"level_{spp}": level for spp, level in self.levels().items()}
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, sample_rate=self.sample_rate, frames=self.frames, **arrays)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return str(path)
+
+
+def write_peaks(audio_path: str) -> str:
+    """Compute and save the peaks of an audio file, streaming where possible."""
+    # Lazy import to keep librosa out of API startup
+    from app.utils.audio import can_stream, iter_audio_blocks, load_audio, probe_audio
+
+    if can_stream(audio_path):
+        sample_rate = probe_audio(audio_path).sample_rate
+        builder = PeakBuilder(sample_rate)
+        for block in iter_audio_blocks(audio_path, sr=sample_rate):
+            builder.update(block)
+    else:
+        audio, sample_rate = load_audio(audio_path)
+        builder = PeakBuilder(sample_rate)
+        builder.update(audio)
+    return builder.save(audio_path)
+
+
+def load_peaks(audio_path: str) -> Optional[Dict[str, np.ndarray]]:
+    """Load the peaks sidecar of ``audio_path``, or None if it was never computed."""
+    try:
+        with np.load(peaks_path(audio_path)) as data:
+            return {key: data[key] for key in data.files}
+    except (OSError, ValueError):
+        return None
+
+
+def select_peaks(
+    peaks: Dict[str, np.ndarray],
+    samples_per_peak: int,
+    start_seconds: float = 0.0,
+    end_seconds: Optional[float] = None,
+    bits: int = 8,
+) -> Dict[str, Any]:
+    """Slice the closest zoom level into an audiowaveform-style JSON payload.
+
+    Picks the finest stored level that is at least as coarse as requested.
+    """
+    available = sorted(int(key.split("_")[1]) for key in peaks if key.startswith("level_"))
+    chosen = next((spp for spp in available if spp >= samples_per_peak), available[-1])
+    level = peaks[f"level_{chosen}"]
+    sample_rate = int(peaks["sample_rate"])
+
+    start = max(0, int(start_seconds * sample_rate) // chosen)
+    end = len(level) if end_seconds is None else min(len(level), -(-int(end_seconds * sample_rate) // chosen))
+    end = min(end, start + MAX_PEAKS_PER_REQUEST)
+    data = level[max(0, start):max(start, end)]
+    if bits == 8:
+        data = (data >> 8).astype(np.int8)
+
+    return {
+        "version": 2,
+        "channels": 1,
+        "sample_rate": sample_rate,
+        "samples_per_pixel": chosen,
+        "bits": bits,
+        "start": start,
+        "length": len(data),
+        "data": data.ravel().tolist(),
+    }
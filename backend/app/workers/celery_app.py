@@ -1,7 +1,55 @@
 """Celery application configuration."""
+import logging
+import time
+from typing import Dict
 from celery import Celery
+from celery.signals import task_postrun, task_prerun, task_revoked, worker_process_init
+from kombu import Queue
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+QUEUE_SEPARATION = "separation"
+QUEUE_MIXING = "mixing"
+QUEUE_TRAINING = "training"
+QUEUE_PREVIEW = "preview"
+
+# Seconds a task on each queue may run before SoftTimeLimitExceeded is raised
+QUEUE_TIME_LIMITS = {
+    QUEUE_SEPARATION: settings.separation_time_limit,
+    QUEUE_MIXING: settings.mixing_time_limit,
+    QUEUE_TRAINING: settings.training_time_limit,
+    QUEUE_PREVIEW: settings.preview_time_limit,
+}
+# Grace period between the soft limit and the worker killing the process
+HARD_LIMIT_GRACE_SECONDS = 60
+# A scheduler slot must outlive the longest job holding it: a pipeline runs a
+# stage on each of these queues, and each stage may be retried
+SCHEDULED_QUEUES = (QUEUE_SEPARATION, QUEUE_MIXING)
+SCHEDULER_SLOT_TTL_SECONDS = settings.scheduler_slot_ttl_seconds or (
+    sum(QUEUE_TIME_LIMITS[queue] + HARD_LIMIT_GRACE_SECONDS for queue in SCHEDULED_QUEUES)
+    * (settings.separation_max_retries + 1)
+)
+# How often held jobs are dispatched even if no job ends, e.g. after a
+# worker died without releasing its slot and the slot expired
+SCHEDULER_DISPATCH_INTERVAL_SECONDS = 60
+# Message priority steps of the Redis transport
+PRIORITY_STEPS = [0, 3, 6, 9]
+# Child processes warm up before reporting ready; loading models takes a while
+WORKER_PROCESS_INIT_TIMEOUT = 300
+
+TASK_QUEUES = {
+    "app.workers.tasks.process_stems_task": QUEUE_SEPARATION,
+    "app.workers.tasks.mix_project_task": QUEUE_MIXING,
+    "app.workers.tasks.mix_variants_task": QUEUE_MIXING,
+    "app.workers.tasks.pipeline_separate_task": QUEUE_SEPARATION,
+    "app.workers.tasks.analyze_audio_task": QUEUE_MIXING,
+    "app.workers.tasks.pipeline_mix_task": QUEUE_MIXING,
+    "app.workers.tasks.pipeline_finalize_task": QUEUE_MIXING,
+    "app.workers.tasks.preview_task": QUEUE_PREVIEW,
+    "app.workers.tasks.dispatch_held_jobs_task": QUEUE_MIXING,
+}
+
 celery_app = Celery(
     "bibee",
     broker=settings.redis_url,
@@ -17,4 +65,99 @@ celery_app.conf.update(
     enable_utc=True,
     task_track_started=True,
     task_time_limit=3600,
+    worker_proc_alive_timeout=WORKER_PROCESS_INIT_TIMEOUT,
+    broker_transport_options={
+        # Redis emulates message priority with one list per step, polled
+        # lowest number first; every plan priority (see app.services.scheduler)
+        # must be a step of its own
+        "priority_steps": PRIORITY_STEPS,
+        # Late-acked tasks are redelivered if unacknowledged this long; it must
+        # exceed the longest task or running jobs get handed to a second worker
+        "visibility_timeout": max(QUEUE_TIME_LIMITS.values()) + 2 * HARD_LIMIT_GRACE_SECONDS,
+    },
+    # Unprioritized tasks rank as FREE
+    task_default_priority=6,
+    # Concurrency and prefetch are set per queue on the worker command line
+    task_queues=[Queue(name) for name in QUEUE_TIME_LIMITS],
+    task_default_queue=QUEUE_MIXING,
+    task_routes={
+        **{name: {"queue": queue} for name, queue in TASK_QUEUES.items()},
+        "app.workers.tasks.train_*": {"queue": QUEUE_TRAINING},
+    },
+    task_annotations={
+        name: {
+            "soft_time_limit": QUEUE_TIME_LIMITS[queue],
+            "time_limit": QUEUE_TIME_LIMITS[queue] + HARD_LIMIT_GRACE_SECONDS,
+        }
+        for name, queue in TASK_QUEUES.items()
+    },
+    beat_schedule={
+        "dispatch-held-jobs": {
+            "task": "app.workers.tasks.dispatch_held_jobs_task",
+            "schedule": SCHEDULER_DISPATCH_INTERVAL_SECONDS,
+            # A late run is redundant with the next one
+            "options": {"expires": SCHEDULER_DISPATCH_INTERVAL_SECONDS},
+        },
+    },
 )
+
+
+_process_started: float | None = None
+_first_job_started = False
+_job_started: Dict[str, float] = {}
+
+
+@worker_process_init.connect
+def warm_up_worker_process(**_):
+    """Load the audio stack and configured models before taking tasks."""
+    global _process_started
+    _process_started = time.monotonic()
+    # Lazy import: the API imports this module too
+    from app.workers.warmup import warm_up
+
+    timings = warm_up(settings.worker_warmup)
+    logger.info(f"Worker process ready after {time.monotonic() - _process_started:.2f}s ({timings})")
+
+
+@task_prerun.connect
+def record_job_start(task_id: str, task, **_):
+    global _first_job_started
+    now = time.monotonic()
+    _job_started[task_id] = now
+    if not _first_job_started and _process_started is not None:
+        _first_job_started = True
+        logger.info(f"Time to first job: {now - _process_started:.2f}s after process start ({task.name})")
+
+    from app.services.scheduler import get_scheduler
+
+    try:
+        get_scheduler().record_start(task_id)
+    except Exception as e:
+        logger.warning(f"Failed to record queue wait of {task_id}: {e}")
+
+
+@task_postrun.connect
+def record_job_duration(task_id: str, task, state: str = None, **_):
+    started = _job_started.pop(task_id, None)
+    if started is not None:
+        logger.info(f"Job {task.name}[{task_id}] {state} in {time.monotonic() - started:.2f}s")
+
+    if state in ("SUCCESS", "FAILURE"):
+        from app.services.scheduler import get_scheduler
+
+        try:
+            # Frees the user's slot if this task ends a scheduled job
+            get_scheduler().release(task_id)
+        except Exception as e:
+            logger.warning(f"Failed to release scheduler slot of {task_id}: {e}")
+
+
+@task_revoked.connect
+def release_revoked_job(request, **_):
+    from app.services.scheduler import get_scheduler
+
+    try:
+        # Revoked tasks never run, so postrun does not free their slot
+        get_scheduler().release(request.id)
+    except Exception as e:
+        logger.warning(f"Failed to release scheduler slot of revoked {request.id}: {e}")
@@ -0,0 +1,28 @@
+"""Database access from Celery workers."""
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.config import settings
+import app.models  # noqa: F401  (register all mappers)
+
+T = TypeVar("T")
+
+_engine: AsyncEngine | None = None
+
+
+def run_db(fn: Callable[[AsyncSession], Awaitable[T]]) -> T:
+    """Run ``fn`` with a fresh session from synchronous task code.
+
+    Each call runs on its own event loop, so the engine must not pool
+    connections across calls (asyncpg connections are bound to a loop).
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(settings.database_url, poolclass=NullPool)
+
+    async def runner() -> T:
+        async with async_sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)() as session:
+            return await fn(session)
+
+    return asyncio.run(runner())
@@ -0,0 +1,68 @@
+"""Project pipeline orchestration.
+
+A project runs as one Celery workflow::
+
+    (separate stems || analyze original) -> mix -> finalize
+
+The mix keeps the separated vocal stem unless the project removes vocals;
+no voice conversion backend is bundled yet. Stages pass
+artifact references (storage paths) rather than audio, write only under a
+per-run staging directory, and the finalize stage moves the results into
+the project. Stems are the exception: they derive from the content-addressed
+original alone and are published complete next to it, for any project with
+the same original. Any failure runs ``pipeline_failed_task``, which deletes
+the staging directory and marks the project failed.
+
+Only signatures are built here, by task name, so the API can start a
+pipeline without importing the audio pipelines.
+"""
+from typing import Dict, Optional
+from celery import chain, chord
+from celery.canvas import Signature
+from app.models.task import TaskType
+from app.workers.celery_app import celery_app
+
+
+def _stage(name: str, *args, priority: Optional[int] = None, **kwargs) -> Signature:
+    signature = celery_app.signature(f"app.workers.tasks.{name}", args=args, kwargs=kwargs)
+    return signature.set(priority=priority) if priority is not None else signature
+
+
+def build_project_pipeline(
+    project_id: str,
+    original_path: str,
+    project_dir: str,
+    staging_dir: str,
+    task_ids: Dict[TaskType, str],
+    mix_settings: dict,
+    with_vocals: bool = True,
+    priority: Optional[int] = None,
+) -> Signature:
+    """Build the workflow for a project.
+
+    ``task_ids`` maps each tracked stage to the celery id of its ``Task`` row;
+    the mix leaves the vocal stem out unless ``with_vocals``. ``priority``
+    applies to every stage.
+    """
+    artifacts = {"original": original_path, "staging_dir": staging_dir}
+    header = [
+        _stage("pipeline_separate_task", artifacts, project_id=project_id, priority=priority).set(
+            task_id=task_ids[TaskType.STEM_SEPARATION]
+        ),
+        _stage("analyze_audio_task", artifacts, project_id=project_id, priority=priority),
+    ]
+    mix = _stage(
+        "pipeline_mix_task", settings=mix_settings, with_vocals=with_vocals, project_id=project_id, priority=priority
+    ).set(task_id=task_ids[TaskType.MIXING])
+    finalize = _stage("pipeline_finalize_task", project_dir=project_dir, project_id=project_id, priority=priority)
+
+    workflow = chain(chord(header, mix), finalize)
+    workflow.on_error(
+        _stage(
+            "pipeline_failed_task",
+            project_id=project_id,
+            staging_dir=staging_dir,
+            celery_task_ids=list(task_ids.values()),
+        )
+    )
+    return workflow
@@ -0,0 +1,90 @@
+"""Rate-limited progress reporting from workers."""
+import logging
+import time
+from typing import Callable, Optional
+from app.config import settings
+from app.models.task import TaskStatus
+from app.services.task import TaskService
+from app.utils.progress_events import publish_progress
+from app.workers.db import run_db
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressReporter:
+    """Progress callback that coalesces updates from a running task.
+
+    Updates arriving faster than ``interval`` are dropped except for the
+    latest, which goes out with the next update past the interval (or with
+    the terminal event). The ``Task`` row's progress is written at most every
+    ``db_interval``, as one UPDATE. Progress of 100 and terminal states are
+    always sent immediately.
+    """
+
+    def __init__(
+        self,
+        task,
+        project_id: Optional[str],
+        stage: str,
+        interval: float = None,
+        db_interval: float = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.task = task
+        self.project_id = project_id
+        self.stage = stage
+        self.interval = settings.progress_interval_seconds if interval is None else interval
+        self.db_interval = settings.progress_db_interval_seconds if db_interval is None else db_interval
+        self.clock = clock
+        self.progress = 0
+        self._message = ""
+        self._pending = False
+        self._sent_at = None
+        self._persisted_at = clock()
+        self._persisted_progress = 0
+
+    def __call__(self, progress: int, message: str):
+        self.progress = progress
+        self._message = message
+        self._pending = True
+        now = self.clock()
+        if progress >= 100 or self._sent_at is None or now - self._sent_at >= self.interval:
+            self.flush(now)
+
+    def flush(self, now: float = None):
+        """Send the latest pending update, if any."""
+        if not self._pending:
+            return
+        now = self.clock() if now is None else now
+        self._pending = False
+        self._sent_at = now
+        self.task.update_state(state="PROGRESS", meta={"progress": self.progress, "message": self._message})
+        self._publish("PROGRESS", self.progress, self._message)
+        if self.progress != self._persisted_progress and now - self._persisted_at >= self.db_interval:
+            self._persisted_at = now
+            self._persisted_progress = self.progress
+            self._persist(self.progress)
+
+    def finish(self, state: str, message: str):
+        """Publish a terminal SUCCESS/FAILURE event, superseding pending updates."""
+        self._pending = False
+        self._publish(state, 100 if state == "SUCCESS" else 0, message)
+
+    def _publish(self, state: str, progress: int, message: str):
+        if self.project_id:
+            publish_progress(self.project_id, {
+                "task_id": self.task.request.id,
+                "stage": self.stage,
+                "state": state,
+                "progress": progress,
+                "message": message,
+            })
+
+    def _persist(self, progress: int):
+        # Progress is informational; a failed write must not fail the job
+        try:
+            run_db(lambda db: TaskService(db).update_by_celery_id(
+                self.task.request.id, TaskStatus.RUNNING, progress=progress
+            ))
+        except Exception as e:
+            logger.warning(f"Failed to persist progress of task {self.task.request.id}: {e}")
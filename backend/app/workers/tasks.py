@@ -1,31 +1,514 @@
 """Celery background tasks."""
-from app.workers.celery_app import celery_app
-from app.pipelines.stem_separation import separate_stems
-from app.pipelines.mixing import mix_tracks
+import glob
+import json
+import logging
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Union
+from uuid import UUID
+import redis
+from celery.exceptions import Retry, SoftTimeLimitExceeded
+from app.config import settings as app_settings
+from app.models.project import ProjectStatus
+from app.models.task import TaskStatus
+from app.services.blob import in_blob_store, stems_root
+from app.services.project import ProjectService
+from app.services.scheduler import get_scheduler
+from app.services.task import TaskService
+from app.workers.celery_app import SCHEDULER_SLOT_TTL_SECONDS, celery_app
+from app.workers.db import run_db
+from app.workers.progress import ProgressReporter
+from app.pipelines.stem_cache import get_stem_cache
+from app.pipelines.stem_separation import separate_stems, stems_dir_for
+from app.pipelines.mixing import PEAK_CEILING, mix_tracks, mix_variants, sum_tracks
+from app.utils.audio import ensure_canonical, probe_audio
+from app.utils.storage_backend import fetch, localize, publish, remove
+from app.utils.waveform import peaks_path, write_peaks
 
+logger = logging.getLogger(__name__)
 
-@celery_app.task(bind=True)
-def process_stems_task(self, input_path: str, output_dir: str, project_id: str):
-    """Background task for stem separation."""
-    def progress_callback(progress, message):
-        self.update_state(state="PROGRESS", meta={"progress": progress, "message": message})
 
-    stems = separate_stems(input_path, output_dir, progress_callback=progress_callback)
-    return {"project_id": project_id, "stems": stems}
+def _record(
+    celery_task_id: str,
+    status: TaskStatus,
+    project_id: Optional[str] = None,
+    project_status: Optional[ProjectStatus] = None,
+    error: Optional[str] = None,
+    **project_fields,
+):
+    """Persist a task transition and, optionally, the project's new status."""
+    async def record(db):
+        progress = 100 if status == TaskStatus.COMPLETED else None
+        await TaskService(db).update_by_celery_id(celery_task_id, status, progress=progress, error=error)
+        if project_id and project_status:
+            await ProjectService(db).update_status(UUID(project_id), project_status, **project_fields)
 
+    run_db(record)
+
+
+def _mark_project(project_id: Optional[str], status: ProjectStatus, **fields):
+    if project_id:
+        run_db(lambda db: ProjectService(db).update_status(UUID(project_id), status, **fields))
+
+
+@contextmanager
+def _progress_events(task, project_id: Optional[str], stage: str, running_status: Optional[ProjectStatus] = None):
+    """Yield a rate-limited progress callback for the task and the project channel.
+
+    The ``Task`` row (and the project, given ``running_status``) is moved to
+    running on entry and to completed/failed when the block exits, before the
+    terminal SUCCESS/FAILURE event is published, so clients reacting to the
+    event read the final state.
+    """
+    _record(task.request.id, TaskStatus.RUNNING, project_id, running_status)
+
+    reporter = ProgressReporter(task, project_id, stage)
+
+    try:
+        yield reporter
+    except Retry:
+        _record(task.request.id, TaskStatus.PENDING)
+        reporter.finish("RETRY", "Resuming after interruption")
+        raise
+    except Exception as e:
+        failed_status = ProjectStatus.FAILED if running_status else None
+        try:
+            _record(task.request.id, TaskStatus.FAILED, project_id, failed_status, error=str(e))
+        except Exception:
+            # Keep the original error as the task's failure
+            logger.exception(f"Failed to record failure of task {task.request.id}")
+        reporter.finish("FAILURE", str(e))
+        raise
+    _record(task.request.id, TaskStatus.COMPLETED)
+    reporter.finish("SUCCESS", "Done")
+
+
+# Separation checkpoints every segment, so an interrupted attempt is
+# redelivered (worker lost, capped by _count_redelivery) or retried (time
+# limit) and resumes from there
+SEPARATION_TASK_OPTIONS = {
+    "bind": True,
+    "acks_late": True,
+    "reject_on_worker_lost": True,
+    "max_retries": app_settings.separation_max_retries,
+}
+REDELIVERY_KEY_PREFIX = "separation_redeliveries:"
+
+
+def _count_redelivery(task):
+    """Fail a separation whose worker keeps dying instead of redelivering it forever.
+
+    A segment that gets the worker OOM-killed kills every redelivery too.
+    Redeliveries (the broker flags them) are counted in Redis per task;
+    past ``separation_max_redeliveries`` the task fails. Without Redis
+    the task is let through.
+    """
+    if not (task.request.delivery_info or {}).get("redelivered"):
+        return
+    key = f"{REDELIVERY_KEY_PREFIX}{task.request.id}"
+    try:
+        pipe = get_scheduler().redis.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, SCHEDULER_SLOT_TTL_SECONDS)
+        redeliveries, _ = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Failed to count redeliveries of {task.request.id}: {e}")
+        return
+    if redeliveries > app_settings.separation_max_redeliveries:
+        raise RuntimeError(f"Separation worker was lost {redeliveries} times; giving up")
+    logger.warning(f"Separation {task.request.id} redelivered after its worker was lost ({redeliveries})")
+
+
+def checkpoint_dir_for(input_path: str, model_name: str) -> Path:
+    """Where separation checkpoints of ``input_path`` live, next to it in project storage."""
+    return Path(input_path).parent / ".checkpoints" / f"{Path(input_path).stem}.{model_name}"
+
+
+STEMS_MANIFEST = "stems.json"
 
-@celery_app.task(bind=True)
-def mix_project_task(self, instrumental_path: str, vocal_path: str, output_path: str, settings: dict):
-    """Background task for mixing."""
-    def progress_callback(progress, message):
-        self.update_state(state="PROGRESS", meta={"progress": progress, "message": message})
 
-    result = mix_tracks(
+def _published_stems(stems_dir: Path) -> Optional[dict]:
+    """The stems in ``stems_dir`` if a separation finished publishing them there."""
+    try:
+        manifest = json.loads((stems_dir / STEMS_MANIFEST).read_text())
+    except (OSError, ValueError):
+        return None
+    return {
+        "stems_dir": str(stems_dir),
+        "stems": {name: str(stems_dir / filename) for name, filename in manifest["stems"].items()},
+        "instrumental": str(stems_dir / manifest["instrumental"]),
+    }
+
+
+def _publish_stems(work_stems_dir: Path, stems_dir: Path):
+    """Move a finished stems directory into place, unless another run published it first."""
+    stems_dir.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.rename(work_stems_dir, stems_dir)
+    except OSError:
+        if _published_stems(stems_dir) is not None:
+            return
+        # Leftovers of a run from before stems were published atomically
+        shutil.rmtree(stems_dir, ignore_errors=True)
+        os.rename(work_stems_dir, stems_dir)
+
+
+def _separate(task, input_path: str, output_dir: str, project_id: Optional[str], progress_callback) -> dict:
+    """Separate stems (or reuse cached ones) and write ``instrumental.wav`` next to them.
+
+    Stems of content-addressed inputs are shared between projects, so they
+    are built in a private directory and renamed into place complete; a
+    later run for the same input reuses them. That makes the stem cache
+    redundant for blobs, so only other inputs go through it.
+    """
+    _count_redelivery(task)
+    model_name = app_settings.demucs_model
+    stems_dir = stems_dir_for(input_path, output_dir, model_name)
+    localize(str(stems_dir / STEMS_MANIFEST))
+    published = _published_stems(stems_dir)
+    if published is not None:
+        logger.info(f"Reusing stems of {input_path} for project {project_id}")
+        return published
+
+    use_cache = app_settings.stem_cache_enabled and not in_blob_store(input_path)
+    input_path = fetch(input_path)
+    work_dir = Path(output_dir) / f".tmp-{uuid.uuid4().hex}"
+    work_stems_dir = stems_dir_for(input_path, str(work_dir), model_name)
+    try:
+        cache = get_stem_cache() if use_cache else None
+        stems = None
+        if cache:
+            key = cache.key_for(input_path, model_name)
+            stems = cache.get(key, work_stems_dir)
+            if stems is not None:
+                logger.info(f"Stem cache hit for project {project_id} ({cache.stats()})")
+
+        if stems is None:
+            if app_settings.canonical_audio_enabled:
+                ensure_canonical(input_path)
+
+            try:
+                stems = separate_stems(
+                    input_path,
+                    str(work_dir),
+                    model_name=model_name,
+                    device=app_settings.demucs_device,
+                    progress_callback=progress_callback,
+                    workers=app_settings.separation_workers,
+                    checkpoint_dir=str(checkpoint_dir_for(input_path, model_name)),
+                )
+            except SoftTimeLimitExceeded as e:
+                raise task.retry(exc=e, countdown=0)
+            if cache:
+                cache.put(key, stems)
+
+        instrumental = sum_tracks(
+            [path for name, path in stems.items() if name != "vocals"],
+            str(work_stems_dir / "instrumental.wav"),
+            block_frames=app_settings.mix_block_frames,
+        )
+        (work_stems_dir / STEMS_MANIFEST).write_text(json.dumps({
+            "stems": {name: Path(path).name for name, path in stems.items()},
+            "instrumental": Path(instrumental).name,
+        }))
+        _publish_stems(work_stems_dir, stems_dir)
+        publish(str(stems_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return _published_stems(stems_dir)
+
+
+def _mix(
+    instrumental_path: str,
+    vocal_path: Optional[str],
+    output_path: str,
+    settings: dict,
+    progress_callback,
+    offset: float = 0.0,
+    duration: Optional[float] = None,
+) -> str:
+    """Mix the instrumental with a vocal track, or render it alone without one.
+
+    Either way the result is normalized to the same peak ceiling.
+    """
+    instrumental_path = fetch(instrumental_path)
+    if vocal_path is None:
+        output = sum_tracks(
+            [instrumental_path], output_path, block_frames=app_settings.mix_block_frames,
+            offset=offset, duration=duration, peak_ceiling=PEAK_CEILING,
+        )
+        publish(output)
+        return output
+    output = mix_tracks(
         instrumental_path,
-        vocal_path,
+        fetch(vocal_path),
         output_path,
         vocal_level=settings.get("vocal_level", 0.0),
         reverb_amount=settings.get("reverb_amount", 0.2),
         progress_callback=progress_callback,
+        streaming=app_settings.mix_streaming,
+        block_frames=app_settings.mix_block_frames,
+        offset=offset,
+        duration=duration,
     )
-    return {"output_path": result}
+    publish(output)
+    return output
+
+
+@celery_app.task(**SEPARATION_TASK_OPTIONS)
+def process_stems_task(self, input_path: str, output_dir: str, project_id: str):
+    """Background task for stem separation.
+
+    Besides the stems, writes ``instrumental.wav`` (every stem but vocals)
+    into the stems directory for mixing.
+    """
+    with _progress_events(self, project_id, "stems", ProjectStatus.PROCESSING_STEMS) as progress_callback:
+        result = _separate(self, input_path, output_dir, project_id, progress_callback)
+        _mark_project(project_id, ProjectStatus.STEMS_READY, stems_path=result["stems_dir"])
+        return {"project_id": project_id, "stems": result["stems"], "instrumental": result["instrumental"]}
+
+
+@celery_app.task(bind=True)
+def mix_project_task(
+    self,
+    instrumental_path: str,
+    vocal_path: Optional[str],
+    output_path: str,
+    settings: dict,
+    project_id: Optional[str] = None,
+):
+    """Background task for mixing.
+
+    Without a vocal track (vocal mode "remove") the instrumental is rendered
+    on its own.
+    """
+    with _progress_events(self, project_id, "mix", ProjectStatus.MIXING) as progress_callback:
+        result = _mix(instrumental_path, vocal_path, output_path, settings, progress_callback)
+        _mark_project(project_id, ProjectStatus.COMPLETED, output_path=result)
+        return {"output_path": result}
+
+
+@celery_app.task(bind=True)
+def mix_variants_task(
+    self,
+    instrumental_path: str,
+    vocal_path: str,
+    output_paths: list,
+    variants: list,
+    project_id: Optional[str] = None,
+):
+    """Background task rendering several mix variants in one pass."""
+    with _progress_events(self, project_id, "mix_variants") as progress_callback:
+        results = mix_variants(
+            fetch(instrumental_path),
+            fetch(vocal_path),
+            output_paths,
+            variants,
+            progress_callback=progress_callback,
+            block_frames=app_settings.mix_block_frames,
+        )
+        for result in results:
+            publish(result)
+        return {"output_paths": results}
+
+
+@celery_app.task(bind=True)
+def preview_task(
+    self,
+    output_path: str,
+    offset: float,
+    duration: float,
+    settings: dict,
+    input_path: Optional[str] = None,
+    instrumental_path: Optional[str] = None,
+    vocal_path: Optional[str] = None,
+    with_vocals: bool = True,
+    project_id: Optional[str] = None,
+):
+    """Background task rendering a short window of the mix for auditioning.
+
+    With the project's stems (``instrumental_path``) only the window is
+    mixed. Otherwise the window of ``input_path`` is separated first, with
+    the preview model and fewer split passes, and mixed with its own vocal stem unless
+    ``with_vocals`` is false. The project's status is left untouched.
+    """
+    with _progress_events(self, project_id, "preview") as progress_callback:
+        if instrumental_path is None:
+            stems = separate_stems(
+                fetch(input_path),
+                str(Path(output_path).parent),
+                model_name=app_settings.preview_demucs_model,
+                device=app_settings.demucs_device,
+                progress_callback=progress_callback,
+                offset=offset,
+                duration=duration,
+                split_overlap=app_settings.preview_split_overlap,
+            )
+            instrumental_path = sum_tracks(
+                [path for name, path in stems.items() if name != "vocals"],
+                str(Path(stems["vocals"]).parent / "instrumental.wav"),
+                block_frames=app_settings.mix_block_frames,
+            )
+            vocal_path = stems["vocals"] if with_vocals else None
+            # The separated stems already are the window
+            offset, duration = 0.0, None
+        result = _mix(instrumental_path, vocal_path, output_path, settings, progress_callback, offset, duration)
+        _evict_previews(Path(output_path).parent)
+        return {"output_path": result}
+
+
+def _evict_previews(window_dir: Path):
+    """Keep the ``preview_max_windows`` most recently rendered windows next to ``window_dir``.
+
+    Each window's directory holds its render and, without project stems, the
+    separated window; evicted ones are removed here and from storage.
+    """
+    def rendered_at(path: Path) -> float:
+        try:
+            return path.stat().st_mtime
+        except FileNotFoundError:
+            return 0.0  # Evicted by a concurrent preview
+
+    os.utime(window_dir)
+    windows = sorted((path for path in window_dir.parent.iterdir() if path.is_dir()), key=rendered_at, reverse=True)
+    for stale in windows[max(app_settings.preview_max_windows, 1):]:
+        shutil.rmtree(stale, ignore_errors=True)
+        try:
+            remove(str(stale))
+        except Exception as e:
+            logger.warning(f"Failed to delete stored preview {stale}: {e}")
+
+
+# Project pipeline stages (see app.workers.pipeline). Each stage takes the
+# artifact references of the previous one and returns them extended with its
+# own; every file but the shared stems is written under the pipeline's
+# staging directory until the finalize stage moves the results into place.
+# With a remote storage backend stages may run on different nodes: every
+# input is read through fetch() and every result is published once written.
+
+
+def _merge(artifacts: Union[dict, List[dict]]) -> dict:
+    """Merge artifact references from parallel stages (a chord passes a list)."""
+    if isinstance(artifacts, dict):
+        return artifacts
+    merged = {}
+    for refs in artifacts:
+        merged.update(refs)
+    return merged
+
+
+def _promote(path: str, staging_dir: str, project_dir: str) -> str:
+    """Move a staged file (with its sidecars) or directory to the same place under ``project_dir``."""
+    target = Path(project_dir) / Path(path).relative_to(staging_dir)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if os.path.isdir(path):
+        shutil.rmtree(target, ignore_errors=True)
+    else:
+        for stale in glob.glob(f"{glob.escape(str(target))}.*"):
+            os.remove(stale)
+        for sidecar in glob.glob(f"{glob.escape(path)}.*"):
+            os.replace(sidecar, f"{target}{sidecar[len(path):]}")
+    os.replace(path, target)
+    return str(target)
+
+
+@celery_app.task(**SEPARATION_TASK_OPTIONS)
+def pipeline_separate_task(self, artifacts: dict, project_id: str):
+    """Pipeline stage: separate stems, shared by every project with the same original."""
+    with _progress_events(self, project_id, "stems", ProjectStatus.PROCESSING_STEMS) as progress_callback:
+        output_dir = stems_root(artifacts["original"])
+        result = _separate(self, artifacts["original"], output_dir, project_id, progress_callback)
+        _mark_project(project_id, ProjectStatus.STEMS_READY)
+        return {
+            **artifacts,
+            "stems_dir": result["stems_dir"],
+            "instrumental": result["instrumental"],
+            "vocal_stem": result["stems"]["vocals"],
+        }
+
+
+@celery_app.task(bind=True)
+def analyze_audio_task(self, artifacts: dict, project_id: str):
+    """Probe the original and refresh its peaks.
+
+    Runs alongside separation in a pipeline, and on its own after an upload.
+    """
+    with _progress_events(self, project_id, "analysis"):
+        original = fetch(artifacts["original"])
+        info = probe_audio(original)
+        write_peaks(original)
+        publish(str(peaks_path(original)), stored_as=str(peaks_path(artifacts["original"])))
+        run_db(lambda db: ProjectService(db).update_fields(
+            UUID(project_id),
+            duration_seconds=info.duration_seconds,
+            sample_rate=info.sample_rate,
+            channels=info.channels,
+            codec=info.codec,
+        ))
+        return artifacts
+
+
+@celery_app.task(bind=True)
+def pipeline_mix_task(
+    self, artifacts: Union[dict, List[dict]], settings: dict, with_vocals: bool, project_id: str
+):
+    """Pipeline stage: mix the instrumental with the vocal stem, unless vocals are removed."""
+    artifacts = _merge(artifacts)
+    with _progress_events(self, project_id, "mix", ProjectStatus.MIXING) as progress_callback:
+        output_path = str(Path(artifacts["staging_dir"]) / "mix" / "output.wav")
+        vocal_path = artifacts["vocal_stem"] if with_vocals else None
+        output = _mix(artifacts["instrumental"], vocal_path, output_path, settings, progress_callback)
+        return {**artifacts, "output": output}
+
+
+@celery_app.task(bind=True)
+def pipeline_finalize_task(self, artifacts: dict, project_dir: str, project_id: str):
+    """Last pipeline stage: move staged results into the project and complete it."""
+    with _progress_events(self, project_id, "finalize"):
+        staging_dir = artifacts["staging_dir"]
+        fields = {
+            "stems_path": artifacts["stems_dir"],
+            "output_path": _promote(localize(artifacts["output"]), staging_dir, project_dir),
+        }
+        publish(fields["output_path"])
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        remove(staging_dir)
+        _mark_project(project_id, ProjectStatus.COMPLETED, **fields)
+        return fields
+
+
+@celery_app.task
+def pipeline_failed_task(request, exc, traceback, project_id: str, staging_dir: str, celery_task_ids: list):
+    """Error callback of a project pipeline: discard staged work and fail the project.
+
+    May run more than once for one failure (a failed chord header also
+    fails the chord body), so every step is idempotent.
+    """
+    logger.error(f"Pipeline for project {project_id} failed in task {request.id}: {exc}")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    remove(staging_dir)
+
+    async def fail(db):
+        await TaskService(db).cancel_pending(celery_task_ids, "Cancelled after an earlier stage failed")
+        await ProjectService(db).update_status(UUID(project_id), ProjectStatus.FAILED)
+
+    run_db(fail)
+    # The pipeline's scheduler slot is otherwise freed when its mix stage ends
+    for celery_task_id in celery_task_ids:
+        get_scheduler().release(celery_task_id)
+
+
+@celery_app.task
+def dispatch_held_jobs_task():
+    """Periodically dispatch held jobs whose users have free slots again.
+
+    Slots are normally handed on when a job ends; this catches slots that
+    expired because their job was lost without releasing them.
+    """
+    dispatched = get_scheduler().dispatch_pending()
+    if dispatched:
+        logger.info(f"Dispatched {dispatched} held jobs")
+    return dispatched
@@ -0,0 +1,75 @@
+"""Worker process warmup.
+
+Pays the one-off costs of the audio stack (imports, numba compilation,
+model weights) when a worker process starts instead of on its first job.
+"""
+import logging
+import time
+from typing import Callable, Dict
+import numpy as np
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+WARMUP_SAMPLE_RATE = 22050
+
+
+def _warm_audio():
+    """Import the decode/resample stack and JIT-compile librosa's numba kernels."""
+    import librosa
+    import soundfile  # noqa: F401
+    import soxr
+    import app.pipelines.mixing  # noqa: F401
+
+    t = np.arange(WARMUP_SAMPLE_RATE, dtype=np.float32) / WARMUP_SAMPLE_RATE
+    signal = np.sin(2 * np.pi * 220 * t) * (t % 0.25 < 0.05)
+    # Onset detection goes through peak_pick, which is numba-compiled
+    librosa.onset.onset_detect(y=signal, sr=WARMUP_SAMPLE_RATE)
+    soxr.resample(signal, WARMUP_SAMPLE_RATE, 44100)
+
+
+def _warm_model(model_name: str):
+    """Load a Demucs model and run it once on a short silent segment."""
+    from app.pipelines.stem_separation import get_engine
+
+    engine = get_engine(model_name, settings.demucs_device)
+    silence = np.zeros((engine.channels, engine.samplerate), dtype=np.float32)
+    engine.separate_segment(silence, 0.0, 1.0)
+
+
+def _warm_demucs():
+    _warm_model(settings.demucs_model)
+
+
+def _warm_preview():
+    _warm_model(settings.preview_demucs_model)
+
+
+WARMUPS: Dict[str, Callable[[], None]] = {
+    "audio": _warm_audio,
+    "demucs": _warm_demucs,
+    "preview": _warm_preview,
+}
+
+
+def warm_up(components: str) -> Dict[str, float]:
+    """Run the comma-separated warmup ``components`` and return their durations.
+
+    A failing component is logged and skipped: the worker still starts and
+    pays that cost on its first job instead.
+    """
+    timings = {}
+    for name in filter(None, (c.strip() for c in components.split(","))):
+        warm = WARMUPS.get(name)
+        if warm is None:
+            logger.warning(f"Unknown worker warmup component: {name}")
+            continue
+        start = time.perf_counter()
+        try:
+            warm()
+        except Exception as e:
+            logger.warning(f"Worker warmup '{name}' failed: {e}")
+            continue
+        timings[name] = time.perf_counter() - start
+        logger.info(f"Worker warmup '{name}' took {timings[name]:.2f}s")
+    return timings
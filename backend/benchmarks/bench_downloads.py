@@ -0,0 +1,79 @@
+"""Measure download throughput for concurrent seeking audio players.
+
+Usage:
+    python -m benchmarks.bench_downloads \\
+        --url http://localhost:8000 --token <access token> --project <project id> \\
+        --source output --players 10 50 200 --seeks 20 --range-kb 256
+
+Each player fetches the file's size with a one-byte range, then seeks to
+random offsets and reads a range from each, the way a browser audio element
+does when the user scrubs. Reports aggregate throughput and per-request
+latency.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import httpx
+
+
+async def play(client: httpx.AsyncClient, url: str, seeks: int, range_bytes: int, latencies: list) -> int:
+    response = await client.get(url, headers={"Range": "bytes=0-0"})
+    response.raise_for_status()
+    size = int(response.headers["content-range"].rsplit("/", 1)[1])
+    etag = response.headers.get("etag", "")
+
+    received = 0
+    for _ in range(seeks):
+        start = random.randrange(0, max(size - range_bytes, 1))
+        headers = {"Range": f"bytes={start}-{start + range_bytes - 1}", "If-Range": etag}
+        began = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        latencies.append(time.perf_counter() - began)
+        if response.status_code != 206:
+            raise RuntimeError(f"Expected 206, got {response.status_code}")
+        received += len(response.content)
+    return received
+
+
+async def run(args, players: int):
+    url = f"{args.url}/api/projects/{args.project}/download?source={args.source}"
+    headers = {"Authorization": f"Bearer {args.token}"}
+    limits = httpx.Limits(max_connections=players + 10)
+    latencies: list = []
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=60) as client:
+        began = time.perf_counter()
+        results = await asyncio.gather(
+            *(play(client, url, args.seeks, args.range_kb * 1024, latencies) for _ in range(players)),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - began
+
+    received = sum(r for r in results if isinstance(r, int))
+    failed = sum(1 for r in results if isinstance(r, BaseException))
+    p50 = statistics.median(latencies) * 1000 if latencies else float("nan")
+    p95 = statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) > 1 else float("nan")
+    print(
+        f"players={players:<5} failed={failed:<4} requests/s={len(latencies) / elapsed:8.1f} "
+        f"MB/s={received / elapsed / 1e6:8.1f} p50={p50:7.1f}ms p95={p95:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--project", required=True)
+    parser.add_argument("--source", default="output")
+    parser.add_argument("--players", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--seeks", type=int, default=20)
+    parser.add_argument("--range-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    for players in args.players:
+        asyncio.run(run(args, players))
+
+
+if __name__ == "__main__":
+    main()
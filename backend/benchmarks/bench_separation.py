@@ -0,0 +1,42 @@
+"""Compare serial and thread-pool chunked stem separation.
+
+Usage:
+    python -m benchmarks.bench_separation path/to/song.wav --workers 2 4 8
+
+Requires Demucs and its model weights. Each configuration is run once to
+warm the resident engine and its thread pool and then timed.
+"""
+import argparse
+import tempfile
+import time
+from app.pipelines.stem_separation import separate_stems, shutdown_pools
+
+
+def time_separation(input_path: str, workers: int, model_name: str) -> float:
+    with tempfile.TemporaryDirectory() as output_dir:
+        separate_stems(input_path, output_dir, model_name=model_name, workers=workers)
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        separate_stems(input_path, output_dir, model_name=model_name, workers=workers)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input_path")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--model", default="htdemucs")
+    args = parser.parse_args()
+
+    try:
+        serial = time_separation(args.input_path, 1, args.model)
+        print(f"serial       {serial:8.2f}s")
+        for workers in args.workers:
+            elapsed = time_separation(args.input_path, workers, args.model)
+            print(f"threads={workers:<3}  {elapsed:8.2f}s  speedup {serial / elapsed:5.2f}x")
+    finally:
+        shutdown_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Measure how many SSE progress connections one API process sustains.
+
+Usage:
+    python -m benchmarks.bench_sse_connections \\
+        --url http://localhost:8000 --token <access token> --project <project id> \\
+        --connections 100 500 1000 --events 50
+
+Opens N concurrent event streams for one project, publishes events through
+Redis the way workers do, and reports how many connections received every
+event and the delivery latency.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import httpx
+from app.utils.progress_events import publish_progress
+
+
+async def listen(client: httpx.AsyncClient, url: str, expected: int, ready: asyncio.Event, latencies: list) -> int:
+    received = 0
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        ready.set()
+        async for line in response.aiter_lines():
+            if line.startswith("data: "):
+                event = json.loads(line[6:])
+                latencies.append(time.time() - event["sent_at"])
+                received += 1
+                if received == expected:
+                    break
+    return received
+
+
+async def run(args, connections: int):
+    url = f"{args.url}/api/audio/{args.project}/events"
+    headers = {"Authorization": f"Bearer {args.token}"}
+    limits = httpx.Limits(max_connections=connections + 10)
+    latencies: list = []
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=None) as client:
+        readies = [asyncio.Event() for _ in range(connections)]
+        listeners = [
+            asyncio.create_task(listen(client, url, args.events, ready, latencies))
+            for ready in readies
+        ]
+        await asyncio.wait_for(asyncio.gather(*(r.wait() for r in readies)), timeout=60)
+        await asyncio.sleep(0.5)
+
+        for i in range(args.events):
+            publish_progress(args.project, {"progress": i, "sent_at": time.time()})
+            await asyncio.sleep(args.interval)
+
+        done, pending = await asyncio.wait(listeners, timeout=30)
+        for task in pending:
+            task.cancel()
+
+    complete = sum(1 for task in done if not task.exception() and task.result() == args.events)
+    p50 = statistics.median(latencies) * 1000 if latencies else float("nan")
+    p95 = statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) > 1 else float("nan")
+    print(f"connections={connections:<6} complete={complete:<6} p50={p50:7.1f}ms p95={p95:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--project", required=True)
+    parser.add_argument("--connections", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    for connections in args.connections:
+        asyncio.run(run(args, connections))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,7 @@ os.environ["DEBUG"] = "true"
 from app.main import app
 from app.db import Base, get_db
 # Import models to ensure they are registered with Base.metadata
-from app.models import User, VoicePersona, Project, Task  # noqa: F401
+from app.models import User, VoicePersona, Project, Task, Blob  # noqa: F401
 
 # Use PostgreSQL for tests since SQLite doesn't support PostgreSQL-specific types like ARRAY
 TEST_DATABASE_URL = os.getenv(
@@ -34,6 +34,26 @@ async def db_session():
     await engine.dispose()
 
 
+@pytest.fixture
+async def pg_session():
+    """Like ``db_session``, but skips the test when PostgreSQL is not reachable."""
+    engine = create_async_engine(TEST_DATABASE_URL, echo=False)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    except OSError:
+        await engine.dispose()
+        pytest.skip("PostgreSQL is not available")
+
+    async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        yield session
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
 @pytest.fixture
 async def client(db_session):
     async def override_get_db():
@@ -0,0 +1,125 @@
+"""Audio utility tests."""
+import os
+import numpy as np
+import pytest
+import soundfile as sf
+from app.utils.audio import (
+    canonical_path, ensure_canonical, iter_audio_blocks, load_audio, load_canonical, probe_audio, stream_frames,
+)
+
+
+class TestProbeAudio:
+    """Tests for probe_audio function."""
+
+    @pytest.mark.parametrize("ext,codec", [(".wav", "wav/pcm_16"), (".flac", "flac/pcm_16")])
+    def test_reads_header(self, tmp_path, ext, codec):
+        path = tmp_path / f"test{ext}"
+        sf.write(str(path), np.zeros((48000 * 3, 2), dtype=np.float32), 48000)
+
+        info = probe_audio(str(path))
+
+        assert info.duration_seconds == pytest.approx(3.0)
+        assert info.sample_rate == 48000
+        assert info.channels == 2
+        assert info.codec == codec
+
+    def test_long_file_duration(self, tmp_path):
+        """Duration is not capped at the first 60 seconds."""
+        path = tmp_path / "long.wav"
+        sf.write(str(path), np.zeros(8000 * 90, dtype=np.float32), 8000)
+
+        assert probe_audio(str(path)).duration_seconds == pytest.approx(90.0)
+
+
+class TestCanonicalAudio:
+    """Tests for the decoded float32 sidecar."""
+
+    def test_ensure_canonical_matches_decode(self, tmp_path):
+        path = str(tmp_path / "song.wav")
+        data = np.random.default_rng(0).uniform(-0.5, 0.5, size=(10_000, 2)).astype(np.float32)
+        sf.write(path, data, 44100)
+        expected, _ = load_audio(path)
+
+        ensure_canonical(path)
+        actual, sr = load_audio(path)
+
+        assert isinstance(actual.base, np.memmap) or isinstance(actual, np.memmap)
+        assert sr == 44100
+        np.testing.assert_array_equal(actual, expected)
+
+    def test_resamples_other_rates(self, tmp_path):
+        path = str(tmp_path / "song.wav")
+        sf.write(path, np.zeros(22050, dtype=np.float32), 22050)
+
+        canonical = np.load(ensure_canonical(path))
+
+        assert canonical.shape == (44100, 1)
+        assert canonical.dtype == np.float32
+
+    def test_stale_sidecar_is_ignored(self, tmp_path):
+        path = str(tmp_path / "song.wav")
+        sf.write(path, np.zeros(1000, dtype=np.float32), 44100)
+        ensure_canonical(path)
+        os.utime(path, (canonical_path(path).stat().st_mtime + 10,) * 2)
+
+        assert load_canonical(path) is None
+
+
+class TestResampling:
+    """Tests for the resampling fast path."""
+
+    def test_native_rate_is_read_unchanged(self, tmp_path):
+        path = str(tmp_path / "song.wav")
+        data = np.random.default_rng(0).uniform(-0.5, 0.5, size=(5000, 2)).astype(np.float32)
+        sf.write(path, data, 44100, subtype="FLOAT")
+
+        y, _ = load_audio(path)
+
+        np.testing.assert_array_equal(y, data.T)
+
+    @pytest.mark.parametrize("native_sr", [48000, 22050])
+    def test_streamed_blocks_match_full_resample(self, tmp_path, native_sr):
+        path = str(tmp_path / "song.wav")
+        t = np.arange(native_sr * 2) / native_sr
+        sf.write(path, (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32), native_sr, subtype="FLOAT")
+
+        full, _ = load_audio(path)
+        blocks = list(iter_audio_blocks(path, block_frames=4096))
+
+        assert all(b.shape[1] == 4096 for b in blocks[:-1])
+        streamed = np.concatenate(blocks, axis=1)
+        assert streamed.shape == full.shape == (2, 88200)
+        np.testing.assert_allclose(streamed, full, atol=1e-4)
+
+
+class TestWindowedReads:
+    """Tests for reading an offset/duration window of a file."""
+
+    @pytest.fixture
+    def song(self, tmp_path):
+        path = str(tmp_path / "song.wav")
+        data = np.random.default_rng(0).uniform(-0.5, 0.5, size=(44100 * 3, 2)).astype(np.float32)
+        sf.write(path, data, 44100, subtype="FLOAT")
+        return path, data
+
+    @pytest.mark.parametrize("canonical", [False, True])
+    def test_load_window(self, song, canonical):
+        path, data = song
+        if canonical:
+            ensure_canonical(path)
+
+        y, _ = load_audio(path, offset=1.0, duration=0.5)
+
+        np.testing.assert_array_equal(y, data[44100:66150].T)
+
+    @pytest.mark.parametrize("canonical", [False, True])
+    def test_streamed_window_matches_load(self, song, canonical):
+        path, _ = song
+        if canonical:
+            ensure_canonical(path)
+
+        blocks = list(iter_audio_blocks(path, block_frames=4096, offset=2.5, duration=10.0))
+
+        expected, _ = load_audio(path, offset=2.5)
+        np.testing.assert_array_equal(np.concatenate(blocks, axis=1), expected)
+        assert stream_frames(path, offset=2.5, duration=10.0) == expected.shape[1] == 22050
@@ -0,0 +1,104 @@
+"""Blob store tests."""
+import hashlib
+import os
+import pytest
+from sqlalchemy import select
+from app.config import settings
+from app.models.blob import Blob
+from app.services.blob import BlobService, _remove_blob_files, blob_path, blob_sha256, in_blob_store, stems_root
+from app.utils.storage import StoredUpload
+
+SHA = "ab" + "c" * 62
+OTHER = "ab" + "d" * 62
+
+
+@pytest.fixture(autouse=True)
+def storage_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "storage_path", str(tmp_path))
+    return tmp_path
+
+
+class TestBlobPaths:
+    def test_blob_path_round_trips(self, storage_root):
+        path = blob_path(SHA, ".wav")
+
+        assert path == storage_root / "blobs" / "ab" / f"{SHA}.wav"
+        assert blob_sha256(str(path)) == SHA
+
+    def test_derived_and_foreign_paths_are_not_blobs(self, storage_root):
+        path = str(blob_path(SHA, ".wav"))
+
+        assert blob_sha256(f"{stems_root(path)}/htdemucs/{SHA}/vocals.wav") is None
+        assert blob_sha256(str(storage_root / "projects" / "u" / "p" / f"{SHA}.wav")) is None
+        assert in_blob_store(f"{stems_root(path)}/htdemucs/{SHA}/vocals.wav")
+        assert not in_blob_store(str(storage_root / "projects" / "song.wav"))
+
+
+class TestRemoveBlobFiles:
+    def test_removes_blob_with_derived_files_only(self):
+        path = blob_path(SHA, ".wav")
+        other = blob_path(OTHER, ".wav")
+        stems = blob_path(SHA, ".wav.stems") / "htdemucs" / SHA
+        checkpoints = path.parent / ".checkpoints" / f"{SHA}.htdemucs"
+        for directory in (stems, checkpoints):
+            directory.mkdir(parents=True)
+        for f in (path, other, blob_path(SHA, ".wav.44100.f32.npy"), stems / "vocals.wav", checkpoints / "x.npy"):
+            f.write_bytes(b"data")
+
+        _remove_blob_files(str(path))
+
+        assert sorted(os.listdir(path.parent)) == [".checkpoints", other.name]
+        assert os.listdir(path.parent / ".checkpoints") == []
+
+
+def upload(storage_root, name: str, content: bytes) -> StoredUpload:
+    path = storage_root / "projects" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return StoredUpload(path=str(path), size=len(content), sha256=hashlib.sha256(content).hexdigest())
+
+
+class TestBlobReferences:
+    async def refcount(self, session, sha256):
+        session.expire_all()
+        blob = (await session.execute(select(Blob).where(Blob.sha256 == sha256))).scalar_one_or_none()
+        return blob.refcount if blob else None
+
+    async def test_identical_uploads_share_one_blob(self, pg_session, storage_root):
+        blobs = BlobService(pg_session)
+        first = upload(storage_root, "a.wav", b"audio")
+        second = upload(storage_root, "b.WAV", b"audio")
+
+        path = await blobs.ingest(first)
+        assert await blobs.ingest(second) == path
+        assert await self.refcount(pg_session, first.sha256) == 2
+        assert not os.path.exists(first.path) and not os.path.exists(second.path)
+        assert open(path, "rb").read() == b"audio"
+
+    async def test_last_release_removes_the_blob(self, pg_session, storage_root):
+        blobs = BlobService(pg_session)
+        stored = upload(storage_root, "a.wav", b"audio")
+        path = await blobs.ingest(stored)
+        await blobs.ingest(upload(storage_root, "b.wav", b"audio"))
+
+        assert await blobs.release(path)
+        assert await self.refcount(pg_session, stored.sha256) == 1
+        assert os.path.exists(path)
+
+        assert await blobs.release(path)
+        assert await self.refcount(pg_session, stored.sha256) is None
+        assert not os.path.exists(path)
+
+    async def test_reference_is_released_when_its_user_fails(self, pg_session, storage_root):
+        blobs = BlobService(pg_session)
+        stored = upload(storage_root, "a.wav", b"not audio")
+
+        with pytest.raises(ValueError):
+            async with blobs.referenced(stored) as path:
+                raise ValueError("probe failed")
+
+        assert await self.refcount(pg_session, stored.sha256) is None
+        assert not os.path.exists(path)
+
+    async def test_release_ignores_non_blobs(self, storage_root):
+        assert not await BlobService(None).release(str(storage_root / "projects" / "a.wav"))
@@ -0,0 +1,30 @@
+"""Celery queue routing tests."""
+import pytest
+from app.services.scheduler import PLAN_PRIORITIES
+from app.workers.celery_app import PRIORITY_STEPS, QUEUE_TIME_LIMITS, TASK_QUEUES, celery_app
+
+
+class TestTaskRouting:
+    @pytest.mark.parametrize("name,queue", [
+        ("app.workers.tasks.process_stems_task", "separation"),
+        ("app.workers.tasks.mix_project_task", "mixing"),
+        ("app.workers.tasks.train_voice_task", "training"),
+        ("app.workers.tasks.preview_task", "preview"),
+    ])
+    def test_routes_task_to_queue(self, name, queue):
+        route = celery_app.amqp.router.route({}, name)
+        assert route["queue"].name == queue
+
+    def test_tasks_use_their_queue_time_limit(self):
+        import app.workers.tasks  # noqa: F401  (register tasks)
+
+        for name, queue in TASK_QUEUES.items():
+            task = celery_app.tasks[name]
+            assert task.soft_time_limit == QUEUE_TIME_LIMITS[queue]
+            assert task.time_limit > task.soft_time_limit
+
+
+class TestPriorities:
+    def test_each_plan_priority_is_a_step(self):
+        assert set(PLAN_PRIORITIES.values()) <= set(PRIORITY_STEPS)
+        assert celery_app.conf.task_default_priority in PRIORITY_STEPS
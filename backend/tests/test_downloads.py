@@ -0,0 +1,150 @@
+"""Download response tests."""
+import pytest
+from httpx import ASGITransport, AsyncClient
+from app.config import settings
+from app.utils import storage_backend
+from app.utils.downloads import ZEROCOPY_EXTENSION, download_response, stored_file_response
+from app.utils.storage_backend import LocalStorage
+
+CONTENT = bytes(range(256)) * 4096
+
+
+@pytest.fixture
+def audio_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "storage_path", str(tmp_path))
+    path = tmp_path / "mix.wav"
+    path.write_bytes(CONTENT)
+    return path
+
+
+def serve(path):
+    async def app(scope, receive, send):
+        await download_response(str(path), "song-output.wav")(scope, receive, send)
+    return app
+
+
+async def fetch(path, headers=None):
+    async with AsyncClient(transport=ASGITransport(app=serve(path)), base_url="http://test") as client:
+        return await client.get("/", headers=headers or {})
+
+
+class TestDownloadResponse:
+    async def test_full_file(self, audio_file):
+        response = await fetch(audio_file)
+        assert response.status_code == 200
+        assert response.content == CONTENT
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.headers["content-type"] == "audio/x-wav"
+        assert response.headers["content-disposition"].startswith("inline")
+        assert response.headers["etag"]
+
+    async def test_range(self, audio_file):
+        response = await fetch(audio_file, {"Range": "bytes=1000-1999"})
+        assert response.status_code == 206
+        assert response.content == CONTENT[1000:2000]
+        assert response.headers["content-range"] == f"bytes 1000-1999/{len(CONTENT)}"
+
+    async def test_if_range(self, audio_file):
+        etag = (await fetch(audio_file)).headers["etag"]
+        response = await fetch(audio_file, {"Range": "bytes=0-9", "If-Range": etag})
+        assert response.status_code == 206
+
+        # A changed file restarts the download from scratch
+        response = await fetch(audio_file, {"Range": "bytes=0-9", "If-Range": '"stale"'})
+        assert response.status_code == 200
+        assert response.content == CONTENT
+
+    async def test_if_none_match(self, audio_file):
+        etag = (await fetch(audio_file)).headers["etag"]
+        response = await fetch(audio_file, {"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    async def test_range_not_satisfiable(self, audio_file):
+        response = await fetch(audio_file, {"Range": f"bytes={len(CONTENT)}-"})
+        assert response.status_code == 416
+
+    def test_missing_file(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            download_response(str(tmp_path / "missing.wav"), "missing.wav")
+
+    def test_accel_redirect(self, audio_file, monkeypatch):
+        monkeypatch.setattr(settings, "download_accel_redirect_prefix", "/protected/")
+        response = download_response(str(audio_file), "song-output.wav")
+        assert response.headers["x-accel-redirect"] == "/protected/mix.wav"
+        assert response.body == b""
+
+
+class TestZeroCopySend:
+    async def call(self, path, headers):
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message["type"] == ZEROCOPY_EXTENSION:
+                # What the server does with the descriptor
+                message["file"].seek(message["offset"])
+                message = {**message, "body": message["file"].read(message.get("count", -1))}
+            messages.append(message)
+
+        scope = {"type": "http", "method": "GET", "headers": headers, "extensions": {ZEROCOPY_EXTENSION: {}}}
+        await download_response(str(path), "song-output.wav")(scope, receive, send)
+        return messages
+
+    async def test_full_file(self, audio_file):
+        start, body = await self.call(audio_file, [])
+        assert start["status"] == 200
+        assert body["type"] == ZEROCOPY_EXTENSION
+        assert body["body"] == CONTENT
+
+    async def test_range(self, audio_file):
+        start, body = await self.call(audio_file, [(b"range", b"bytes=10-19")])
+        assert start["status"] == 206
+        assert (b"content-length", b"10") in start["headers"]
+        assert body["body"] == CONTENT[10:20]
+
+
+class PresigningStorage(LocalStorage):
+    def url(self, key, filename, media_type, expires):
+        return f"https://store.example/{key}?type={media_type}&expires={expires}"
+
+
+class TestStoredFileResponse:
+    @pytest.fixture
+    def remote(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "storage_path", str(tmp_path / "storage"))
+        monkeypatch.setattr(settings, "storage_cache_path", str(tmp_path / "cache"))
+        monkeypatch.setattr(storage_backend, "_read_cache", None)
+        source = tmp_path / "mix.wav"
+        source.write_bytes(CONTENT)
+        return source
+
+    def test_redirects_to_the_store(self, tmp_path, remote, monkeypatch):
+        backend = PresigningStorage(str(tmp_path / "remote"))
+        backend.upload(str(remote), "p/mix.wav")
+        monkeypatch.setattr(storage_backend, "_backend", backend)
+
+        response = stored_file_response(str(tmp_path / "storage" / "p" / "mix.wav"), "song-output.wav")
+
+        assert response.status_code == 307
+        assert response.headers["location"] == (
+            f"https://store.example/p/mix.wav?type=audio/x-wav&expires={settings.storage_url_ttl_seconds}"
+        )
+
+    def test_serves_through_the_cache_without_urls(self, tmp_path, remote, monkeypatch):
+        backend = LocalStorage(str(tmp_path / "remote"))
+        backend.upload(str(remote), "p/mix.wav")
+        monkeypatch.setattr(storage_backend, "_backend", backend)
+
+        response = stored_file_response(str(tmp_path / "storage" / "p" / "mix.wav"), "song-output.wav")
+
+        assert response.status_code == 200
+        assert response.path.startswith(str(tmp_path / "cache"))
+
+    def test_missing_everywhere(self, tmp_path, remote, monkeypatch):
+        monkeypatch.setattr(storage_backend, "_backend", PresigningStorage(str(tmp_path / "remote")))
+        with pytest.raises(FileNotFoundError):
+            stored_file_response(str(tmp_path / "storage" / "missing.wav"), "missing.wav")
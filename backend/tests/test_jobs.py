@@ -0,0 +1,118 @@
+"""Job submission deduplication tests."""
+from types import SimpleNamespace
+from uuid import uuid4
+import pytest
+from app.models.project import VocalMode
+from app.models.task import TaskStatus, TaskType
+from app.models.user import UserPlan
+from app.services import job as job_module
+from app.services.job import JobService, idempotency_key
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def eval(self, script, numkeys, key, expected, *args):
+        if self.data.get(key) != expected:
+            return 0
+        if script == job_module._REPLACE_CLAIM:
+            self.data[key] = args[0]
+        else:
+            del self.data[key]
+        return 1
+
+
+class FakeTasks:
+    def __init__(self, tasks):
+        self.by_celery_id = {t.celery_task_id: t for t in tasks}
+
+    async def create(self, task_type, project_id=None, celery_task_id=None):
+        raise RuntimeError("database unavailable")
+
+    async def get_by_celery_ids(self, celery_task_ids):
+        return [self.by_celery_id[i] for i in celery_task_ids if i in self.by_celery_id]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    r = FakeRedis()
+
+    async def get_redis():
+        return r
+
+    monkeypatch.setattr(job_module, "get_redis", get_redis)
+    return r
+
+
+def service_with(*tasks) -> JobService:
+    service = JobService(None)
+    service.tasks = FakeTasks(tasks)
+    return service
+
+
+class TestIdempotencyKey:
+    def test_depends_on_project_job_and_settings(self):
+        project_id = uuid4()
+        key = idempotency_key(project_id, "mixing", {"settings": {"vocal_level": 0, "reverb_amount": 0.2}})
+
+        assert key == idempotency_key(project_id, "mixing", {"settings": {"reverb_amount": 0.2, "vocal_level": 0}})
+        assert key != idempotency_key(project_id, "mixing", {"settings": {"vocal_level": -3}})
+        assert key != idempotency_key(project_id, "stem_separation", {"settings": {"vocal_level": 0}})
+        assert key != idempotency_key(uuid4(), "mixing", {"settings": {"vocal_level": 0, "reverb_amount": 0.2}})
+
+
+class TestClaim:
+    async def test_first_submission_claims_key(self, fake_redis):
+        assert await service_with()._claim("k", ["a"]) is None
+        assert fake_redis.data["k"] == "a"
+
+    async def test_duplicate_attaches_to_in_flight_task(self, fake_redis):
+        running = SimpleNamespace(celery_task_id="a", status=TaskStatus.RUNNING)
+        fake_redis.data["k"] = "a"
+
+        assert await service_with(running)._claim("k", ["b"]) == [running]
+        assert fake_redis.data["k"] == "a"
+
+    async def test_finished_job_claim_is_taken_over(self, fake_redis):
+        done = SimpleNamespace(celery_task_id="a", status=TaskStatus.COMPLETED)
+        fake_redis.data["k"] = "a"
+
+        assert await service_with(done)._claim("k", ["b"]) is None
+        assert fake_redis.data["k"] == "b"
+
+    async def test_failed_pipeline_is_not_in_flight(self, fake_redis):
+        failed = SimpleNamespace(celery_task_id="a", status=TaskStatus.FAILED)
+        pending = SimpleNamespace(celery_task_id="b", status=TaskStatus.PENDING)
+        fake_redis.data["k"] = "a,b"
+
+        assert await service_with(failed, pending)._claim("k", ["c", "d"]) is None
+        assert fake_redis.data["k"] == "c,d"
+
+
+class TestFailedSubmission:
+    async def test_job_releases_its_claim(self, fake_redis):
+        user = SimpleNamespace(id=uuid4(), plan=UserPlan.FREE)
+
+        with pytest.raises(RuntimeError):
+            await service_with().submit(user, TaskType.MIXING, {"settings": {}}, project_id=uuid4())
+        assert fake_redis.data == {}
+
+    async def test_pipeline_releases_its_claim(self, fake_redis):
+        user = SimpleNamespace(id=uuid4(), plan=UserPlan.FREE)
+        project = SimpleNamespace(
+            id=uuid4(), original_path="/s/original.wav", mix_settings={}, vocal_mode=VocalMode.BLEND
+        )
+
+        with pytest.raises(RuntimeError):
+            await service_with().submit_pipeline(user, project, "/s/project")
+        assert fake_redis.data == {}
@@ -0,0 +1,187 @@
+"""Mixing pipeline tests."""
+import numpy as np
+import pytest
+import soundfile as sf
+from app.pipelines import mixing
+from app.pipelines.mixing import mix_tracks, mix_variants, sum_tracks
+from app.pipelines.reverb import PartitionedConvolver, synthetic_impulse_response
+
+
+def write_tone(path, frames: int, channels: int, amplitude: float, sr: int = 44100, seed: int = 0) -> str:
+    """Write a noisy test signal to a float WAV file."""
+    rng = np.random.default_rng(seed)
+    data = (amplitude * rng.uniform(-1, 1, size=(frames, channels))).astype(np.float32)
+    if channels == 1:
+        data = data[:, 0]
+    sf.write(str(path), data, sr, subtype="FLOAT")
+    return str(path)
+
+
+class TestStreamingMix:
+    """The block-streaming mode must reproduce the in-memory mix."""
+
+    @pytest.mark.parametrize("inst_channels,vocal_channels", [(2, 2), (2, 1), (1, 1)])
+    @pytest.mark.parametrize("amplitude", [0.3, 0.9])
+    def test_matches_in_memory_mix(self, tmp_path, inst_channels, vocal_channels, amplitude):
+        inst = write_tone(tmp_path / "inst.wav", 100_003, inst_channels, amplitude, seed=1)
+        vocal = write_tone(tmp_path / "vocal.wav", 90_001, vocal_channels, amplitude, seed=2)
+
+        expected = mix_tracks(inst, vocal, str(tmp_path / "memory.wav"), vocal_level=-3.0, reverb_amount=0.3)
+        actual = mix_tracks(
+            inst, vocal, str(tmp_path / "stream.wav"),
+            vocal_level=-3.0, reverb_amount=0.3, streaming=True, block_frames=4096,
+        )
+
+        expected_data, expected_sr = sf.read(expected, dtype="float32")
+        actual_data, actual_sr = sf.read(actual, dtype="float32")
+        assert actual_sr == expected_sr
+        assert actual_data.shape == expected_data.shape == (90_001, 2)
+        np.testing.assert_allclose(actual_data, expected_data, atol=1e-6)
+
+    def test_window_matches_in_memory_mix(self, tmp_path):
+        inst = write_tone(tmp_path / "inst.wav", 100_000, 2, 0.5, seed=1)
+        vocal = write_tone(tmp_path / "vocal.wav", 100_000, 2, 0.5, seed=2)
+        window = {"offset": 0.5, "duration": 1.0, "reverb_amount": 0.3}
+
+        expected = mix_tracks(inst, vocal, str(tmp_path / "memory.wav"), **window)
+        actual = mix_tracks(inst, vocal, str(tmp_path / "stream.wav"), streaming=True, block_frames=4096, **window)
+
+        expected_data, _ = sf.read(expected, dtype="float32")
+        actual_data, _ = sf.read(actual, dtype="float32")
+        assert actual_data.shape == expected_data.shape == (44_100, 2)
+        np.testing.assert_allclose(actual_data, expected_data, atol=1e-6)
+
+    def test_normalizes_peak(self, tmp_path):
+        inst = write_tone(tmp_path / "inst.wav", 10_000, 2, 0.9, seed=3)
+        vocal = write_tone(tmp_path / "vocal.wav", 10_000, 2, 0.9, seed=4)
+
+        out = mix_tracks(inst, vocal, str(tmp_path / "out.wav"), streaming=True, block_frames=1000)
+
+        data, _ = sf.read(out, dtype="float32")
+        assert np.max(np.abs(data)) == pytest.approx(0.95, abs=1e-4)
+
+    def test_reports_progress(self, tmp_path):
+        inst = write_tone(tmp_path / "inst.wav", 50_000, 2, 0.5, seed=5)
+        vocal = write_tone(tmp_path / "vocal.wav", 50_000, 2, 0.5, seed=6)
+        updates = []
+
+        mix_tracks(
+            inst, vocal, str(tmp_path / "out.wav"),
+            streaming=True, block_frames=1024,
+            progress_callback=lambda progress, message: updates.append(progress),
+        )
+
+        assert updates == sorted(updates)
+        assert updates[-1] == 100
+
+    def test_resamples_other_sample_rates(self, tmp_path):
+        inst = write_tone(tmp_path / "inst.wav", 22_050, 2, 0.5, sr=22050, seed=7)
+        vocal = write_tone(tmp_path / "vocal.wav", 22_050, 2, 0.5, sr=22050, seed=8)
+
+        out = mix_tracks(inst, vocal, str(tmp_path / "out.wav"), streaming=True)
+
+        info = sf.info(out)
+        assert info.samplerate == 44100
+        assert info.frames == 44100
+
+
+class TestPartitionedConvolver:
+    """Block-wise convolution must equal direct convolution."""
+
+    @pytest.mark.parametrize("chunk", [256, 1024, 2816])
+    def test_matches_direct_convolution(self, chunk):
+        rng = np.random.default_rng(0)
+        ir = rng.standard_normal((2, 1500)).astype(np.float32)
+        x = rng.standard_normal((2, 9000)).astype(np.float32)
+        convolver = PartitionedConvolver(ir, block_size=256)
+
+        out = np.concatenate([convolver.process(x[:, i:i + chunk]) for i in range(0, x.shape[1], chunk)], axis=1)
+
+        expected = np.stack([np.convolve(x[c], ir[c])[:x.shape[1]] for c in range(2)])
+        np.testing.assert_allclose(out, expected, atol=1e-3)
+
+    def test_synthetic_impulse_response_has_unit_energy(self):
+        ir = synthetic_impulse_response(44100, decay_seconds=0.5)
+        np.testing.assert_allclose(np.sum(ir.astype(np.float64) ** 2, axis=1), 1.0, rtol=1e-4)
+
+
+class TestMixVariants:
+    """Batched variants must match individual mixes."""
+
+    def test_matches_individual_mixes(self, tmp_path):
+        inst = write_tone(tmp_path / "inst.wav", 30_000, 2, 0.6, seed=9)
+        vocal = write_tone(tmp_path / "vocal.wav", 28_000, 1, 0.6, seed=10)
+        variants = [
+            {"vocal_level": -6.0, "reverb_amount": 0.0},
+            {"vocal_level": 0.0, "reverb_amount": 0.2},
+            {"vocal_level": 6.0, "reverb_amount": 0.5},
+        ]
+        outputs = [str(tmp_path / f"variant{i}.wav") for i in range(len(variants))]
+
+        mix_variants(inst, vocal, outputs, variants, block_frames=4096)
+
+        for output, variant in zip(outputs, variants):
+            expected = mix_tracks(inst, vocal, str(tmp_path / "single.wav"), **variant)
+            np.testing.assert_allclose(
+                sf.read(output, dtype="float32")[0],
+                sf.read(expected, dtype="float32")[0],
+                atol=1e-4,
+            )
+
+    def test_decodes_inputs_once(self, tmp_path, monkeypatch):
+        inst = write_tone(tmp_path / "inst.wav", 30_000, 2, 0.6, seed=11)
+        vocal = write_tone(tmp_path / "vocal.wav", 30_000, 2, 0.6, seed=12)
+        decoded = []
+
+        def iter_audio_blocks(path, *args, **kwargs):
+            decoded.append(path)
+            yield from original(path, *args, **kwargs)
+
+        original = mixing.iter_audio_blocks
+        monkeypatch.setattr(mixing, "iter_audio_blocks", iter_audio_blocks)
+        outputs = [str(tmp_path / f"variant{i}.wav") for i in range(3)]
+        mix_variants(inst, vocal, outputs, [{"vocal_level": float(i)} for i in range(3)], block_frames=4096)
+
+        assert decoded == [inst, vocal]
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+            ["inst.wav", "vocal.wav"] + [f"variant{i}.wav{ext}" for i in range(3) for ext in ("", ".peaks.npz")]
+        )
+
+    def test_requires_one_output_per_variant(self, tmp_path):
+        with pytest.raises(ValueError):
+            mix_variants("a.wav", "b.wav", [str(tmp_path / "out.wav")], [{}, {}])
+
+
+class TestSumTracks:
+    def test_sums_without_clipping(self, tmp_path):
+        stems = [write_tone(tmp_path / f"stem{i}.wav", 50_000, 2, 0.8, seed=i) for i in range(3)]
+
+        output = sum_tracks(stems, str(tmp_path / "instrumental.wav"), block_frames=4096)
+
+        expected = sum(sf.read(stem, dtype="float32")[0] for stem in stems)
+        actual, sr = sf.read(output, dtype="float32")
+        assert sr == 44100
+        assert np.max(np.abs(actual)) > 1.0
+        np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+    def test_sums_window(self, tmp_path):
+        stems = [write_tone(tmp_path / f"stem{i}.wav", 50_000, 2, 0.5, seed=i) for i in range(2)]
+
+        output = sum_tracks(stems, str(tmp_path / "window.wav"), block_frames=4096, offset=0.5, duration=0.25)
+
+        expected = sum(sf.read(stem, dtype="float32")[0][22050:33075] for stem in stems)
+        actual, _ = sf.read(output, dtype="float32")
+        np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+    def test_normalizes_to_peak_ceiling(self, tmp_path):
+        stems = [write_tone(tmp_path / f"stem{i}.wav", 50_000, 2, 0.8, seed=i) for i in range(3)]
+
+        output = sum_tracks(stems, str(tmp_path / "mix.wav"), block_frames=4096, peak_ceiling=mixing.PEAK_CEILING)
+
+        expected = sum(sf.read(stem, dtype="float32")[0] for stem in stems)
+        expected *= mixing.PEAK_CEILING / np.max(np.abs(expected))
+        actual, _ = sf.read(output, dtype="float32")
+        np.testing.assert_allclose(actual, expected, atol=1e-6)
+        peaks = np.load(f"{output}.peaks.npz")
+        levels = [peaks[name] for name in peaks.files if name.startswith("level_")]
+        assert max(np.max(np.abs(level)) for level in levels) == round(mixing.PEAK_CEILING * 32767)
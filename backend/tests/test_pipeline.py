@@ -0,0 +1,254 @@
+"""Project pipeline orchestration tests."""
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import soundfile as sf
+from celery import chord
+from app.api.routes.audio import _variant_id, _vocal_track
+from app.config import settings
+from app.models.project import VocalMode
+from app.models.task import TaskType
+from app.schemas.project import MixVariant
+from app.services.blob import blob_path, stems_root
+from app.services.job import TASK_NAMES
+from app.workers import tasks
+from app.workers.pipeline import build_project_pipeline
+from app.workers.tasks import REDELIVERY_KEY_PREFIX, _count_redelivery, _merge, _promote, _separate
+
+
+def build(task_ids, with_vocals=True):
+    return build_project_pipeline(
+        "p1", "/s/original.wav", "/s/project", "/s/project/.staging/run", task_ids, {"vocal_level": -2.0},
+        with_vocals=with_vocals,
+    )
+
+
+def fake_task(redelivered=False):
+    return SimpleNamespace(request=SimpleNamespace(id="t1", delivery_info={"redelivered": redelivered}))
+
+
+def names(signatures):
+    return [sig.task.rsplit(".", 1)[1] for sig in signatures]
+
+
+class TestBuildProjectPipeline:
+    def test_runs_analysis_alongside_separation(self):
+        workflow = build({TaskType.STEM_SEPARATION: "s", TaskType.MIXING: "m"})
+
+        # Celery folds the stages after the chord into its body
+        (stages,) = workflow.tasks
+        assert isinstance(stages, chord)
+        assert names(stages.tasks) == ["pipeline_separate_task", "analyze_audio_task"]
+        assert names(stages.body.tasks) == ["pipeline_mix_task", "pipeline_finalize_task"]
+        assert [sig.id for sig in [*stages.tasks, *stages.body.tasks]] == ["s", None, "m", None]
+
+    def test_mix_drops_vocals_only_when_removed(self):
+        kept = build({TaskType.STEM_SEPARATION: "s", TaskType.MIXING: "m"})
+        removed = build({TaskType.STEM_SEPARATION: "s", TaskType.MIXING: "m"}, with_vocals=False)
+
+        assert kept.tasks[0].body.tasks[0]["kwargs"]["with_vocals"] is True
+        assert removed.tasks[0].body.tasks[0]["kwargs"]["with_vocals"] is False
+
+    def test_failure_callback_cleans_up_every_stage(self):
+        workflow = build({TaskType.STEM_SEPARATION: "s", TaskType.MIXING: "m"})
+
+        (errback,) = workflow.options["link_error"]
+        assert errback["task"].endswith("pipeline_failed_task")
+        assert errback["kwargs"]["staging_dir"] == "/s/project/.staging/run"
+        assert errback["kwargs"]["celery_task_ids"] == ["s", "m"]
+
+
+class TestMixVariantsJob:
+    def test_is_submitted_by_name(self):
+        assert TASK_NAMES[TaskType.MIX_VARIANTS] == tasks.mix_variants_task.name
+
+    def test_variant_ids_follow_settings(self):
+        assert _variant_id(MixVariant(vocal_level=-3.0)) == _variant_id(MixVariant(vocal_level=-3.0, reverb_amount=0.2))
+        assert _variant_id(MixVariant(vocal_level=-3.0)) != _variant_id(MixVariant(vocal_level=3.0))
+
+    def test_vocals_fall_back_to_the_vocal_stem(self):
+        def project(vocal_mode, vocals_path=None):
+            return SimpleNamespace(vocal_mode=vocal_mode, vocals_path=vocals_path, stems_path="/s/stems")
+
+        assert _vocal_track(project(VocalMode.BLEND)) == str(Path("/s/stems") / "vocals.wav")
+        assert _vocal_track(project(VocalMode.REPLACE, "/s/vocals.wav")) == "/s/vocals.wav"
+        assert _vocal_track(project(VocalMode.REMOVE, "/s/vocals.wav")) is None
+
+
+class TestArtifacts:
+    def test_merges_parallel_stage_results(self):
+        assert _merge([{"a": 1, "b": 1}, {"b": 2}]) == {"a": 1, "b": 2}
+        assert _merge({"a": 1}) == {"a": 1}
+
+    def test_promotes_file_with_sidecars(self, tmp_path):
+        staging, project = tmp_path / "staging", tmp_path / "project"
+        (staging / "mix").mkdir(parents=True)
+        (staging / "mix" / "output.wav").write_bytes(b"new")
+        (staging / "mix" / "output.wav.peaks.npz").write_bytes(b"peaks")
+        (project / "mix").mkdir(parents=True)
+        (project / "mix" / "output.wav").write_bytes(b"old")
+        (project / "mix" / "output.wav.44100.f32.npy").write_bytes(b"stale")
+
+        target = _promote(str(staging / "mix" / "output.wav"), str(staging), str(project))
+
+        assert target == str(project / "mix" / "output.wav")
+        assert sorted(p.name for p in (project / "mix").iterdir()) == ["output.wav", "output.wav.peaks.npz"]
+        assert (project / "mix" / "output.wav").read_bytes() == b"new"
+
+    def test_promotes_directory(self, tmp_path):
+        staging, project = tmp_path / "staging", tmp_path / "project"
+        (staging / "stems" / "htdemucs" / "song").mkdir(parents=True)
+        (staging / "stems" / "htdemucs" / "song" / "vocals.wav").write_bytes(b"v")
+        (project / "stems" / "htdemucs" / "song").mkdir(parents=True)
+        (project / "stems" / "htdemucs" / "song" / "old.wav").write_bytes(b"o")
+
+        target = _promote(str(staging / "stems" / "htdemucs" / "song"), str(staging), str(project))
+
+        assert sorted(p.name for p in Path(target).iterdir()) == ["vocals.wav"]
+
+
+class TestSharedStems:
+    def test_publishes_stems_once_and_reuses_them(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "stem_cache_enabled", False)
+        monkeypatch.setattr(settings, "canonical_audio_enabled", False)
+        original = tmp_path / "blob.wav"
+        sf.write(str(original), np.zeros((1000, 2), dtype=np.float32), 44100)
+        calls = []
+
+        def fake_separate(input_path, output_dir, model_name, **kwargs):
+            calls.append(output_dir)
+            stems_dir = Path(output_dir) / model_name / Path(input_path).stem
+            stems_dir.mkdir(parents=True)
+            stems = {}
+            for name in ("vocals", "drums", "bass", "other"):
+                stems[name] = str(stems_dir / f"{name}.wav")
+                sf.write(stems[name], np.full((1000, 2), 0.1, dtype=np.float32), 44100, subtype="FLOAT")
+            return stems
+
+        monkeypatch.setattr(tasks, "separate_stems", fake_separate)
+        output_dir = str(tmp_path / "blob.wav.stems")
+
+        first = _separate(fake_task(), str(original), output_dir, "p1", None)
+        second = _separate(fake_task(), str(original), output_dir, "p2", None)
+
+        assert len(calls) == 1
+        assert first == second
+        assert first["stems_dir"] == str(Path(output_dir) / settings.demucs_model / "blob")
+        np.testing.assert_allclose(sf.read(first["instrumental"])[0], 0.3, atol=1e-6)
+        # The private work directory is gone once the stems are published
+        assert sorted(p.name for p in Path(output_dir).iterdir()) == [settings.demucs_model]
+
+    def test_blobs_skip_the_stem_cache(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "storage_path", str(tmp_path))
+        monkeypatch.setattr(settings, "stem_cache_enabled", True)
+        monkeypatch.setattr(settings, "canonical_audio_enabled", False)
+        sha256 = "ab" * 32
+        original = blob_path(sha256, ".wav")
+        original.parent.mkdir(parents=True)
+        sf.write(str(original), np.zeros((1000, 2), dtype=np.float32), 44100)
+
+        def fake_separate(input_path, output_dir, model_name, **kwargs):
+            stems_dir = Path(output_dir) / model_name / Path(input_path).stem
+            stems_dir.mkdir(parents=True)
+            stems = {}
+            for name in ("vocals", "drums", "bass", "other"):
+                stems[name] = str(stems_dir / f"{name}.wav")
+                sf.write(stems[name], np.zeros((1000, 2), dtype=np.float32), 44100)
+            return stems
+
+        def no_cache():
+            raise AssertionError("blob stems went through the stem cache")
+
+        monkeypatch.setattr(tasks, "separate_stems", fake_separate)
+        monkeypatch.setattr(tasks, "get_stem_cache", no_cache)
+
+        result = _separate(fake_task(), str(original), stems_root(str(original)), "p1", None)
+        assert set(result["stems"]) == {"vocals", "drums", "bass", "other"}
+
+
+class TestPreview:
+    def test_instrumental_lands_next_to_the_fetched_stems(self, tmp_path, monkeypatch):
+        local = tmp_path / "cache" / "local-copy.wav"
+        separated = []
+
+        def fake_separate(input_path, output_dir, model_name, **kwargs):
+            stems_dir = Path(output_dir) / model_name / Path(input_path).stem
+            stems_dir.mkdir(parents=True)
+            stems = {}
+            for name in ("vocals", "drums", "bass", "other"):
+                stems[name] = str(stems_dir / f"{name}.wav")
+                sf.write(stems[name], np.full((1000, 2), 0.1, dtype=np.float32), 44100, subtype="FLOAT")
+            separated.append(stems_dir)
+            return stems
+
+        @contextmanager
+        def no_events(*args, **kwargs):
+            yield None
+
+        mixed = []
+        monkeypatch.setattr(tasks, "_progress_events", no_events)
+        monkeypatch.setattr(tasks, "fetch", lambda path: str(local))
+        monkeypatch.setattr(tasks, "separate_stems", fake_separate)
+        monkeypatch.setattr(tasks, "_mix", lambda instrumental, vocals, *args: mixed.append(instrumental))
+
+        output_path = tmp_path / "preview" / "0-15000" / "preview.wav"
+        tasks.preview_task(str(output_path), 0.0, 15.0, {}, input_path="blobs/ab/remote-name.wav")
+
+        assert mixed == [str(separated[0] / "instrumental.wav")]
+        np.testing.assert_allclose(sf.read(mixed[0])[0], 0.3, atol=1e-6)
+
+
+class TestPreviewEviction:
+    def test_keeps_the_most_recent_windows(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "preview_max_windows", 2)
+        removed = []
+        monkeypatch.setattr(tasks, "remove", removed.append)
+        preview_root = tmp_path / "preview"
+        for age, window in enumerate(["0-15000", "15000-15000", "30000-15000"]):
+            (preview_root / window).mkdir(parents=True)
+            (preview_root / window / "preview.wav").write_bytes(b"audio")
+            os.utime(preview_root / window, (1000 - age, 1000 - age))
+
+        # Re-rendering the oldest window makes it the most recent one
+        tasks._evict_previews(preview_root / "30000-15000")
+
+        assert sorted(p.name for p in preview_root.iterdir()) == ["0-15000", "30000-15000"]
+        assert removed == [str(preview_root / "15000-15000")]
+
+
+class FakeCounter:
+    """The slice of a Redis pipeline that counts redeliveries."""
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    def pipeline(self):
+        return self
+
+    def incr(self, key):
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.key = key
+
+    def expire(self, key, ttl):
+        pass
+
+    def execute(self):
+        return [self.counts[self.key], True]
+
+
+class TestRedeliveryCap:
+    def test_fails_after_repeated_worker_loss(self, monkeypatch):
+        counts = {}
+        monkeypatch.setattr(tasks, "get_scheduler", lambda: SimpleNamespace(redis=FakeCounter(counts)))
+        monkeypatch.setattr(settings, "separation_max_redeliveries", 2)
+
+        _count_redelivery(fake_task())
+        assert counts == {}
+        _count_redelivery(fake_task(redelivered=True))
+        _count_redelivery(fake_task(redelivered=True))
+        with pytest.raises(RuntimeError):
+            _count_redelivery(fake_task(redelivered=True))
+        assert counts == {f"{REDELIVERY_KEY_PREFIX}t1": 3}
@@ -0,0 +1,31 @@
+"""Progress event fan-out tests."""
+from app.utils.progress_events import ProgressBroadcaster, QUEUE_SIZE
+
+
+class TestProgressBroadcaster:
+    """Tests for ProgressBroadcaster dispatch (no Redis needed)."""
+
+    async def test_dispatches_to_project_subscribers(self):
+        broadcaster = ProgressBroadcaster("redis://localhost:1/0")
+        try:
+            async with broadcaster.subscribe("a") as queue_a, broadcaster.subscribe("b") as queue_b:
+                assert broadcaster.connections == 2
+                broadcaster._dispatch("a", '{"progress": 10}')
+
+                assert queue_a.get_nowait() == '{"progress": 10}'
+                assert queue_b.empty()
+            assert broadcaster.connections == 0
+        finally:
+            await broadcaster.close()
+
+    async def test_slow_subscriber_drops_oldest(self):
+        broadcaster = ProgressBroadcaster("redis://localhost:1/0")
+        try:
+            async with broadcaster.subscribe("a") as queue:
+                for i in range(QUEUE_SIZE + 5):
+                    broadcaster._dispatch("a", str(i))
+
+                assert queue.qsize() == QUEUE_SIZE
+                assert queue.get_nowait() == "5"
+        finally:
+            await broadcaster.close()
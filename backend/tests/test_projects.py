@@ -0,0 +1,138 @@
+"""Project service tests."""
+import pytest
+from sqlalchemy import select
+from app.config import settings
+from app.models.project import Project
+from app.models.task import Task, TaskStatus, TaskType
+from app.models.user import User
+from app.models.voice_persona import VoicePersona
+from app.services import project as project_module
+from app.services.project import ProjectService
+from app.services.voice_persona import VoicePersonaService
+from app.utils.audio import AudioInfo
+from app.utils.storage import get_file_path, project_subdir
+
+
+@pytest.fixture
+async def user(pg_session):
+    user = User(email="owner@example.com", password_hash="x")
+    pg_session.add(user)
+    await pg_session.commit()
+    return user
+
+
+class TestDeleteWithTasks:
+    async def test_delete_project_with_tasks(self, pg_session, user, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "storage_path", str(tmp_path))
+        project = Project(user_id=user.id, name="song")
+        pg_session.add(project)
+        await pg_session.commit()
+        output = get_file_path(project_subdir(user.id, project.id)) / "mix" / "output.wav"
+        output.parent.mkdir(parents=True)
+        output.write_bytes(b"mix")
+        project.output_path = str(output)
+        pg_session.add(Task(project_id=project.id, task_type=TaskType.MIXING, status=TaskStatus.COMPLETED))
+        await pg_session.commit()
+
+        await ProjectService(pg_session).delete(project.id, user.id)
+
+        assert (await pg_session.execute(select(Task))).scalars().all() == []
+        assert not output.exists()
+
+    async def test_delete_persona_with_tasks(self, pg_session, user):
+        persona = VoicePersona(user_id=user.id, name="voice")
+        pg_session.add(persona)
+        await pg_session.commit()
+        pg_session.add(Task(voice_persona_id=persona.id, task_type=TaskType.VOICE_TRAINING))
+        await pg_session.commit()
+
+        await VoicePersonaService(pg_session).delete(persona.id, user.id)
+
+        assert (await pg_session.execute(select(Task))).scalars().all() == []
+
+
+class TestDeleteOrdering:
+    async def test_files_survive_a_failed_delete(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "storage_path", str(tmp_path))
+        output = tmp_path / "projects" / "u" / "p" / "mix" / "output.wav"
+        output.parent.mkdir(parents=True)
+        output.write_bytes(b"mix")
+        project = Project(name="song", output_path=str(output))
+
+        class FailingSession:
+            async def delete(self, obj):
+                pass
+
+            async def commit(self):
+                raise RuntimeError("integrity error")
+
+        service = ProjectService(FailingSession())
+
+        async def get_by_id(project_id, user_id):
+            return project
+
+        monkeypatch.setattr(service, "get_by_id", get_by_id)
+        with pytest.raises(RuntimeError):
+            await service.delete("p", "u")
+        assert output.exists()
+
+
+class TestDeleteFiles:
+    async def test_removes_mix_variants_and_previews(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "storage_path", str(tmp_path))
+        project_dir = get_file_path(project_subdir("u", "p"))
+        for name in ("mix/output.wav", "mix/variants/0123456789abcdef.wav", "preview/0-15000/preview.wav"):
+            (project_dir / name).parent.mkdir(parents=True, exist_ok=True)
+            (project_dir / name).write_bytes(b"audio")
+        project = Project(name="song", output_path=str(project_dir / "mix" / "output.wav"))
+
+        class Session:
+            async def delete(self, obj):
+                pass
+
+            async def commit(self):
+                pass
+
+        service = ProjectService(Session())
+
+        async def get_by_id(project_id, user_id):
+            return project
+
+        monkeypatch.setattr(service, "get_by_id", get_by_id)
+        await service.delete("p", "u")
+        assert not project_dir.exists()
+
+
+class TestAttachOriginal:
+    async def test_peaks_are_left_to_a_worker(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "storage_path", str(tmp_path))
+        original = tmp_path / "blobs" / "ab" / "song.wav"
+        original.parent.mkdir(parents=True)
+        original.write_bytes(b"audio")
+
+        class Result:
+            def scalar_one_or_none(self):
+                return None
+
+        class Session:
+            async def execute(self, statement):
+                return Result()
+
+        sent = []
+
+        class Signature:
+            def apply_async(self):
+                sent.append(True)
+
+        service = ProjectService(Session())
+        info = AudioInfo(duration_seconds=1.0, sample_rate=44100, channels=2, codec="wav")
+        monkeypatch.setattr("app.utils.audio.probe_audio", lambda path: info)
+        monkeypatch.setattr(project_module.celery_app, "signature", lambda name, args, kwargs: Signature())
+
+        async def update_status(*args, **kwargs):
+            pass
+
+        monkeypatch.setattr(service, "update_status", update_status)
+        assert await service.attach_original("p", str(original)) == info
+        assert sent == [True]
+        assert not any(original.parent.glob("song.wav.*"))
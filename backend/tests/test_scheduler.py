@@ -0,0 +1,156 @@
+"""Fair-share job scheduler tests."""
+import uuid
+from types import SimpleNamespace
+import pytest
+import redis
+from app.config import settings
+from app.models.user import UserPlan
+from app.services import scheduler as scheduler_module
+from app.services.scheduler import KEY_PREFIX, PREVIEW_LANE, JobScheduler, _percentile, plan_cap
+from app.workers.celery_app import (
+    QUEUE_SEPARATION,
+    QUEUE_TIME_LIMITS,
+    SCHEDULER_SLOT_TTL_SECONDS,
+    TASK_QUEUES,
+    celery_app,
+    release_revoked_job,
+)
+
+
+class FakeSignature(dict):
+    """Stand-in for a Celery signature that records dispatches."""
+
+    sent = []
+
+    def apply_async(self):
+        FakeSignature.sent.append(self["id"])
+
+
+class FakeApp:
+    def signature(self, data):
+        return FakeSignature(data)
+
+
+@pytest.fixture
+def scheduler():
+    client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+    try:
+        client.ping()
+    except redis.RedisError:
+        pytest.skip("Redis is not available")
+    for key in client.scan_iter(f"{KEY_PREFIX}*"):
+        client.delete(key)
+    FakeSignature.sent = []
+    yield JobScheduler(client, FakeApp())
+    for key in client.scan_iter(f"{KEY_PREFIX}*"):
+        client.delete(key)
+
+
+def submit(scheduler, user, plan=UserPlan.FREE, lane=None):
+    job_id = uuid.uuid4().hex
+    scheduler.submit(user, plan, job_id, job_id, FakeSignature(id=job_id), lane=lane)
+    return job_id
+
+
+class TestPlanPolicy:
+    def test_caps_by_plan(self):
+        assert plan_cap(UserPlan.FREE) == settings.free_max_concurrent_jobs
+        assert plan_cap(UserPlan.PRO) == settings.pro_max_concurrent_jobs
+        assert plan_cap(UserPlan.ADMIN) == 0
+
+    def test_previews_have_their_own_cap(self):
+        assert plan_cap(UserPlan.FREE, PREVIEW_LANE) == settings.preview_max_concurrent_jobs
+        assert plan_cap(UserPlan.PRO, PREVIEW_LANE) == settings.preview_max_concurrent_jobs
+        assert plan_cap(UserPlan.ADMIN, PREVIEW_LANE) == 0
+
+    def test_percentile(self):
+        assert _percentile([], 0.95) is None
+        assert _percentile([float(i) for i in range(100)], 0.95) == 95.0
+
+    def test_slot_outlives_retried_separation(self):
+        attempts = settings.separation_max_retries + 1
+        assert SCHEDULER_SLOT_TTL_SECONDS > QUEUE_TIME_LIMITS[QUEUE_SEPARATION] * attempts
+
+    def test_held_jobs_are_dispatched_periodically(self):
+        entry = celery_app.conf.beat_schedule["dispatch-held-jobs"]
+        assert entry["task"] in TASK_QUEUES
+
+    def test_revoked_task_releases_its_slot(self, monkeypatch):
+        released = []
+        monkeypatch.setattr(scheduler_module, "_scheduler", SimpleNamespace(release=released.append))
+        release_revoked_job(request=SimpleNamespace(id="job"))
+        assert released == ["job"]
+
+
+class TestJobScheduler:
+    def test_holds_jobs_over_the_users_cap(self, scheduler):
+        user = uuid.uuid4()
+        jobs = [submit(scheduler, user) for _ in range(3)]
+
+        assert FakeSignature.sent == jobs[:settings.free_max_concurrent_jobs]
+        assert scheduler.metrics()["free"]["pending"] == 3 - settings.free_max_concurrent_jobs
+
+    def test_releases_dispatch_round_robin(self, scheduler, monkeypatch):
+        monkeypatch.setattr(settings, "free_max_concurrent_jobs", 1)
+        heavy, light = uuid.uuid4(), uuid.uuid4()
+        heavy_jobs = [submit(scheduler, heavy) for _ in range(3)]
+        light_jobs = [submit(scheduler, light) for _ in range(2)]
+        assert FakeSignature.sent == [heavy_jobs[0], light_jobs[0]]
+
+        scheduler.release(heavy_jobs[0])
+        scheduler.release(light_jobs[0])
+        scheduler.release(heavy_jobs[1])
+
+        assert FakeSignature.sent == [heavy_jobs[0], light_jobs[0], heavy_jobs[1], light_jobs[1], heavy_jobs[2]]
+
+    def test_release_is_idempotent(self, scheduler, monkeypatch):
+        monkeypatch.setattr(settings, "free_max_concurrent_jobs", 1)
+        user = uuid.uuid4()
+        first, second, third = (submit(scheduler, user) for _ in range(3))
+
+        assert scheduler.release(first)
+        assert not scheduler.release(first)
+        assert FakeSignature.sent == [first, second]
+
+    def test_expired_slots_are_handed_on(self, scheduler, monkeypatch):
+        monkeypatch.setattr(settings, "free_max_concurrent_jobs", 1)
+        user = uuid.uuid4()
+        lost, held = submit(scheduler, user), submit(scheduler, user)
+        assert FakeSignature.sent == [lost]
+
+        # The worker running the first job died without releasing its slot
+        scheduler.redis.zadd(f"{KEY_PREFIX}running:{user}", {lost: 0})
+        assert scheduler.dispatch_pending() == 1
+        assert FakeSignature.sent == [lost, held]
+
+    def test_submit_dispatches_held_jobs_first(self, scheduler, monkeypatch):
+        monkeypatch.setattr(settings, "free_max_concurrent_jobs", 1)
+        user = uuid.uuid4()
+        lost, held = submit(scheduler, user), submit(scheduler, user)
+        scheduler.redis.zadd(f"{KEY_PREFIX}running:{user}", {lost: 0})
+
+        newest = submit(scheduler, user)
+        assert FakeSignature.sent == [lost, held]
+        scheduler.release(held)
+        assert FakeSignature.sent == [lost, held, newest]
+
+    def test_previews_are_capped_apart_from_jobs(self, scheduler, monkeypatch):
+        monkeypatch.setattr(settings, "free_max_concurrent_jobs", 1)
+        monkeypatch.setattr(settings, "preview_max_concurrent_jobs", 1)
+        user = uuid.uuid4()
+        job = submit(scheduler, user)
+        first, second = (submit(scheduler, user, lane=PREVIEW_LANE) for _ in range(2))
+        assert FakeSignature.sent == [job, first]
+
+        scheduler.release(first)
+        assert FakeSignature.sent == [job, first, second]
+        assert scheduler.redis.ttl(f"{KEY_PREFIX}job:{second}") <= settings.preview_time_limit + 60
+
+    def test_records_queue_wait(self, scheduler):
+        job = submit(scheduler, uuid.uuid4(), UserPlan.PRO)
+        scheduler.record_start(job)
+        scheduler.record_start(job)
+
+        metrics = scheduler.metrics()["pro"]
+        assert metrics["started"] == 1
+        assert metrics["wait_seconds_p95"] is not None
@@ -0,0 +1,54 @@
+"""Stem cache tests."""
+import os
+from pathlib import Path
+from app.pipelines.stem_cache import StemCache
+
+
+def make_stems(directory: Path, size: int) -> dict:
+    directory.mkdir(parents=True, exist_ok=True)
+    stems = {}
+    for name in ["vocals", "drums"]:
+        path = directory / f"{name}.wav"
+        path.write_bytes(os.urandom(size))
+        stems[name] = str(path)
+    return stems
+
+
+class TestStemCache:
+    """Tests for StemCache."""
+
+    def test_key_depends_on_content_and_model(self, tmp_path):
+        cache = StemCache(tmp_path / "cache", 10**9)
+        a = tmp_path / "a.wav"
+        b = tmp_path / "b.wav"
+        a.write_bytes(b"same")
+        b.write_bytes(b"same")
+        assert cache.key_for(str(a), "htdemucs") == cache.key_for(str(b), "htdemucs")
+        assert cache.key_for(str(a), "htdemucs") != cache.key_for(str(a), "mdx")
+
+    def test_miss_then_hit(self, tmp_path):
+        cache = StemCache(tmp_path / "cache", 10**9)
+        (tmp_path / "cache").mkdir()
+        stems = make_stems(tmp_path / "job1", 100)
+
+        assert cache.get("k", tmp_path / "job2") is None
+        cache.put("k", stems)
+        hit = cache.get("k", tmp_path / "job2")
+
+        assert set(hit) == {"vocals", "drums"}
+        assert Path(hit["vocals"]).read_bytes() == Path(stems["vocals"]).read_bytes()
+        assert cache.stats() == {"hits": 1, "misses": 1}
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = StemCache(tmp_path / "cache", 500)
+        (tmp_path / "cache").mkdir()
+        cache.put("old", make_stems(tmp_path / "old", 100))
+        os.utime(tmp_path / "cache" / "old" / "stems.json", (1, 1))
+        cache.put("new", make_stems(tmp_path / "new", 100))
+        os.utime(tmp_path / "cache" / "new" / "stems.json", (2, 2))
+
+        cache.put("newest", make_stems(tmp_path / "newest", 100))
+
+        assert not (tmp_path / "cache" / "old").exists()
+        assert (tmp_path / "cache" / "new").exists()
+        assert (tmp_path / "cache" / "newest").exists()
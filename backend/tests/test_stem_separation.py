@@ -0,0 +1,215 @@
+"""Stem separation tests (model-free)."""
+import sys
+import numpy as np
+import pytest
+import soundfile as sf
+from app.config import settings
+from app.pipelines import stem_separation
+from app.pipelines.stem_separation import STEM_NAMES, plan_segments, separate_stems, StemStitcher
+
+
+class TestPlanSegments:
+    """Tests for plan_segments function."""
+
+    def test_short_input_is_one_segment(self):
+        assert plan_segments(100, 1000, 10) == [(0, 100)]
+
+    def test_segments_cover_input_with_overlap(self):
+        segments = plan_segments(10_000, 3000, 500)
+        assert segments[0][0] == 0
+        assert segments[-1][1] == 10_000
+        for (_, prev_end), (start, _) in zip(segments, segments[1:]):
+            assert prev_end - start == 500
+
+    def test_overlap_must_be_shorter_than_segment(self):
+        with pytest.raises(ValueError):
+            plan_segments(10_000, 500, 500)
+
+
+class TestStemStitcher:
+    """Stitching identity "separations" must reproduce the input."""
+
+    @pytest.mark.parametrize("order", ["forward", "reverse"])
+    def test_reconstructs_input(self, tmp_path, order):
+        rng = np.random.default_rng(0)
+        wav = rng.uniform(-0.5, 0.5, size=(2, 20_011)).astype(np.float32)
+        segments = plan_segments(wav.shape[1], 4000, 300)
+        indices = list(range(len(segments)))
+        if order == "reverse":
+            indices.reverse()
+
+        with StemStitcher(tmp_path, ["a", "b"], 44100, 2, segments) as stitcher:
+            for i in indices:
+                start, end = segments[i]
+                chunk = wav[:, start:end]
+                stitcher.add(i, np.stack([chunk, chunk * 0.5]))
+
+        a, _ = sf.read(stitcher.paths["a"], dtype="float32")
+        b, _ = sf.read(stitcher.paths["b"], dtype="float32")
+        assert a.shape == (wav.shape[1], 2)
+        np.testing.assert_allclose(a.T, wav, atol=1e-4)
+        np.testing.assert_allclose(b.T, wav * 0.5, atol=1e-4)
+
+    def test_missing_segment_raises(self, tmp_path):
+        segments = plan_segments(10_000, 4000, 100)
+        with pytest.raises(RuntimeError):
+            with StemStitcher(tmp_path, ["a"], 44100, 1, segments) as stitcher:
+                start, end = segments[0]
+                stitcher.add(0, np.zeros((1, 1, end - start), dtype=np.float32))
+
+
+class FakeEngine:
+    """Deterministic "separation" that can be made to fail after some segments."""
+
+    samplerate = 44100
+    channels = 2
+    sources = STEM_NAMES
+
+    def __init__(self, fail_after=None):
+        self.calls = 0
+        self.fail_after = fail_after
+        self.overlaps = set()
+
+    def separate_segment(self, wav, mean, std, overlap=0.25):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise RuntimeError("Worker interrupted")
+        self.calls += 1
+        self.overlaps.add(overlap)
+        return np.stack([wav * gain for gain in (0.4, 0.3, 0.2, 0.1)]).astype(np.float32)
+
+
+class TestCheckpointedSeparation:
+    @pytest.fixture(autouse=True)
+    def short_segments(self, monkeypatch):
+        monkeypatch.setattr(settings, "separation_segment_seconds", 0.5)
+        monkeypatch.setattr(settings, "separation_overlap_seconds", 0.05)
+
+    def run(self, monkeypatch, engine, input_path, output_dir, checkpoint_dir):
+        monkeypatch.setattr(stem_separation, "get_engine", lambda *args: engine)
+        return separate_stems(input_path, str(output_dir), checkpoint_dir=str(checkpoint_dir))
+
+    def test_resumes_from_completed_segments(self, tmp_path, monkeypatch):
+        rng = np.random.default_rng(0)
+        input_path = str(tmp_path / "song.wav")
+        sf.write(input_path, rng.uniform(-0.5, 0.5, size=(3 * 44100, 2)).astype(np.float32), 44100, subtype="FLOAT")
+        checkpoints = tmp_path / "checkpoints"
+
+        with pytest.raises(RuntimeError):
+            self.run(monkeypatch, FakeEngine(fail_after=3), input_path, tmp_path / "out", checkpoints)
+        assert len(list(checkpoints.glob("segment_*.npy"))) == 3
+
+        resumed = FakeEngine()
+        stems = self.run(monkeypatch, resumed, input_path, tmp_path / "out", checkpoints)
+        reference = FakeEngine()
+        expected = self.run(monkeypatch, reference, input_path, tmp_path / "reference", tmp_path / "other")
+
+        assert resumed.calls == reference.calls - 3
+        assert not checkpoints.exists()
+        for name in STEM_NAMES:
+            np.testing.assert_array_equal(sf.read(stems[name])[0], sf.read(expected[name])[0])
+
+    def test_ignores_checkpoints_of_other_input(self, tmp_path, monkeypatch):
+        input_path = str(tmp_path / "song.wav")
+        sf.write(input_path, np.zeros((44100, 2), dtype=np.float32), 44100)
+        checkpoints = tmp_path / "checkpoints"
+        checkpoints.mkdir()
+        (checkpoints / "checkpoint.json").write_text('{"fingerprint": "other"}')
+        np.save(checkpoints / "segment_00000.npy", np.ones((4, 2, 10), dtype=np.float32))
+
+        engine = FakeEngine()
+        self.run(monkeypatch, engine, input_path, tmp_path / "out", checkpoints)
+
+        assert engine.calls == len(plan_segments(44100, 22050, 2205))
+
+    def test_passes_split_overlap_to_the_model(self, tmp_path, monkeypatch):
+        input_path = str(tmp_path / "song.wav")
+        sf.write(input_path, np.zeros((44100, 2), dtype=np.float32), 44100)
+        engine = FakeEngine()
+        monkeypatch.setattr(stem_separation, "get_engine", lambda *args: engine)
+
+        separate_stems(input_path, str(tmp_path / "preview"), split_overlap=settings.preview_split_overlap)
+
+        assert engine.overlaps == {settings.preview_split_overlap}
+        assert settings.preview_split_overlap < stem_separation.SPLIT_OVERLAP
+
+    def test_separates_only_the_window(self, tmp_path, monkeypatch):
+        rng = np.random.default_rng(1)
+        data = rng.uniform(-0.5, 0.5, size=(3 * 44100, 2)).astype(np.float32)
+        input_path = str(tmp_path / "song.wav")
+        sf.write(input_path, data, 44100, subtype="FLOAT")
+        monkeypatch.setattr(stem_separation, "get_engine", lambda *args: FakeEngine())
+
+        stems = separate_stems(input_path, str(tmp_path / "preview"), offset=1.0, duration=1.5)
+
+        vocals, _ = sf.read(stems["vocals"], dtype="float32")
+        assert vocals.shape == (66150, 2)
+        np.testing.assert_allclose(vocals, data[44100:110250] * 0.4, atol=1e-4)
+
+
+def _separate_in_child(input_path, output_dir, result):
+    try:
+        stems = separate_stems(input_path, output_dir, workers=2)
+        result.put(sorted(stems))
+    except BaseException as e:
+        result.put(repr(e))
+
+
+class TestParallelSeparation:
+    @pytest.fixture(autouse=True)
+    def short_segments(self, monkeypatch):
+        monkeypatch.setattr(settings, "separation_segment_seconds", 0.5)
+        monkeypatch.setattr(settings, "separation_overlap_seconds", 0.05)
+
+    def test_matches_serial(self, tmp_path, monkeypatch):
+        rng = np.random.default_rng(2)
+        input_path = str(tmp_path / "song.wav")
+        sf.write(input_path, rng.uniform(-0.5, 0.5, size=(3 * 44100, 2)).astype(np.float32), 44100, subtype="FLOAT")
+        monkeypatch.setattr(stem_separation, "get_engine", lambda *args: FakeEngine())
+
+        parallel = separate_stems(input_path, str(tmp_path / "parallel"), workers=3)
+        serial = separate_stems(input_path, str(tmp_path / "serial"))
+        for name in STEM_NAMES:
+            np.testing.assert_array_equal(sf.read(parallel[name])[0], sf.read(serial[name])[0])
+
+    def test_restores_torch_threads(self, tmp_path, monkeypatch):
+        class FakeTorch:
+            num_threads = 8
+            during = []
+
+            @classmethod
+            def get_num_threads(cls):
+                return cls.num_threads
+
+            @classmethod
+            def set_num_threads(cls, n):
+                cls.num_threads = n
+
+        class ThreadCountingEngine(FakeEngine):
+            def separate_segment(self, segment, mean, std, split_overlap):
+                FakeTorch.during.append(FakeTorch.num_threads)
+                return super().separate_segment(segment, mean, std, split_overlap)
+
+        input_path = str(tmp_path / "song.wav")
+        sf.write(input_path, np.zeros((3 * 44100, 2), dtype=np.float32), 44100)
+        monkeypatch.setitem(sys.modules, "torch", FakeTorch)
+        monkeypatch.setattr(stem_separation.os, "cpu_count", lambda: 8)
+        monkeypatch.setattr(stem_separation, "get_engine", lambda *args: ThreadCountingEngine())
+
+        separate_stems(input_path, str(tmp_path / "out"), workers=2)
+        assert set(FakeTorch.during) == {4}
+        assert FakeTorch.num_threads == 8
+
+    def test_runs_in_daemonic_process(self, tmp_path, monkeypatch):
+        """Celery's prefork children are daemonic and may not start processes."""
+        import multiprocessing
+
+        input_path = str(tmp_path / "song.wav")
+        sf.write(input_path, np.zeros((3 * 44100, 2), dtype=np.float32), 44100)
+        monkeypatch.setattr(stem_separation, "get_engine", lambda *args: FakeEngine())
+
+        context = multiprocessing.get_context("fork")
+        result = context.Queue()
+        child = context.Process(target=_separate_in_child, args=(input_path, str(tmp_path / "out"), result), daemon=True)
+        child.start()
+        child.join(60)
+        assert result.get(timeout=5) == sorted(STEM_NAMES)
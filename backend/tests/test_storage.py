@@ -1,8 +1,11 @@
 """Storage utility tests."""
+import hashlib
 import pytest
 from io import BytesIO
 from fastapi import UploadFile, HTTPException
-from app.utils.storage import validate_audio_file, ALLOWED_AUDIO_EXTENSIONS, ALLOWED_AUDIO_MIMETYPES
+from app.config import settings
+from app.utils import storage
+from app.utils.storage import save_upload, validate_audio_file, ALLOWED_AUDIO_EXTENSIONS, ALLOWED_AUDIO_MIMETYPES
 
 
 def create_upload_file(filename: str, content_type: str | None = None, content: bytes = b"test") -> UploadFile:
@@ -78,3 +81,50 @@ class TestValidateAudioFile:
         file = create_upload_file("test.MP3", "audio/mpeg")
         # Should not raise - extension should be lowercased
         validate_audio_file(file)
+
+
+class CountingBytesIO(BytesIO):
+    """BytesIO that records the largest single read."""
+
+    largest_read = 0
+    total_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.largest_read = max(self.largest_read, len(data))
+        self.total_read += len(data)
+        return data
+
+
+class TestSaveUpload:
+    """Tests for save_upload function."""
+
+    @pytest.fixture(autouse=True)
+    def storage_root(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "storage_path", str(tmp_path))
+        monkeypatch.setattr(storage, "UPLOAD_CHUNK_SIZE", 1024)
+        return tmp_path
+
+    async def test_streams_to_disk_with_digest(self, storage_root):
+        content = bytes(range(256)) * 40
+        body = CountingBytesIO(content)
+        upload = UploadFile(filename="song.wav", file=body, headers={"content-type": "audio/wav"})
+
+        stored = await save_upload(upload, "uploads")
+
+        assert open(stored.path, "rb").read() == content
+        assert stored.size == len(content)
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+        assert body.largest_read <= 1024
+        assert [p.name for p in (storage_root / "uploads").iterdir()] == [stored.path.rsplit("/", 1)[1]]
+
+    async def test_rejects_oversized_upload_without_reading_it_all(self, storage_root):
+        body = CountingBytesIO(b"x" * (3 * 1024 * 1024))
+        upload = UploadFile(filename="song.wav", file=body, headers={"content-type": "audio/wav"})
+
+        with pytest.raises(HTTPException) as exc_info:
+            await save_upload(upload, "uploads", max_size_mb=1)
+
+        assert exc_info.value.status_code == 400
+        assert body.total_read == 1024 * 1024 + 1
+        assert list((storage_root / "uploads").iterdir()) == []
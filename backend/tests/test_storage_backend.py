@@ -0,0 +1,210 @@
+"""Storage backend tests."""
+import os
+import numpy as np
+import pytest
+import soundfile as sf
+from app.config import settings
+from app.utils import storage_backend
+from app.utils.storage_backend import LocalStorage, ReadThroughCache, fetch, localize, publish, remove
+
+
+@pytest.fixture
+def remote(tmp_path, monkeypatch):
+    """A local backend standing in for a remote store, with this node's storage beside it."""
+    monkeypatch.setattr(settings, "storage_path", str(tmp_path / "storage"))
+    monkeypatch.setattr(settings, "storage_cache_path", str(tmp_path / "cache"))
+    backend = LocalStorage(str(tmp_path / "remote"))
+    monkeypatch.setattr(storage_backend, "_backend", backend)
+    monkeypatch.setattr(storage_backend, "_read_cache", None)
+    return backend
+
+
+def write(path, content: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return str(path)
+
+
+class TestLocalStorage:
+    def test_round_trip(self, tmp_path):
+        backend = LocalStorage(str(tmp_path / "store"))
+        source = write(tmp_path / "a.wav", b"audio")
+        backend.upload(source, "projects/1/a.wav")
+        backend.download("projects/1/a.wav", str(tmp_path / "copy.wav"))
+        assert (tmp_path / "copy.wav").read_bytes() == b"audio"
+        with backend.open("projects/1/a.wav") as f:
+            f.seek(1)
+            assert f.read(3) == b"udi"
+
+    def test_list_and_delete(self, tmp_path):
+        backend = LocalStorage(str(tmp_path / "store"))
+        source = write(tmp_path / "a.wav", b"audio")
+        for key in ("p/a.wav", "p/a.wav.peaks.npz", "p/b.wav"):
+            backend.upload(source, key)
+        assert backend.list("p/a.wav") == ["p/a.wav", "p/a.wav.peaks.npz"]
+        backend.delete(["p/a.wav", "p/missing.wav"])
+        assert backend.list("p/") == ["p/a.wav.peaks.npz", "p/b.wav"]
+
+    def test_rejects_keys_outside_root(self, tmp_path):
+        with pytest.raises(ValueError):
+            LocalStorage(str(tmp_path / "store")).open("../secret")
+
+    def test_storage_path_is_not_remote(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "storage_path", str(tmp_path))
+        assert not LocalStorage().remote
+        assert LocalStorage(str(tmp_path / "elsewhere")).remote
+
+
+class TestReadThroughCache:
+    def test_hit_after_miss(self, tmp_path):
+        backend = LocalStorage(str(tmp_path / "store"))
+        backend.upload(write(tmp_path / "a.wav", b"audio"), "a.wav")
+        cache = ReadThroughCache(backend, tmp_path / "cache", max_bytes=1024)
+
+        path = cache.fetch("a.wav")
+        assert open(path, "rb").read() == b"audio"
+        assert os.path.basename(path) == "a.wav"
+        assert cache.fetch("a.wav") == path
+        assert cache.stats() == {"hits": 1, "misses": 1}
+
+    def test_changed_file_is_fetched_again(self, tmp_path):
+        backend = LocalStorage(str(tmp_path / "store"))
+        backend.upload(write(tmp_path / "a.wav", b"first"), "a.wav")
+        cache = ReadThroughCache(backend, tmp_path / "cache", max_bytes=1024)
+        first = cache.fetch("a.wav")
+
+        backend.upload(write(tmp_path / "a.wav", b"second!"), "a.wav")
+        second = cache.fetch("a.wav")
+        assert second != first
+        assert open(second, "rb").read() == b"second!"
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        backend = LocalStorage(str(tmp_path / "store"))
+        for name in ("a", "b", "c"):
+            backend.upload(write(tmp_path / name, b"x" * 400), f"{name}.wav")
+        cache = ReadThroughCache(backend, tmp_path / "cache", max_bytes=1000)
+
+        a = cache.fetch("a.wav")
+        os.utime(os.path.dirname(a), (0, 0))
+        b = cache.fetch("b.wav")
+        c = cache.fetch("c.wav")
+        assert not os.path.exists(a)
+        assert os.path.exists(b) and os.path.exists(c)
+
+    def test_missing_key(self, tmp_path):
+        cache = ReadThroughCache(LocalStorage(str(tmp_path / "store")), tmp_path / "cache", max_bytes=1024)
+        with pytest.raises(FileNotFoundError):
+            cache.fetch("missing.wav")
+
+
+class TestStorageHelpers:
+    def test_publish_and_fetch_elsewhere(self, tmp_path, remote):
+        path = tmp_path / "storage" / "projects" / "1" / "mix" / "output.wav"
+        write(path, b"mix")
+        write(tmp_path / "storage" / "projects" / "1" / "mix" / "output.wav.peaks.npz", b"peaks")
+        publish(str(path))
+        assert remote.list("projects/1") == ["projects/1/mix/output.wav", "projects/1/mix/output.wav.peaks.npz"]
+
+        # Another node: the file is not on its disk
+        path.unlink()
+        local = fetch(str(path))
+        assert local.startswith(str(tmp_path / "cache"))
+        assert open(local, "rb").read() == b"mix"
+
+    def test_publish_directory(self, tmp_path, remote):
+        stems = tmp_path / "storage" / "blobs" / "ab" / "ab.wav.stems"
+        write(stems / "htdemucs" / "ab" / "vocals.wav", b"v")
+        write(stems / "htdemucs" / "ab" / "stems.json", b"{}")
+        publish(str(stems))
+        assert remote.list("blobs/ab/ab.wav.stems/") == [
+            "blobs/ab/ab.wav.stems/htdemucs/ab/stems.json",
+            "blobs/ab/ab.wav.stems/htdemucs/ab/vocals.wav",
+        ]
+
+    def test_publish_stored_as(self, tmp_path, remote):
+        copy = write(tmp_path / "cache" / "entry" / "a.wav.peaks.npz", b"peaks")
+        publish(copy, stored_as=str(tmp_path / "storage" / "blobs" / "a.wav.peaks.npz"))
+        assert remote.list("blobs/") == ["blobs/a.wav.peaks.npz"]
+
+    def test_localize_brings_sidecars(self, tmp_path, remote):
+        remote.upload(write(tmp_path / "a", b"out"), "p/output.wav")
+        remote.upload(write(tmp_path / "b", b"peaks"), "p/output.wav.peaks.npz")
+        remote.upload(write(tmp_path / "c", b"other"), "p/output.wav2")
+
+        path = str(tmp_path / "storage" / "p" / "output.wav")
+        assert localize(path) == path
+        assert sorted(os.listdir(tmp_path / "storage" / "p")) == ["output.wav", "output.wav.peaks.npz"]
+
+    def test_remove(self, tmp_path, remote):
+        for key in ("p/1/output.wav", "p/1/.staging/x.wav", "p/10/output.wav"):
+            remote.upload(write(tmp_path / "f", b"x"), key)
+        remove(str(tmp_path / "storage" / "p" / "1"))
+        assert remote.list("p/") == ["p/10/output.wav"]
+
+    def test_noop_on_shared_storage(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "storage_path", str(tmp_path))
+        monkeypatch.setattr(storage_backend, "_backend", LocalStorage())
+        path = str(tmp_path / "missing.wav")
+        assert fetch(path) == path
+        publish(path)
+        remove(path)
+
+
+class TestS3Storage:
+    @pytest.fixture
+    def s3(self):
+        moto = pytest.importorskip("moto")
+        import boto3
+        from app.utils.storage_backend import S3Storage
+
+        with moto.mock_aws():
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="bibee")
+            yield S3Storage(
+                "bibee",
+                prefix="test",
+                multipart_threshold=5 * 1024 * 1024,
+                multipart_chunksize=5 * 1024 * 1024,
+                max_concurrency=4,
+                client=client,
+            )
+
+    def test_multipart_round_trip(self, s3, tmp_path):
+        content = os.urandom(12 * 1024 * 1024)
+        s3.upload(write(tmp_path / "big.wav", content), "blobs/big.wav")
+        head = s3.client.head_object(Bucket="bibee", Key="test/blobs/big.wav")
+        assert head["ETag"].strip('"').endswith("-3")  # Three parts
+
+        s3.download("blobs/big.wav", str(tmp_path / "copy.wav"))
+        assert (tmp_path / "copy.wav").read_bytes() == content
+
+    def test_streaming_window(self, s3, tmp_path):
+        sr = 8000
+        audio = np.random.default_rng(0).uniform(-1, 1, (sr * 4, 2)).astype(np.float32)
+        sf.write(tmp_path / "a.wav", audio, sr, subtype="FLOAT")
+        s3.upload(str(tmp_path / "a.wav"), "a.wav")
+
+        with s3.open("a.wav") as f:
+            window, _ = sf.read(f, start=sr, frames=sr, dtype="float32")
+        np.testing.assert_array_equal(window, audio[sr:2 * sr])
+
+    def test_list_version_delete(self, s3, tmp_path):
+        s3.upload(write(tmp_path / "a", b"one"), "p/a.wav")
+        s3.upload(write(tmp_path / "b", b"two"), "p/a.wav.peaks.npz")
+        version = s3.version("p/a.wav")
+        s3.upload(write(tmp_path / "a", b"three"), "p/a.wav")
+        assert s3.version("p/a.wav") != version
+
+        assert sorted(s3.list("p/")) == ["p/a.wav", "p/a.wav.peaks.npz"]
+        s3.delete(["p/a.wav", "p/a.wav.peaks.npz"])
+        assert s3.list("p/") == []
+        with pytest.raises(FileNotFoundError):
+            s3.version("p/a.wav")
+        with pytest.raises(FileNotFoundError):
+            s3.download("p/a.wav", str(tmp_path / "missing.wav"))
+
+    def test_presigned_url(self, s3, tmp_path):
+        s3.upload(write(tmp_path / "a", b"audio"), "p/a.wav")
+        url = s3.url("p/a.wav", "song.wav", "audio/x-wav", 60)
+        assert "/test/p/a.wav?" in url
+        assert "response-content-type=audio%2Fx-wav" in url
@@ -0,0 +1,179 @@
+"""Resumable upload session tests."""
+import hashlib
+from uuid import uuid4
+import pytest
+from fastapi import HTTPException
+from app.config import settings
+from app.services import upload as upload_module
+from app.services.upload import TARGET_PROJECT, UploadService
+from app.utils import storage_backend
+from app.utils.storage_backend import LocalStorage
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(str(member))
+
+    async def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    async def expire(self, key, ttl):
+        return key in self.data
+
+    async def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    r = FakeRedis()
+
+    async def get_redis():
+        return r
+
+    monkeypatch.setattr(upload_module, "get_redis", get_redis)
+    monkeypatch.setattr(settings, "storage_path", str(tmp_path))
+    monkeypatch.setattr(settings, "upload_chunk_size_mb", 1)
+    return UploadService()
+
+
+@pytest.fixture
+def remote(tmp_path, monkeypatch):
+    """A remote store shared by every API node."""
+    backend = LocalStorage(str(tmp_path / "remote"))
+    monkeypatch.setattr(storage_backend, "_backend", backend)
+    return backend
+
+
+async def body(data: bytes, piece: int = 64 * 1024):
+    for start in range(0, len(data), piece):
+        yield data[start:start + piece]
+
+
+CHUNK = 1024 * 1024
+
+
+class TestUploadSessions:
+    async def create(self, service, user_id, size):
+        return await service.create(user_id, TARGET_PROJECT, uuid4(), "projects/x", "song.wav", "audio/wav", size)
+
+    async def test_chunks_in_any_order_assemble_the_file(self, service, tmp_path):
+        user_id = uuid4()
+        content = bytes(range(256)) * (CHUNK * 2 // 256) + b"tail"
+        session = await self.create(service, user_id, len(content))
+        assert session.total_chunks == 3
+
+        session = await service.write_chunk(session, 2, body(content[2 * CHUNK:]))
+        assert session.offset == 0
+        session = await service.write_chunk(session, 0, body(content[:CHUNK]))
+        assert session.offset == CHUNK
+        session = await service.write_chunk(session, 1, body(content[CHUNK:2 * CHUNK]), offset=CHUNK)
+        assert session.offset == len(content)
+
+        stored = await service.complete(await service.get(session.id, user_id))
+
+        assert stored.path.startswith(str(tmp_path / "projects" / "x"))
+        assert open(stored.path, "rb").read() == content
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+        assert not session.part_path.exists()
+        with pytest.raises(HTTPException) as exc_info:
+            await service.get(session.id, user_id)
+        assert exc_info.value.status_code == 404
+
+    async def test_short_chunk_stays_missing(self, service):
+        user_id = uuid4()
+        session = await self.create(service, user_id, CHUNK + 10)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.write_chunk(session, 0, body(b"x" * 100))
+        assert exc_info.value.detail == "Chunk is incomplete"
+
+        session = await service.write_chunk(session, 1, body(b"y" * 10))
+        assert session.received_chunks == [1]
+        with pytest.raises(HTTPException) as exc_info:
+            await service.complete(session)
+        assert exc_info.value.status_code == 409
+
+    async def test_rejects_oversized_chunk(self, service):
+        session = await self.create(service, uuid4(), 10)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.write_chunk(session, 0, body(b"z" * 11))
+        assert exc_info.value.detail == "Chunk is larger than expected"
+
+    async def test_session_belongs_to_its_user(self, service):
+        session = await self.create(service, uuid4(), 10)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.get(session.id, uuid4())
+        assert exc_info.value.status_code == 404
+
+    async def test_validates_file_before_creating(self, service, monkeypatch):
+        monkeypatch.setattr(settings, "max_upload_size_mb", 1)
+
+        with pytest.raises(HTTPException):
+            await service.create(uuid4(), TARGET_PROJECT, uuid4(), "p", "song.exe", "audio/wav", 10)
+        with pytest.raises(HTTPException) as exc_info:
+            await self.create(service, uuid4(), CHUNK + 1)
+        assert "too large" in exc_info.value.detail
+
+
+class TestRemoteUploadSessions:
+    async def create(self, service, user_id, size):
+        return await service.create(user_id, TARGET_PROJECT, uuid4(), "projects/x", "song.wav", "audio/wav", size)
+
+    async def test_chunks_are_stored_in_the_backend(self, service, remote, tmp_path):
+        user_id = uuid4()
+        content = bytes(range(256)) * (CHUNK * 2 // 256) + b"tail"
+        session = await self.create(service, user_id, len(content))
+        assert not session.part_path.exists()
+
+        for index in (1, 2, 0):
+            chunk = content[index * CHUNK:(index + 1) * CHUNK]
+            session = await service.write_chunk(session, index, body(chunk))
+        assert remote.list("uploads/") == [session.chunk_key(i) for i in range(3)]
+        assert list((tmp_path / "uploads").iterdir()) == []
+
+        stored = await service.complete(await service.get(session.id, user_id))
+
+        assert open(stored.path, "rb").read() == content
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+        assert remote.list("uploads/") == []
+
+    async def test_abort_removes_stored_chunks(self, service, remote):
+        session = await self.create(service, uuid4(), 10)
+        await service.write_chunk(session, 0, body(b"x" * 10))
+
+        await service.abort(session)
+
+        assert remote.list("uploads/") == []
@@ -0,0 +1,24 @@
+"""Worker warmup tests."""
+from app.workers import warmup
+
+
+class TestWarmUp:
+    def test_runs_requested_components(self, monkeypatch):
+        calls = []
+        monkeypatch.setitem(warmup.WARMUPS, "audio", lambda: calls.append("audio"))
+
+        timings = warmup.warm_up(" audio, unknown ,")
+
+        assert calls == ["audio"]
+        assert set(timings) == {"audio"}
+
+    def test_failed_component_does_not_stop_worker(self, monkeypatch):
+        def broken():
+            raise RuntimeError("Demucs is not installed")
+
+        monkeypatch.setitem(warmup.WARMUPS, "demucs", broken)
+
+        assert warmup.warm_up("demucs") == {}
+
+    def test_audio_warmup_runs_on_synthetic_signal(self):
+        assert "audio" in warmup.warm_up("audio")
@@ -0,0 +1,48 @@
+"""Waveform peak tests."""
+import numpy as np
+import pytest
+from app.utils.waveform import PeakBuilder, load_peaks, select_peaks
+
+
+def naive_peaks(audio: np.ndarray, samples_per_peak: int) -> np.ndarray:
+    mono_min, mono_max = audio.min(axis=0), audio.max(axis=0)
+    starts = range(0, audio.shape[1], samples_per_peak)
+    return np.array([[mono_min[s:s + samples_per_peak].min(), mono_max[s:s + samples_per_peak].max()] for s in starts])
+
+
+class TestPeakBuilder:
+    """Tests for PeakBuilder."""
+
+    @pytest.fixture
+    def audio(self):
+        return np.random.default_rng(0).uniform(-1, 1, size=(2, 100_000)).astype(np.float32)
+
+    @pytest.mark.parametrize("block", [1000, 4096, 100_000])
+    def test_levels_match_naive_peaks(self, audio, block):
+        builder = PeakBuilder(44100)
+        for start in range(0, audio.shape[1], block):
+            builder.update(audio[:, start:start + block])
+
+        levels = builder.levels()
+
+        assert sorted(levels) == [256, 1024, 4096, 16384, 65536]
+        for spp, level in levels.items():
+            expected = np.round(naive_peaks(audio, spp) * 32767)
+            np.testing.assert_allclose(level, expected, atol=1)
+
+    def test_save_and_select_range(self, tmp_path, audio):
+        builder = PeakBuilder(44100)
+        builder.update(audio)
+        builder.save(str(tmp_path / "song.wav"))
+
+        peaks = load_peaks(str(tmp_path / "song.wav"))
+        payload = select_peaks(peaks, samples_per_peak=1000, start_seconds=0.5, end_seconds=1.0, bits=8)
+
+        assert payload["samples_per_pixel"] == 1024
+        assert payload["start"] == 22050 // 1024
+        assert payload["length"] == -(-44100 // 1024) - 22050 // 1024
+        assert len(payload["data"]) == 2 * payload["length"]
+        assert all(-128 <= v <= 127 for v in payload["data"])
+
+    def test_missing_peaks(self, tmp_path):
+        assert load_peaks(str(tmp_path / "missing.wav")) is None
@@ -0,0 +1,72 @@
+"""Worker progress reporter tests."""
+from types import SimpleNamespace
+import pytest
+from app.workers import progress as progress_module
+from app.workers.progress import ProgressReporter
+
+
+class FakeTask:
+    def __init__(self):
+        self.request = SimpleNamespace(id="celery-1")
+        self.states = []
+
+    def update_state(self, state, meta):
+        self.states.append(meta["progress"])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def sinks(monkeypatch):
+    published, persisted = [], []
+    monkeypatch.setattr(progress_module, "publish_progress", lambda project_id, event: published.append(event))
+    monkeypatch.setattr(progress_module, "run_db", lambda fn: persisted.append(fn))
+    return published, persisted
+
+
+class TestProgressReporter:
+    def test_drops_updates_within_interval(self, sinks):
+        published, _ = sinks
+        task, clock = FakeTask(), FakeClock()
+        reporter = ProgressReporter(task, "p1", "stems", interval=1.0, db_interval=60.0, clock=clock)
+
+        for i in range(1, 50):
+            reporter(i, "Separating...")
+        clock.now = 1.5
+        reporter(50, "Separating...")
+
+        assert task.states == [1, 50]
+        assert [e["progress"] for e in published] == [1, 50]
+
+    def test_always_sends_completion_and_terminal_state(self, sinks):
+        published, _ = sinks
+        task, clock = FakeTask(), FakeClock()
+        reporter = ProgressReporter(task, "p1", "mix", interval=1.0, db_interval=60.0, clock=clock)
+
+        reporter(10, "Mixing...")
+        reporter(20, "Mixing...")
+        reporter(100, "Done")
+        reporter.finish("SUCCESS", "Done")
+
+        assert task.states == [10, 100]
+        assert [(e["state"], e["progress"]) for e in published] == [
+            ("PROGRESS", 10), ("PROGRESS", 100), ("SUCCESS", 100),
+        ]
+
+    def test_persists_progress_at_db_interval(self, sinks):
+        _, persisted = sinks
+        task, clock = FakeTask(), FakeClock()
+        reporter = ProgressReporter(task, "p1", "stems", interval=0.0, db_interval=5.0, clock=clock)
+
+        for i in range(20):
+            clock.now = i
+            reporter(i * 5, "Separating...")
+
+        # One UPDATE per 5 seconds instead of one per callback
+        assert len(persisted) == 3